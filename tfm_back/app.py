@@ -1,39 +1,172 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
-import joblib
 import pandas as pd
+import os
+import threading
+import time
 import pymysql
-import io
-import matplotlib.pyplot as plt
+from batch_scoring import batch_predict_response
+from cache import LRUCache, VersionedCache
+from charts import (ChartCache, ChartRenderer, RendererBusy, RenderTimeout,
+                    chart_data, chart_key, chart_series, render_chart_svg)
+from db_pool import ConnectionPool, DatasetVersion, DB_CONFIG, PoolExhausted
+from metrics import (CHART_RENDER, CONTENT_TYPE, POOL_TIMEOUTS, POOL_WAIT, Gauge, TimedDictCursor, TimedSSDictCursor,
+                     finish_request, log_error, log_event, render, start_request)
+from model_store import ModelStore
+from predictions import STORED_PREDICTION_SQL, model_version, predict_single_player
+from queries import (CLUBS_BY_COMPETITION_SQL, COMPETITION_SEASONS_SQL, COMPETITIONS_BY_TYPE_SQL, COMPETITIONS_SQL,
+                     PLAYER_CHART_SQL, PLAYER_SQL, PLAYER_STATS_SQL, SEASONS_SQL, TEAM_CHART_SQL, TEAM_DETAILS_SQL,
+                     TEAMS_SQL, TOP_SCORERS_SQL, games_query, next_players_cursor, player_stats, players_query,
+                     teams_query)
+from responses import CachedBody, etag_for, matching_etag, not_modified, send_body, send_stream
+from search_index import SEARCH_KINDS, SearchIndex, SearchIndexStore
 
 app = Flask("__TFM__")
 CORS(app) 
 
-# Cargar el modelo
-model = joblib.load('model.pkl')
-
-# Conexión a la base de datos MySQL
+# Modelo en uso (última versión de models/, recargada sin reiniciar; si no hay, model.pkl).
+# Se carga en start_server_work() o en la primera petición, no al importar el módulo
+model_store = ModelStore(preload=False)
+
+# Pool de conexiones a la base de datos MySQL (cada consulta se mide para /metrics)
+db_pool = ConnectionPool(dict(DB_CONFIG, cursorclass=TimedDictCursor), on_wait=POOL_WAIT.observe,
+                         on_timeout=POOL_TIMEOUTS.inc)
+
+# Versión de los datos cargados (tabla dataset_version, incrementada por load_mysql.py)
+dataset_version = DatasetVersion(db_pool, check_interval=float(os.environ.get('TFM_DATASET_CHECK_INTERVAL', 5)))
+
+# Caché de los totales de las búsquedas paginadas (COUNT(*) por combinación de filtros)
+count_cache = LRUCache(maxsize=2048, ttl=int(os.environ.get('TFM_COUNT_CACHE_TTL', 300)))
+
+# Predicciones calculadas al vuelo para jugadores sin fila en player_predictions
+prediction_cache = VersionedCache(dataset_version.get, maxsize=int(os.environ.get('TFM_PREDICTION_CACHE_SIZE', 4096)))
+
+# Caché de gráficos PNG y SVG (memoria con LRU y, opcionalmente, disco)
+chart_cache = ChartCache(
+    max_bytes=int(os.environ.get('TFM_CHART_CACHE_MB', 64)) * 1024 * 1024,
+    directory=os.environ.get('TFM_CHART_CACHE_DIR') or None
+)
+
+# Pool de procesos que dibuja los gráficos
+chart_renderer = ChartRenderer()
+
+# Formatos de los endpoints de gráficos: PNG (por defecto), la serie en JSON o un SVG ligero
+CHART_FORMATS = ('png', 'json', 'svg')
+
+# Partidos por bloque en las respuestas en streaming de /api/games
+STREAM_BATCH_ROWS = int(os.environ.get('TFM_STREAM_BATCH_ROWS', 500))
+
+def chart_response(kind, params, rows):
+    fmt = request.args.get('format', 'png')
+    if fmt not in CHART_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(CHART_FORMATS)}"}), 400
+
+    # La ETag es el hash de (gráfico, parámetros, datos): si el cliente ya la tiene no se envía nada
+    key = chart_key(kind, params, rows)
+    etag = key if fmt == 'png' else f"{key}-{fmt}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    xs, ys = chart_series(kind, rows)
+    if fmt == 'json':
+        response = jsonify(chart_data(kind, xs, ys))
+    elif fmt == 'svg':
+        svg = chart_cache.get(key, ext='svg')
+        if svg is None:
+            start = time.perf_counter()
+            svg = render_chart_svg(kind, xs, ys)
+            CHART_RENDER.observe(time.perf_counter() - start, kind, fmt)
+            chart_cache.set(key, svg, ext='svg')
+        response = Response(svg, mimetype='image/svg+xml')
+    else:
+        png = chart_cache.get(key)
+        if png is None:
+            try:
+                start = time.perf_counter()
+                png = chart_renderer.render(kind, xs, ys)
+                CHART_RENDER.observe(time.perf_counter() - start, kind, fmt)
+            except RendererBusy:
+                # Saturado: el cliente debe reintentar más tarde
+                response = jsonify({"error": "Chart renderer is busy, retry later"})
+                response.status_code = 503
+                response.headers['Retry-After'] = '1'
+                return response
+            except RenderTimeout:
+                return jsonify({"error": "Chart rendering timed out"}), 504
+            chart_cache.set(key, png)
+        response = Response(png, mimetype='image/png')
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Conexión a la base de datos MySQL (connection.close() la devuelve al pool)
 def get_db_connection():
-    connection = pymysql.connect(
-        host='localhost',
-        user='root',
-        password='root',
-        database='tfm_bbdd',
-        cursorclass=pymysql.cursors.DictCursor
-    )
-    return connection
+    return db_pool.get_connection()
+
+def build_search_index():
+    connection = get_db_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT player_id, name, country_of_citizenship, market_value_in_eur FROM players")
+            players = cursor.fetchall()
+            cursor.execute("SELECT club_id, name FROM clubs")
+            clubs = cursor.fetchall()
+    finally:
+        connection.close()
+    return SearchIndex.from_records(players, clubs)
+
+# Índice de autocompletado (nombres de jugadores y clubes, nacionalidades), reconstruido al recargar los datos
+search_index = SearchIndexStore(build_search_index, dataset_version.get,
+                                check_interval=dataset_version.check_interval)
+
+@app.before_request
+def start_request_metrics():
+    # El endpoint es la plantilla de la ruta (/api/players/<int:player_id>), no la URL: una serie por ruta
+    g.request_metrics = start_request(request.url_rule.rule if request.url_rule else 'unmatched')
+
+@app.after_request
+def record_request_metrics(response):
+    state = g.pop('request_metrics', None)
+    if state is not None:
+        finish_request(state, request.method, response.status_code)
+    return response
 
 @app.route('/')
 def home():
     return "Bienvenido a la predicción del rendimiento de jugadores de fútbol"
 
+@app.route('/api/pool_stats', methods=['GET'])
+def get_pool_stats():
+    return jsonify(db_pool.stats())
+
+# Pool agotado: el servidor está saturado y el cliente debe reintentar más tarde
+@app.errorhandler(PoolExhausted)
+def pool_exhausted(e):
+    response = jsonify({"error": str(e)})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
 @app.route('/predict', methods=['POST'])
 def predict():
     data = request.json
     input_data = pd.DataFrame([data])
-    prediction = model.predict(input_data)
+    prediction = model_store.get().predict(input_data)
     return jsonify({'prediction': prediction[0]})
 
+# Puntuación por lotes: lista JSON o NDJSON de filas, resultados en NDJSON en el mismo orden
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    return batch_predict_response(model_store.get())
+
+# Versión y esquema de columnas del modelo en uso
+@app.route('/api/model_info', methods=['GET'])
+def get_model_info():
+    return jsonify(model_store.metadata())
+
 @app.route('/predict/<int:player_id>', methods=['GET'])
 def predict_player(player_id):
     connection = get_db_connection()
@@ -48,105 +181,194 @@ def predict_player(player_id):
             
             # Hacer la predicción
             input_data = pd.DataFrame([player_data])
-            prediction = model.predict(input_data)
+            prediction = model_store.get().predict(input_data)
             
             return jsonify({'player_id': player_id, 'prediction': prediction[0]})
     finally:
         connection.close()
 
+# Datos de referencia: solo cambian al recargar el dataset. Cada función devuelve
+# (datos, código HTTP) y sus respuestas se guardan en response_cache
+def fetch_competitions(cursor):
+    cursor.execute(COMPETITIONS_SQL)
+    return cursor.fetchall(), 200
+
+def fetch_competitions_by_type(cursor, comp_type):
+    cursor.execute(COMPETITIONS_BY_TYPE_SQL, (comp_type,))
+    return cursor.fetchall(), 200
+
+def fetch_clubs_by_competition(cursor, competition_id):
+    cursor.execute(CLUBS_BY_COMPETITION_SQL, (competition_id,))
+    return cursor.fetchall(), 200
+
+def fetch_seasons(cursor, competition_id):
+    cursor.execute(SEASONS_SQL, (competition_id,))
+    seasons = cursor.fetchall()
+    if not seasons:
+        return {"error": "No games found for the given competition_id"}, 404
+    return seasons, 200
+
+def fetch_teams(cursor, competition_id, season):
+    cursor.execute(TEAMS_SQL, (competition_id, season))
+    teams = cursor.fetchall()
+    if not teams:
+        return {"error": "No teams found"}, 404
+    return teams, 200
+
+def reference_key(fetch, *args):
+    return (fetch.__name__,) + tuple(str(arg) for arg in args)
+
+def cached_reference(fetch, *args):
+    # (cuerpo JSON, código HTTP) desde la caché o consultando MySQL una sola vez
+    key = reference_key(fetch, *args)
+    entry, version = response_cache.get(key)
+    if entry is None:
+        connection = get_db_connection()
+        try:
+            with connection.cursor() as cursor:
+                data, status = fetch(cursor, *args)
+        finally:
+            connection.close()
+        # ETag fuerte de la versión del dataset; las versiones comprimidas se guardan en la misma entrada
+        etag = etag_for(version, *key) if version is not None else None
+        entry = CachedBody((app.json.dumps(data) + '\n').encode('utf-8'), status=status, etag=etag)
+        response_cache.set(key, entry, version)
+    return entry
+
+def reference_response(fetch, *args):
+    entry = cached_reference(fetch, *args)
+    size = entry.size()
+    response = send_body(entry)
+    if entry.size() != size:
+        # Se ha guardado una versión comprimida nueva en la entrada: cuenta para el límite de bytes
+        response_cache.resize(reference_key(fetch, *args))
+    return response
+
+def warm_reference_cache():
+    # Todas las competiciones, tipos, equipos por competición, temporadas y equipos por temporada
+    try:
+        competitions = app.json.loads(cached_reference(fetch_competitions).body)
+        for competition in competitions:
+            cached_reference(fetch_clubs_by_competition, competition['competition_id'])
+            cached_reference(fetch_seasons, competition['competition_id'])
+        for comp_type in {competition['type'] for competition in competitions}:
+            cached_reference(fetch_competitions_by_type, comp_type)
+
+        connection = get_db_connection()
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(COMPETITION_SEASONS_SQL)
+                pairs = cursor.fetchall()
+        finally:
+            connection.close()
+        for pair in pairs:
+            cached_reference(fetch_teams, pair['competition_id'], pair['season'])
+        log_event('reference_cache_warmed', entries=len(response_cache))
+    except Exception as e:
+        log_error('reference_cache_warm_error', e)
+
+def on_dataset_change(version):
+    # Datos nuevos: fuera los totales en caché y se vuelve a precargar en segundo plano
+    count_cache.clear()
+    threading.Thread(target=warm_reference_cache, daemon=True).start()
+
+# Caché de respuestas de los datos de referencia, vaciada con cada versión nueva del dataset
+response_cache = VersionedCache(dataset_version.get,
+                                maxsize=None, sizeof=CachedBody.size,
+                                maxbytes=int(os.environ.get('TFM_RESPONSE_CACHE_MB', 32)) * 1024 * 1024,
+                                on_change=on_dataset_change)
+
+def start_server_work():
+    """Carga del modelo y precarga de la caché de respuestas al arrancar el servidor.
+
+    No se hace al importar app.py: los procesos de gráficos (contexto spawn)
+    reimportan el módulo principal y cada uno repetiría la carga del modelo y
+    la precarga contra MySQL. Con un servidor WSGI (``gunicorn app:app``) el
+    modelo se carga en la primera petición que lo usa y la caché se precarga
+    con la primera consulta de la versión del dataset.
+    """
+    model_store.get()
+    # La primera consulta de la versión llama a on_dataset_change, que lanza la precarga
+    try:
+        response_cache.current_version()
+    except Exception as e:
+        log_error('reference_cache_warm_error', e)
+
+@app.route('/api/cache_stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify({
+        "responses": response_cache.stats(),
+        "counts": count_cache.stats(),
+        "predictions": prediction_cache.stats(),
+        "charts": chart_cache.stats()
+    })
+
+# Estado del pool y de las cachés, leído al servir /metrics
+Gauge('tfm_db_pool_connections', 'Conexiones del pool por estado',
+      lambda: {('open',): db_pool.stats()['open'], ('idle',): db_pool.stats()['idle']}, ('state',))
+Gauge('tfm_response_cache_entries', 'Respuestas en la caché de datos de referencia', lambda: len(response_cache))
+Gauge('tfm_response_cache_bytes', 'Bytes de la caché de datos de referencia (cuerpos y versiones comprimidas)',
+      lambda: response_cache.stats()['bytes'])
+Gauge('tfm_chart_renderer_rejected', 'Gráficos rechazados por el pool de dibujo saturado',
+      lambda: chart_renderer.stats()['rejected'])
+
+# Métricas en formato de texto de Prometheus
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(render(), content_type=CONTENT_TYPE)
+
 @app.route('/api/competitions', methods=['GET'])
 def get_competitions():
-    connection = get_db_connection()
-    try:
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT * FROM competition")
-            competitions = cursor.fetchall()
-            return jsonify(competitions)
-    finally:
-        connection.close()
+    return reference_response(fetch_competitions)
 
 @app.route('/api/competitions/<comp_type>', methods=['GET'])
 def get_competitions_by_type(comp_type):
-    connection = get_db_connection()
-    try:
-        with connection.cursor() as cursor:
-            sql = "SELECT * FROM competition WHERE type = %s"
-            cursor.execute(sql, (comp_type,))
-            competitions = cursor.fetchall()
-            return jsonify(competitions)
-    finally:
-        connection.close()
+    return reference_response(fetch_competitions_by_type, comp_type)
 
 @app.route('/api/clubs/<competition_id>', methods=['GET'])
 def get_clubs_by_competition(competition_id):
-    connection = get_db_connection()
-    try:
-        with connection.cursor() as cursor:
-            sql = "SELECT * FROM clubs WHERE domestic_competition_id = %s"
-            cursor.execute(sql, (competition_id,))
-            clubs = cursor.fetchall()
-            return jsonify(clubs)
-    finally:
-        connection.close()
+    return reference_response(fetch_clubs_by_competition, competition_id)
 
 @app.route('/api/players', methods=['GET'])
 def search_players():
+    try:
+        count_sql, count_params, page_sql, page_params, per_page = players_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
-            name = request.args.get('name', default=None)
-            position = request.args.get('position', default=None)
-            club = request.args.get('current_club_name', default=None)
-            nationality = request.args.get('country_of_citizenship', default=None)
-            min_market_value = request.args.get('minPrice', default=0, type=float)
-            max_market_value = request.args.get('maxPrice', default=250000000, type=float)
-            page = int(request.args.get('page', 1))
-            per_page = int(request.args.get('per_page', 10))
-
-            sql = """
-                SELECT p.*, c.name 
-                FROM players p
-                JOIN clubs c ON p.current_club_id = c.club_id
-                WHERE TRUE
-            """
-            params = []
-
-            if name:
-                sql += " AND p.name LIKE %s"
-                params.append(f"%{name}%")
-            if position:
-                sql += " AND p.position = %s"
-                params.append(position)
-            if club:
-                sql += " AND c.name LIKE %s"
-                params.append(f"%{club}%")
-            if nationality:
-                sql += " AND p.country_of_citizenship LIKE %s"
-                params.append(f"%{nationality}%")
-            if min_market_value is not None and max_market_value is not None:
-                sql += " AND p.market_value_in_eur BETWEEN %s AND %s"
-                params.extend([min_market_value, max_market_value])
-
-            # Imprimir la consulta SQL y los parámetros (no es necesario decode)
-            print("SQL Query:", cursor.mogrify(sql, params))
-
-            cursor.execute(sql, params)
-            players = cursor.fetchall()
+            # El total se calcula con un COUNT(*) aparte y se guarda en caché por filtros
+            count_key = ('players', count_sql, tuple(count_params))
+            total = count_cache.get(count_key)
+            if total is None:
+                cursor.execute(count_sql, count_params)
+                total = cursor.fetchone()['total']
+                count_cache.set(count_key, total)
 
-            # Implementar paginación
-            total = len(players)
-            start = (page - 1) * per_page
-            end = start + per_page
-            paginated_players = players[start:end]
+            cursor.execute(page_sql, page_params)
+            paginated_players = cursor.fetchall()
 
             return jsonify({
                 "players": paginated_players,
-                "total": total
+                "total": total,
+                "next_after": next_players_cursor(paginated_players, per_page)
             })
     finally:
         connection.close()
 
 
+# Autocompletado: ?q=texto&type=player,club,country&limit=10, sin acentos ni mayúsculas y ordenado por relevancia
+@app.route('/api/typeahead', methods=['GET'])
+def typeahead():
+    query = request.args.get('q', default='')
+    kinds = [kind for kind in request.args.get('type', default='').split(',') if kind]
+    if any(kind not in SEARCH_KINDS for kind in kinds):
+        return jsonify({"error": f"type must be a comma-separated list of {', '.join(SEARCH_KINDS)}"}), 400
+    limit = min(max(request.args.get('limit', default=10, type=int), 1), 50)
+    return jsonify({"results": search_index.get().search(query, kinds or None, limit)})
+
 # Endpoint para obtener los 3 jugadores con más goles
 @app.route('/api/top_scorers', methods=['GET'])
 def get_top_scorers():
@@ -154,147 +376,46 @@ def get_top_scorers():
     try:
         with connection.cursor() as cursor:
             # Consulta para obtener los 3 jugadores con más goles
-            sql = """
-                SELECT p.player_id, p.name, p.country_of_birth, p.image_url, COUNT(ge.player_id) AS goals
-                FROM players p
-                JOIN game_events ge ON p.player_id = ge.player_id
-                WHERE ge.type = 'Goals'
-                GROUP BY p.player_id
-                ORDER BY goals DESC
-                LIMIT 3;
-            """
-            cursor.execute(sql)
+            cursor.execute(TOP_SCORERS_SQL)
             top_scorers = cursor.fetchall()
-            print(f"Top scorers encontrados: {top_scorers}")
 
             if not top_scorers:
                 return jsonify({'error': 'No se encontraron jugadores con goles'}), 404
 
             return jsonify(top_scorers)
     except Exception as e:
-        print(f"Error: {e}")  # Imprimir el error en los registros
+        log_error('top_scorers_error', e)
         return jsonify({"error": str(e)}), 500
     finally:
         connection.close()
         
 
+# Goles, tarjetas, asistencias, partidos y años del jugador en una única consulta
+def fetch_player_stats(cursor, player_id):
+    cursor.execute(PLAYER_STATS_SQL, {'player_id': player_id})
+    return player_stats(cursor.fetchone())
+
 @app.route('/api/players/<int:player_id>', methods=['GET'])
 def get_player_by_id(player_id):
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
             # Consulta para obtener los datos del jugador
-            sql_player = """
-                SELECT * FROM players WHERE player_id = %s
-            """
-            cursor.execute(sql_player, (player_id,))
+            cursor.execute(PLAYER_SQL, (player_id,))
             player = cursor.fetchone()
-            print(f"Jugador encontrado: {player}")
 
             if not player:
                 return jsonify({'error': 'Jugador no encontrado'}), 404
 
-            # Consulta para obtener los goles
-            sql_goals = """
-                SELECT COUNT(*) FROM game_events
-                WHERE player_id = %s AND type = 'Goals'
-            """
-            try:
-                cursor.execute(sql_goals, (player_id,))
-                goals = cursor.fetchone()  # Esto puede devolver un diccionario
-                print(f"Goles encontrados: {goals}")
-                # Accede al valor a través de la clave
-                goals_count = goals['COUNT(*)'] if goals else 0
-            except Exception as e:
-                print(f"Error al obtener goles: {e}")
-                goals_count = 0
-
-            # Consulta para obtener las tarjetas
-            sql_cards = """
-                SELECT COUNT(*) FROM game_events
-                WHERE player_id = %s AND type = 'Cards'
-            """
-            try:
-                cursor.execute(sql_cards, (player_id,))
-                cards = cursor.fetchone()  # Esto puede devolver un diccionario
-                # Accede al valor a través de la clave
-                cards_count = cards['COUNT(*)'] if cards else 0
-            except Exception as e:
-                cards_count = 0
-
-            # Consulta para obtener las asistencias
-            sql_assists = """
-                SELECT COUNT(*) FROM game_events
-                WHERE player_assist_id = %s
-            """
-            try:
-                cursor.execute(sql_assists, (player_id,))
-                assists = cursor.fetchone()  # Esto puede devolver un diccionario
-                # Accede al valor a través de la clave
-                assists_count = assists['COUNT(*)'] if assists else 0
-            except Exception as e:
-                assists_count = 0
-
-            # Consulta para obtener la cantidad de partidos jugados
-            sql_games_played = """
-                SELECT COUNT(DISTINCT game_id) FROM game_events
-                WHERE player_id = %s OR player_assist_id = %s
-            """
-            try:
-                cursor.execute(sql_games_played, (player_id, player_id))
-                games_played = cursor.fetchone()  # Esto puede devolver un diccionario
-                # Accede al valor a través de la clave
-                games_played_count = games_played['COUNT(DISTINCT game_id)'] if games_played else 0
-            except Exception as e:
-                games_played_count = 0
-
-            # Devolver los datos del jugador junto con las estadísticas
-            stats = {
-                "games_played": games_played_count,
-                "goals": goals_count,
-                "cards": cards_count,
-                "assists": assists_count
-            }
-            
-            # Calcular estimación de partidos jugados
-            sql_first_year = """
-                SELECT MIN(YEAR(date)) AS first_year FROM game_events
-                WHERE player_id = %s
-            """
-            sql_last_year = """
-                SELECT MAX(YEAR(date)) AS last_year FROM game_events
-                WHERE player_id = %s
-            """
-            cursor.execute(sql_first_year, (player_id,))
-            first_year_result = cursor.fetchone()
-            first_year = first_year_result['first_year'] if first_year_result and 'first_year' in first_year_result else None
-
-            cursor.execute(sql_last_year, (player_id,))
-            last_year_result = cursor.fetchone()
-            last_year = last_year_result['last_year'] if last_year_result and 'last_year' in last_year_result else None
-
-            if first_year is not None and last_year is not None:
-                years_played = last_year - first_year + 1  # Incluye el año inicial
-                estimated_games_played = years_played * 40  # Promedio de 40 partidos por año
-            else:
-                first_year = None
-                last_year = None
-                estimated_games_played = 0
-
-            # Agregar los años y el estimado de partidos a stats
-            stats.update({
-                "first_year": first_year,
-                "last_year": last_year,
-                "estimated_games_played": estimated_games_played
-            })
-
+            # Goles, tarjetas, asistencias, partidos y años en una única consulta
+            stats = fetch_player_stats(cursor, player_id)
 
             return jsonify({
                 "player": player,
                 "stats": stats
             })
     except Exception as e:
-        print(f"Error: {e}")  # Imprimir el error en los registros
+        log_error('player_error', e, player_id=player_id)
         return jsonify({"error": str(e)}), 500
     finally:
         connection.close()
@@ -306,91 +427,61 @@ def get_games_by_competition():
     competition_id = request.args.get('competition_id')
     season = request.args.get('season')
 
+    if not competition_id:
+        return jsonify({"error": "competition_id is required"}), 400
+
+    # Los partidos solo cambian con el dataset: si el cliente ya tiene esta versión no se consulta MySQL
+    version = dataset_version.get()
+    etag = etag_for(version, 'games', competition_id, season or '') if version is not None else None
+    matched = matching_etag(etag) if etag else None
+    if matched:
+        return not_modified(matched)
+
     connection = get_db_connection()
+    # Cursor sin búfer (SSDictCursor): las filas se leen de MySQL a medida que se envían
+    cursor = connection.cursor(TimedSSDictCursor)
+    streaming = False
     try:
-        with connection.cursor() as cursor:
-            if not competition_id:
-                return jsonify({"error": "competition_id is required"}), 400
-
-            if season:
-                sql = """
-                    SELECT
-                        g.game_id,
-                        g.competition_id,
-                        g.season,
-                        g.date,
-                        g.round,
-                        g.home_club_id,
-                        hc.name AS home_club_name,
-                        g.away_club_id,
-                        ac.name AS away_club_name,
-                        g.home_club_goals,
-                        g.away_club_goals,
-                        g.stadium,
-                        g.attendance,
-                        g.referee
-                    FROM games g
-                    JOIN clubs hc ON g.home_club_id = hc.club_id
-                    JOIN clubs ac ON g.away_club_id = ac.club_id
-                    WHERE g.competition_id = %s AND g.season = %s
-                    ORDER BY g.season DESC
-                """
-                cursor.execute(sql, (competition_id, season))
-            else:
-                sql = """
-                    SELECT
-                        g.game_id,
-                        g.competition_id,
-                        g.season,
-                        g.date,
-                        g.round,
-                        g.home_club_id,
-                        hc.name AS home_club_name,
-                        g.away_club_id,
-                        ac.name AS away_club_name,
-                        g.home_club_goals,
-                        g.away_club_goals,
-                        g.stadium,
-                        g.attendance,
-                        g.referee
-                    FROM games g
-                    JOIN clubs hc ON g.home_club_id = hc.club_id
-                    JOIN clubs ac ON g.away_club_id = ac.club_id
-                    WHERE g.competition_id = %s
-                    ORDER BY g.season DESC
-                """
-                cursor.execute(sql, (competition_id,))
-
-            games = cursor.fetchall()
-
-            if not games:
-                return jsonify({"error": "No games found"}), 404
-
-            return jsonify(games)
+        cursor.execute(*games_query(competition_id, season))
+
+        first = cursor.fetchone()
+        if first is None:
+            return jsonify({"error": "No games found"}), 404
+
+        # El primer partido sale enseguida y el resto por bloques, sin cargar toda la lista en memoria
+        def generate():
+            try:
+                yield '[' + app.json.dumps(first)
+                batch = []
+                for game in cursor:
+                    batch.append(',' + app.json.dumps(game))
+                    if len(batch) >= STREAM_BATCH_ROWS:
+                        yield ''.join(batch)
+                        batch = []
+                batch.append(']\n')
+                yield ''.join(batch)
+            finally:
+                # La conexión vuelve al pool cuando termina (o se corta) el envío
+                cursor.close()
+                connection.close()
+
+        streaming = True
+        # Comprimido al vuelo con gzip/brotli según Accept-Encoding
+        return send_stream(generate(), etag=etag)
     finally:
-        connection.close()
+        if not streaming:
+            cursor.close()
+            connection.close()
 
 @app.route('/api/seasons', methods=['GET'])
 def get_seasons_by_competition():
     competition_id = request.args.get('competition_id')
 
-    connection = get_db_connection()
-    try:
-        with connection.cursor() as cursor:
-            if not competition_id:
-                return jsonify({"error": "competition_id is required"}), 400
-
-            sql = "SELECT DISTINCT season FROM games WHERE competition_id = %s ORDER BY season DESC"
-            cursor.execute(sql, (competition_id,))
-            seasons = cursor.fetchall()
+    if not competition_id:
+        return jsonify({"error": "competition_id is required"}), 400
 
-            if not seasons:
-                return jsonify({"error": "No games found for the given competition_id"}), 404
+    return reference_response(fetch_seasons, competition_id)
 
-            return jsonify(seasons)
-    finally:
-        connection.close()
-        
 @app.route('/api/teams', methods=['GET'])
 def get_teams_by_competition_and_season():
     competition_id = request.args.get('competition_id')
@@ -399,86 +490,33 @@ def get_teams_by_competition_and_season():
     if not competition_id or not season:
         return jsonify({"error": "competition_id and season are required"}), 400
 
-    connection = get_db_connection()
-    try:
-        with connection.cursor() as cursor:
-            sql = """
-                SELECT
-                    c.club_id AS team_id,
-                    c.name AS team_name
-                FROM clubs c
-                JOIN games g ON g.home_club_id = c.club_id OR g.away_club_id = c.club_id
-                WHERE g.competition_id = %s AND g.season = %s
-                GROUP BY c.club_id, c.name
-            """
-            cursor.execute(sql, (competition_id, season))
-            teams = cursor.fetchall()
-            
-            if not teams:
-                return jsonify({"error": "No teams found"}), 404
+    return reference_response(fetch_teams, competition_id, season)
 
-            return jsonify(teams)
-    finally:
-        connection.close()
-        
 @app.route('/api/teamsSearch', methods=['GET']) 
 def get_teams():
-    name = request.args.get('name')
-    country = request.args.get('country')
-    page = int(request.args.get('page', 1))
-    per_page = int(request.args.get('per_page', 10))
+    try:
+        count_sql, params, page_sql, page_params = teams_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
-            # Consulta para obtener los equipos
-            sql = """
-                SELECT
-                    c.club_id AS team_id,
-                    c.name AS team_name,
-                    co.country_name,
-                    co.name
-                FROM clubs c
-                JOIN competition co ON c.domestic_competition_id = co.competition_id
-                WHERE 1=1
-            """
-
-            params = []
-
-            if name:
-                sql += " AND c.name LIKE %s"
-                params.append(f"%{name}%")
-            
-            if country:
-                sql += " AND co.country_name LIKE %s"
-                params.append(f"%{country}%")
-
-            print("Executing SQL:", sql)  # Para depuración
-            print("With parameters:", params)  # Para depuración
-            
-            cursor.execute(sql, params)
-            teams = cursor.fetchall()
-
-
-            # Implementar paginación
-            total = len(teams)
-            start = (page - 1) * per_page
-            end = start + per_page
-            paginated_teams = teams[start:end]
-            
-            if not teams:
+            # Contar el total de equipos que coinciden con los filtros (en caché por filtros)
+            count_key = ('teams', count_sql, tuple(params))
+            total = count_cache.get(count_key)
+            if total is None:
+                cursor.execute(count_sql, params)
+                total = cursor.fetchone()['total']
+                count_cache.set(count_key, total)
+
+            if not total:
                 return jsonify({"teams": [], "total": 0}), 200
 
-            # Contar el total de equipos que coinciden con los filtros
-            total_sql = """
-                SELECT COUNT(*) FROM clubs c
-                JOIN competition co ON c.domestic_competition_id = co.competition_id
-                WHERE 1=1
-            """
+            # Consulta para obtener solo la página pedida
+            cursor.execute(page_sql, page_params)
+            paginated_teams = cursor.fetchall()
 
-            print("Executing total SQL:", sql)  # Para depuración
-            print("With total parameters:", params)  # Para depuración
-                        
             return jsonify({
                 "teams": paginated_teams,
                 "total": total
@@ -486,7 +524,7 @@ def get_teams():
     except Exception as e:
         # Capturar y registrar detalles del error
         error_message = str(e) if hasattr(e, 'message') else repr(e)
-        print("Error occurred:", error_message)  # Para ver cualquier error que ocurra
+        log_error('teams_search_error', e)
         return jsonify({"error": error_message}), 500
     finally:
         connection.close()
@@ -506,48 +544,17 @@ def get_team_performance_chart():
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
-            sql = """
-                SELECT
-                    g.season,
-                    SUM(CASE 
-                        WHEN g.home_club_id = %s AND g.home_club_goals > g.away_club_goals THEN 3
-                        WHEN g.away_club_id = %s AND g.away_club_goals > g.home_club_goals THEN 3
-                        WHEN g.home_club_goals = g.away_club_goals THEN 1
-                        ELSE 0
-                    END) AS points
-                FROM games g
-                WHERE (g.home_club_id = %s OR g.away_club_id = %s)
-                  AND g.competition_id = %s
-                GROUP BY g.season
-                ORDER BY g.season;
-            """
-            cursor.execute(sql, (team_id, team_id, team_id, team_id, competition_id))
+            # Búsqueda por clave primaria en el resumen por equipo y temporada
+            cursor.execute(TEAM_CHART_SQL['team_performance'], (team_id, competition_id))
             performance = cursor.fetchall()
 
             if not performance:
                 return jsonify({"error": "No performance data found"}), 404
-
-            # Crear el gráfico
-            seasons = [row['season'] for row in performance]
-            points = [row['points'] for row in performance]
-
-            plt.figure(figsize=(10, 6))
-            plt.plot(seasons, points, marker='o', label='Puntos')
-            plt.xlabel('Temporada')
-            plt.ylabel('Puntos')
-            plt.title('Desempeño del equipo a lo largo de las temporadas')
-            plt.grid(True)
-            plt.legend()
-
-            # Guardar la gráfica en un objeto de memoria
-            img = io.BytesIO()
-            plt.savefig(img, format='png')
-            img.seek(0)
-
-            # Devolver la gráfica como respuesta
-            return send_file(img, mimetype='image/png')
     finally:
         connection.close()
+
+    # La conexión ya está libre mientras se dibuja la gráfica
+    return chart_response('team_performance', (team_id, competition_id), performance)
         
 
 # Devolver la cantidad de goles de equipo por temporada
@@ -562,47 +569,17 @@ def get_team_goals_scored_chart():
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
-            sql = """
-                SELECT
-                    g.season,
-                    SUM(CASE 
-                        WHEN g.home_club_id = %s THEN g.home_club_goals
-                        WHEN g.away_club_id = %s THEN g.away_club_goals
-                        ELSE 0
-                    END) AS goals_scored
-                FROM games g
-                WHERE (g.home_club_id = %s OR g.away_club_id = %s)
-                  AND g.competition_id = %s
-                GROUP BY g.season
-                ORDER BY g.season;
-            """
-            cursor.execute(sql, (team_id, team_id, team_id, team_id, competition_id))
+            # Búsqueda por clave primaria en el resumen por equipo y temporada
+            cursor.execute(TEAM_CHART_SQL['team_goals_scored'], (team_id, competition_id))
             goals_data = cursor.fetchall()
 
             if not goals_data:
                 return jsonify({"error": "No goals scored data found"}), 404
-
-            # Crear el gráfico
-            seasons = [row['season'] for row in goals_data]
-            goals_scored = [row['goals_scored'] for row in goals_data]
-
-            plt.figure(figsize=(10, 6))
-            plt.plot(seasons, goals_scored, marker='o', color='green', label='Goles realizados')
-            plt.xlabel('Temporada')
-            plt.ylabel('Goles Realizados')
-            plt.title('Goles realizados por temporada')
-            plt.grid(True)
-            plt.legend()
-
-            # Guardar la gráfica en un objeto de memoria
-            img = io.BytesIO()
-            plt.savefig(img, format='png')
-            img.seek(0)
-
-            # Devolver la gráfica como respuesta
-            return send_file(img, mimetype='image/png')
     finally:
         connection.close()
+
+    # La conexión ya está libre mientras se dibuja la gráfica
+    return chart_response('team_goals_scored', (team_id, competition_id), goals_data)
         
 @app.route('/api/team_goals_conceded_chart', methods=['GET'])
 def get_team_goals_conceded_chart():
@@ -615,48 +592,18 @@ def get_team_goals_conceded_chart():
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
-            sql = """
-                SELECT
-                    g.season,
-                    SUM(CASE 
-                        WHEN g.home_club_id = %s THEN g.away_club_goals
-                        WHEN g.away_club_id = %s THEN g.home_club_goals
-                        ELSE 0
-                    END) AS goals_conceded
-                FROM games g
-                WHERE (g.home_club_id = %s OR g.away_club_id = %s)
-                  AND g.competition_id = %s
-                GROUP BY g.season
-                ORDER BY g.season;
-            """
-            cursor.execute(sql, (team_id, team_id, team_id, team_id, competition_id))
+            # Búsqueda por clave primaria en el resumen por equipo y temporada
+            cursor.execute(TEAM_CHART_SQL['team_goals_conceded'], (team_id, competition_id))
             goals_data = cursor.fetchall()
 
             if not goals_data:
                 return jsonify({"error": "No goals conceded data found"}), 404
-
-            # Crear el gráfico
-            seasons = [row['season'] for row in goals_data]
-            goals_conceded = [row['goals_conceded'] for row in goals_data]
-
-            plt.figure(figsize=(10, 6))
-            plt.plot(seasons, goals_conceded, marker='o', color='red', label='Goles recibidos')
-            plt.xlabel('Temporada')
-            plt.ylabel('Goles Recibidos')
-            plt.title('Goles recibidos por temporada')
-            plt.grid(True)
-            plt.legend()
-
-            # Guardar la gráfica en un objeto de memoria
-            img = io.BytesIO()
-            plt.savefig(img, format='png')
-            img.seek(0)
-
-            # Devolver la gráfica como respuesta
-            return send_file(img, mimetype='image/png')
     finally:
         connection.close()
 
+    # La conexión ya está libre mientras se dibuja la gráfica
+    return chart_response('team_goals_conceded', (team_id, competition_id), goals_data)
+
 # Función para obtener los detalles del equipo por ID
 @app.route('/api/teams/<int:team_id>', methods=['GET'])
 def get_team_details(team_id):
@@ -664,18 +611,7 @@ def get_team_details(team_id):
     try:
         with connection.cursor() as cursor:
             # Consultar la base de datos para obtener los detalles del equipo
-            query = """
-            SELECT 
-                name, 
-                squad_size, 
-                average_age, 
-                national_team_players, 
-                foreigners_percentage, 
-                stadium_name
-            FROM Clubs
-            WHERE club_id = %s
-            """
-            cursor.execute(query, (team_id,))
+            cursor.execute(TEAM_DETAILS_SQL, (team_id,))
             result = cursor.fetchone()
 
             if result:
@@ -683,6 +619,7 @@ def get_team_details(team_id):
             else:
                 return jsonify({"error": "Team not found"}), 404
     except Exception as e:
+        log_error('team_details_error', e, team_id=team_id)
         return jsonify({"error": "Internal server error"}), 500
     finally:
         connection.close()
@@ -693,119 +630,51 @@ def get_player_goals_chart(player_id):
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
-            sql = """
-                SELECT YEAR(date) AS year, COUNT(*) AS goals
-                FROM game_events
-                WHERE player_id = %s AND type = 'Goals'
-                GROUP BY year
-                ORDER BY year;
-            """
-            cursor.execute(sql, (player_id,))
+            cursor.execute(PLAYER_CHART_SQL['player_goals'], (player_id,))
             goals_data = cursor.fetchall()
-            print(f"Goles por año: {goals_data}")
                 
             if not goals_data:
                 return jsonify({"error": "No data found for goals"}), 404
-
-            # Crear gráfico de goles
-            years = [row['year'] for row in goals_data]
-            goals = [row['goals'] for row in goals_data]
-
-            plt.figure(figsize=(10, 6))
-            plt.plot(years, goals, marker='o', color='green', label='Goles')
-            plt.xlabel('Año')
-            plt.ylabel('Goles')
-            plt.title('Goles por año')
-            plt.grid(True)
-            plt.legend()
-
-            # Guardar la gráfica en un objeto de memoria
-            img = io.BytesIO()
-            plt.savefig(img, format='png')
-            img.seek(0)
-
-            return send_file(img, mimetype='image/png')
     finally:
         connection.close()
 
+    # La conexión ya está libre mientras se dibuja la gráfica
+    return chart_response('player_goals', (player_id,), goals_data)
+
 
 @app.route('/api/player_cards_chart/<int:player_id>', methods=['GET'])
 def get_player_cards_chart(player_id):
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
-            sql = """
-                SELECT YEAR(date) AS year, COUNT(*) AS cards
-                FROM game_events
-                WHERE player_id = %s AND type = 'Cards'
-                GROUP BY year
-                ORDER BY year;
-            """
-            cursor.execute(sql, (player_id,))
+            cursor.execute(PLAYER_CHART_SQL['player_cards'], (player_id,))
             cards_data = cursor.fetchall()
 
             if not cards_data:
                 return jsonify({"error": "No data found for cards"}), 404
-
-            # Crear gráfico de tarjetas
-            years = [row['year'] for row in cards_data]
-            cards = [row['cards'] for row in cards_data]
-
-            plt.figure(figsize=(10, 6))
-            plt.plot(years, cards, marker='o', color='red', label='Tarjetas')
-            plt.xlabel('Año')
-            plt.ylabel('Tarjetas')
-            plt.title('Tarjetas por año')
-            plt.grid(True)
-            plt.legend()
-
-            img = io.BytesIO()
-            plt.savefig(img, format='png')
-            img.seek(0)
-
-            return send_file(img, mimetype='image/png')
     finally:
         connection.close()
 
+    # La conexión ya está libre mientras se dibuja la gráfica
+    return chart_response('player_cards', (player_id,), cards_data)
+
 
 @app.route('/api/player_assists_chart/<int:player_id>', methods=['GET'])
 def get_player_assists_chart(player_id):
     connection = get_db_connection()
     try:
         with connection.cursor() as cursor:
-            sql = """
-                SELECT YEAR(date) AS year, COUNT(*) AS assists
-                FROM game_events
-                WHERE player_assist_id = %s
-                GROUP BY year
-                ORDER BY year;
-            """
-            cursor.execute(sql, (player_id,))
+            cursor.execute(PLAYER_CHART_SQL['player_assists'], (player_id,))
             assists_data = cursor.fetchall()
 
             if not assists_data:
                 return jsonify({"error": "No data found for assists"}), 404
-
-            # Crear gráfico de asistencias
-            years = [row['year'] for row in assists_data]
-            assists = [row['assists'] for row in assists_data]
-
-            plt.figure(figsize=(10, 6))
-            plt.plot(years, assists, marker='o', color='blue', label='Asistencias')
-            plt.xlabel('Año')
-            plt.ylabel('Asistencias')
-            plt.title('Asistencias por año')
-            plt.grid(True)
-            plt.legend()
-
-            img = io.BytesIO()
-            plt.savefig(img, format='png')
-            img.seek(0)
-
-            return send_file(img, mimetype='image/png')
     finally:
         connection.close()
 
+    # La conexión ya está libre mientras se dibuja la gráfica
+    return chart_response('player_assists', (player_id,), assists_data)
+
 # Endpoint para obtener las predicciones del rendimiento del jugador
 @app.route('/api/players/<int:player_id>/predictions', methods=['GET'])
 def get_player_predictions(player_id):
@@ -815,16 +684,17 @@ def get_player_predictions(player_id):
         
         # Retorna las predicciones en formato JSON
         return jsonify(predictions), 200
+    except PoolExhausted:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     
 ########################################
-# ENTRENAMIENTO DE MODELOS PREDICTIVOS #
+# PREDICCIONES DE RENDIMIENTO          #
 ########################################
 
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split
-
+# El modelo se entrena y se puntúa a todos los jugadores por lotes (predictions.py);
+# aquí solo se consulta la predicción guardada
 def predict_player_performance(player_id):
     # Obtenemos la conexión a la base de datos
     connection = get_db_connection()
@@ -832,114 +702,38 @@ def predict_player_performance(player_id):
     try:
         # Establecemos un cursor para las consultas
         with connection.cursor() as cursor:
-            # SQL para obtener goles, asistencias y tarjetas por temporada
-            sql_goals = """
-                SELECT YEAR(date) AS year, COUNT(*) AS goals
-                FROM game_events
-                WHERE player_id = %s AND type = 'Goals'
-                GROUP BY year
-                ORDER BY year;
-            """
-            
-            sql_assists = """
-                SELECT YEAR(date) AS year, COUNT(*) AS assists
-                FROM game_events
-                WHERE player_assist_id = %s
-                GROUP BY year
-                ORDER BY year;
-            """
-            
-            sql_cards = """
-                SELECT YEAR(date) AS year, COUNT(*) AS cards
-                FROM game_events
-                WHERE player_id = %s AND type = 'Cards'
-                GROUP BY year
-                ORDER BY year;
-            """
-            
-            # Estimación del número de partidos jugados
-            sql_first_year = """
-                SELECT MIN(YEAR(date)) AS first_year FROM game_events
-                WHERE player_id = %s
-            """
-            sql_last_year = """
-                SELECT MAX(YEAR(date)) AS last_year FROM game_events
-                WHERE player_id = %s
-            """
-            
-            # Obtenemos goles por año
-            cursor.execute(sql_goals, (player_id,))
-            goals_data = cursor.fetchall()
-
-            # Obtenemos asistencias por año
-            cursor.execute(sql_assists, (player_id,))
-            assists_data = cursor.fetchall()
-
-            # Obtenemos tarjetas por año
-            cursor.execute(sql_cards, (player_id,))
-            cards_data = cursor.fetchall()
-
-            # Obtenemos el primer y último año de la carrera del jugador
-            cursor.execute(sql_first_year, (player_id,))
-            first_year_result = cursor.fetchone()
-            first_year = first_year_result['first_year'] if first_year_result else None
-
-            cursor.execute(sql_last_year, (player_id,))
-            last_year_result = cursor.fetchone()
-            last_year = last_year_result['last_year'] if last_year_result else None
-
-            if first_year is not None and last_year is not None:
-                years_played = last_year - first_year + 1
-                estimated_games_played = years_played * 40
-            else:
-                estimated_games_played = 0
-
-            # Convertimos los datos a DataFrame para facilitar el manejo
-            df_goals = pd.DataFrame(goals_data, columns=['year', 'goals'])
-            df_assists = pd.DataFrame(assists_data, columns=['year', 'assists'])
-            df_cards = pd.DataFrame(cards_data, columns=['year', 'cards'])
-
-            # Unimos los datos por año para tener un dataset completo
-            df = pd.merge(df_goals, df_assists, on='year', how='outer').fillna(0)
-            df = pd.merge(df, df_cards, on='year', how='outer').fillna(0)
-
-            # Ahora usamos el total de partidos jugados en la carrera para hacer la predicción
-            X = df[['assists', 'cards']]  # Features
-            y = df['goals']  # Label (goles)
-
-            # Dividimos los datos en entrenamiento y prueba
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-            # Entrenamos un modelo de regresión lineal
-            model = LinearRegression()
-            model.fit(X_train, y_train)
-
-            # Realizamos la predicción para los próximos 40 partidos
-            # Podemos usar el promedio de asistencias y tarjetas como valores futuros estimados
-            average_assists = df['assists'].mean()
-            average_cards = df['cards'].mean()
-
-            predicted_goals_2024 = model.predict([[average_assists, average_cards]])
-
-            # Hacemos lo mismo para asistencias y tarjetas si deseas predecir esas estadísticas también
-            predicted_assists_2024 = average_assists * (40 / estimated_games_played) if estimated_games_played > 0 else 0
-            predicted_cards_2024 = average_cards * (40 / estimated_games_played) if estimated_games_played > 0 else 0
-
-            # Devolvemos los resultados
-            return {
-                "predicted_goals_2024": round(predicted_goals_2024[0],2),  # Predicción para goles
-                "predicted_assists_2024": round(predicted_assists_2024,2),  # Predicción para asistencias
-                "predicted_cards_2024": round(predicted_cards_2024,2)  # Predicción para tarjetas
-            }
+            try:
+                cursor.execute(STORED_PREDICTION_SQL, (player_id,))
+                prediction = cursor.fetchone()
+            except pymysql.err.ProgrammingError:
+                # La tabla aún no existe porque no se ha lanzado el proceso por lotes
+                prediction = None
+
+            if prediction:
+                return prediction
+
+            # Jugador sin predicción guardada: se puntúa al vuelo con el modelo guardado (o entrenando
+            # uno con sus datos), una sola vez por jugador, versión del dataset y versión del modelo
+            key = (player_id, model_version())
+            prediction, version = prediction_cache.get(key)
+            if prediction is None:
+                prediction = predict_single_player(cursor, player_id)
+                if prediction is not None:
+                    prediction_cache.set(key, prediction, version)
+            return prediction
     
     except Exception as e:
-        print(f"Error while predicting player performance: {e}")
+        log_error('prediction_error', e, player_id=player_id)
         return None
     
     finally:
-        # Asegurarse de cerrar la conexión a la base de datos
+        # Devolver la conexión al pool
         connection.close()
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    debug = True
+    # Con debug el recargador de Werkzeug relanza el script: solo el proceso hijo sirve peticiones
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_server_work()
+    app.run(debug=debug)
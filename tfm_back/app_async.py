@@ -0,0 +1,676 @@
+"""Modo de servicio asíncrono (ASGI) de la API de consulta de app.py.
+
+Los mismos endpoints y la misma SQL (queries.py) sobre Quart y un pool de
+conexiones aiomysql. Mientras una petición espera a MySQL el bucle de eventos
+atiende a las demás, así que un proceso mantiene miles de peticiones en curso
+con solo TFM_DB_POOL_SIZE conexiones abiertas; las que no consiguen conexión
+esperan en el pool sin ocupar un hilo.
+
+Las consultas independientes de un mismo endpoint se lanzan a la vez con
+``asyncio.gather``, cada una con su conexión: datos y estadísticas del jugador,
+estadísticas por año y años de carrera para la predicción, y total y página de
+las búsquedas.
+
+    hypercorn app_async:app --bind 0.0.0.0:5000
+
+La puntuación con el modelo (/predict y /predict/batch) sigue en app.py.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+import aiomysql
+import pandas as pd
+import pymysql
+from quart import Quart, Response, g, jsonify, request
+from quart_cors import cors
+
+from cache import LRUCache, VersionedCache
+from charts import (ChartCache, ChartRenderer, RendererBusy, RenderTimeout,
+                    chart_data, chart_key, chart_series, render_chart_svg)
+from db_pool import DATASET_VERSION_SQL, DB_CONFIG, DB_POOL_SIZE, DB_POOL_TIMEOUT, PoolExhausted
+from metrics import (CHART_RENDER, CONTENT_TYPE, POOL_TIMEOUTS, POOL_WAIT, Gauge, finish_request, log_error, log_event,
+                     record_query, render, start_request)
+from model_store import ModelStore
+from predictions import STORED_PREDICTION_SQL, model_version, score_single_player, stats_frames, yearly_stats_queries
+from queries import (CLUBS_BY_COMPETITION_SQL, COMPETITION_SEASONS_SQL, COMPETITIONS_BY_TYPE_SQL, COMPETITIONS_SQL,
+                     PLAYER_CHART_SQL, PLAYER_SQL, PLAYER_STATS_SQL, SEASONS_SQL, TEAM_CHART_SQL, TEAM_DETAILS_SQL,
+                     TEAMS_SQL, TOP_SCORERS_SQL, games_query, next_players_cursor, player_stats, players_query,
+                     teams_query)
+from responses import CachedBody, etag_for, matching_etag, not_modified, send_body, send_stream
+from search_index import SEARCH_KINDS, SearchIndex
+
+app = cors(Quart("__TFM__"))
+
+# Modelo en uso (última versión de models/, recargada sin reiniciar; si no hay, model.pkl).
+# Se carga al arrancar el servidor, no al importar: los procesos de gráficos (spawn) reimportan el módulo principal
+model_store = ModelStore(preload=False)
+
+# Segundos entre consultas a dataset_version
+DATASET_CHECK_INTERVAL = float(os.environ.get('TFM_DATASET_CHECK_INTERVAL', 5))
+
+# Partidos por bloque en las respuestas en streaming de /api/games
+STREAM_BATCH_ROWS = int(os.environ.get('TFM_STREAM_BATCH_ROWS', 500))
+
+# Formatos de los endpoints de gráficos: PNG (por defecto), la serie en JSON o un SVG ligero
+CHART_FORMATS = ('png', 'json', 'svg')
+
+# Pool aiomysql (se crea al arrancar el servidor, dentro de su bucle de eventos)
+db_pool = None
+pool_counters = {'checkouts': 0, 'timeouts': 0, 'wait_seconds_total': 0.0, 'wait_seconds_max': 0.0}
+
+# Última versión leída de dataset_version, índice de autocompletado de esa versión y tareas en segundo plano:
+# la que consulta la versión, la que construye el índice y la que precarga la caché de respuestas
+dataset_state = {'version': None, 'search_index': None, 'watcher': None, 'search_task': None, 'warm_task': None}
+
+count_cache = LRUCache(maxsize=2048, ttl=int(os.environ.get('TFM_COUNT_CACHE_TTL', 300)))
+
+# Predicciones calculadas al vuelo para jugadores sin fila en player_predictions
+prediction_cache = VersionedCache(lambda: dataset_state['version'],
+                                  maxsize=int(os.environ.get('TFM_PREDICTION_CACHE_SIZE', 4096)))
+
+chart_cache = ChartCache(
+    max_bytes=int(os.environ.get('TFM_CHART_CACHE_MB', 64)) * 1024 * 1024,
+    directory=os.environ.get('TFM_CHART_CACHE_DIR') or None
+)
+
+# Pool de procesos que dibuja los gráficos; se espera desde un hilo para no bloquear el bucle
+chart_renderer = ChartRenderer()
+
+
+def aiomysql_config():
+    # DB_CONFIG de pymysql con los nombres que usa aiomysql
+    config = {key: value for key, value in DB_CONFIG.items() if key not in ('database', 'cursorclass')}
+    config['db'] = DB_CONFIG['database']
+    config['cursorclass'] = aiomysql.DictCursor
+    return config
+
+
+async def acquire_connection():
+    start = time.perf_counter()
+    try:
+        connection = await asyncio.wait_for(db_pool.acquire(), timeout=DB_POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        pool_counters['timeouts'] += 1
+        POOL_TIMEOUTS.inc()
+        raise PoolExhausted(f'No hay conexiones libres tras {DB_POOL_TIMEOUT} s (tamaño del pool: {DB_POOL_SIZE})')
+    waited = time.perf_counter() - start
+    pool_counters['checkouts'] += 1
+    pool_counters['wait_seconds_total'] += waited
+    pool_counters['wait_seconds_max'] = max(pool_counters['wait_seconds_max'], waited)
+    POOL_WAIT.observe(waited)
+    return connection
+
+
+@asynccontextmanager
+async def db_cursor(*cursorclass):
+    connection = await acquire_connection()
+    try:
+        async with connection.cursor(*cursorclass) as cursor:
+            yield cursor
+    finally:
+        db_pool.release(connection)
+
+
+async def execute(cursor, sql, params=None):
+    # Cada consulta se mide para /metrics (tiempo por tabla y consultas por petición)
+    start = time.perf_counter()
+    try:
+        await cursor.execute(sql, params)
+    finally:
+        record_query(sql, time.perf_counter() - start)
+
+
+async def fetchall(sql, params=None):
+    async with db_cursor() as cursor:
+        await execute(cursor, sql, params)
+        return await cursor.fetchall()
+
+
+async def fetchone(sql, params=None):
+    async with db_cursor() as cursor:
+        await execute(cursor, sql, params)
+        return await cursor.fetchone()
+
+
+def log_task_error(task):
+    # Las tareas en segundo plano no tienen a nadie esperando su resultado: sus errores se registran aquí
+    if not task.cancelled() and task.exception() is not None:
+        log_error(f'{task.get_name()}_error', task.exception())
+
+
+def start_task(name, coro):
+    # Se guarda la referencia en dataset_state para que la tarea no se pierda antes de terminar
+    task = asyncio.get_running_loop().create_task(coro, name=name)
+    task.add_done_callback(log_task_error)
+    dataset_state[name] = task
+    return task
+
+
+async def build_search_index(version):
+    players, clubs = await asyncio.gather(
+        fetchall("SELECT player_id, name, country_of_citizenship, market_value_in_eur FROM players"),
+        fetchall("SELECT club_id, name FROM clubs"),
+    )
+    # Construir el índice es CPU: fuera del bucle de eventos
+    index = await asyncio.to_thread(SearchIndex.from_records, players, clubs)
+    # Si entretanto ha llegado otra versión, su propia tarea construye el índice
+    if version == dataset_state['version']:
+        dataset_state['search_index'] = index
+
+
+def search_index_task():
+    # Tarea que construye el índice; todas las peticiones que lo esperan comparten la misma
+    task = dataset_state['search_task']
+    if task is None or task.done():
+        task = start_task('search_task', build_search_index(dataset_state['version']))
+    return task
+
+
+def on_dataset_change(version):
+    # Datos nuevos: fuera los totales en caché, se reconstruye el índice de autocompletado y se precarga la caché
+    count_cache.clear()
+    start_task('search_task', build_search_index(version))
+    start_task('warm_task', warm_reference_cache())
+
+
+# Datos de referencia (competiciones, equipos, temporadas), vaciados con cada versión nueva del dataset
+response_cache = VersionedCache(lambda: dataset_state['version'],
+                                maxsize=None, sizeof=CachedBody.size,
+                                maxbytes=int(os.environ.get('TFM_RESPONSE_CACHE_MB', 32)) * 1024 * 1024,
+                                on_change=on_dataset_change)
+
+
+async def refresh_dataset_version():
+    try:
+        row = await fetchone(DATASET_VERSION_SQL)
+        dataset_state['version'] = row['version'] if row else None
+    except pymysql.err.ProgrammingError:
+        # Sin migraciones aplicadas: la versión no cambia nunca
+        dataset_state['version'] = None
+    response_cache.current_version()
+
+
+async def watch_dataset_version():
+    while True:
+        await asyncio.sleep(DATASET_CHECK_INTERVAL)
+        try:
+            await refresh_dataset_version()
+        except Exception as e:
+            log_error('dataset_version_error', e)
+
+
+@app.before_serving
+async def start_pool():
+    global db_pool
+    await asyncio.to_thread(model_store.get)
+    # minsize=0: las conexiones se abren bajo demanda, igual que en db_pool.ConnectionPool
+    db_pool = await aiomysql.create_pool(minsize=0, maxsize=DB_POOL_SIZE, **aiomysql_config())
+    # La primera versión leída llama a on_dataset_change, que lanza el índice y la precarga de la caché
+    try:
+        await refresh_dataset_version()
+    except Exception as e:
+        log_error('dataset_version_error', e)
+    start_task('watcher', watch_dataset_version())
+
+
+@app.after_serving
+async def close_pool():
+    for name in ('watcher', 'search_task', 'warm_task'):
+        if dataset_state[name] is not None:
+            dataset_state[name].cancel()
+    db_pool.close()
+    await db_pool.wait_closed()
+    chart_renderer.shutdown()
+
+
+@app.errorhandler(PoolExhausted)
+async def pool_exhausted(e):
+    response = jsonify({"error": str(e)})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+@app.errorhandler(pymysql.err.Error)
+async def database_error(e):
+    log_error('database_error', e, endpoint=request.url_rule.rule if request.url_rule else None)
+    return jsonify({"error": str(e)}), 500
+
+
+@app.before_request
+async def start_request_metrics():
+    # El endpoint es la plantilla de la ruta, no la URL; las tareas de asyncio.gather heredan el estado
+    g.request_metrics = start_request(request.url_rule.rule if request.url_rule else 'unmatched')
+
+
+@app.after_request
+async def record_request_metrics(response):
+    state = g.pop('request_metrics', None)
+    if state is not None:
+        finish_request(state, request.method, response.status_code)
+    return response
+
+
+async def chart_response(kind, params, rows):
+    fmt = request.args.get('format', 'png')
+    if fmt not in CHART_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(CHART_FORMATS)}"}), 400
+
+    # La ETag es el hash de (gráfico, parámetros, datos): si el cliente ya la tiene no se envía nada
+    key = chart_key(kind, params, rows)
+    etag = key if fmt == 'png' else f"{key}-{fmt}"
+    if request.if_none_match.contains(etag):
+        response = Response('', status=304)
+        response.set_etag(etag)
+        return response
+
+    xs, ys = chart_series(kind, rows)
+    if fmt == 'json':
+        response = jsonify(chart_data(kind, xs, ys))
+    elif fmt == 'svg':
+        svg = chart_cache.get(key, ext='svg')
+        if svg is None:
+            start = time.perf_counter()
+            svg = render_chart_svg(kind, xs, ys)
+            CHART_RENDER.observe(time.perf_counter() - start, kind, fmt)
+            chart_cache.set(key, svg, ext='svg')
+        response = Response(svg, mimetype='image/svg+xml')
+    else:
+        png = chart_cache.get(key)
+        if png is None:
+            try:
+                start = time.perf_counter()
+                png = await asyncio.to_thread(chart_renderer.render, kind, xs, ys)
+                CHART_RENDER.observe(time.perf_counter() - start, kind, fmt)
+            except RendererBusy:
+                # Saturado: el cliente debe reintentar más tarde
+                response = jsonify({"error": "Chart renderer is busy, retry later"})
+                response.status_code = 503
+                response.headers['Retry-After'] = '1'
+                return response
+            except RenderTimeout:
+                return jsonify({"error": "Chart rendering timed out"}), 504
+            chart_cache.set(key, png)
+        response = Response(png, mimetype='image/png')
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def reference_key(sql, *args):
+    return (sql,) + tuple(str(arg) for arg in args)
+
+
+async def cached_reference(sql, *args, not_found=None):
+    # Cuerpo JSON desde la caché o consultando MySQL una sola vez por versión del dataset
+    key = reference_key(sql, *args)
+    entry, version = response_cache.get(key)
+    if entry is None:
+        rows = await fetchall(sql, args or None)
+        data, status = ({"error": not_found}, 404) if not rows and not_found else (rows, 200)
+        # ETag fuerte de la versión del dataset; las versiones comprimidas se guardan en la misma entrada
+        etag = etag_for(version, *key) if version is not None else None
+        entry = CachedBody((app.json.dumps(data) + '\n').encode('utf-8'), status=status, etag=etag)
+        response_cache.set(key, entry, version)
+    return entry
+
+
+async def reference_response(sql, *args, not_found=None):
+    entry = await cached_reference(sql, *args, not_found=not_found)
+    size = entry.size()
+    response = send_body(entry, request=request, response_class=Response)
+    if entry.size() != size:
+        # Se ha guardado una versión comprimida nueva en la entrada: cuenta para el límite de bytes
+        response_cache.resize(reference_key(sql, *args))
+    return response
+
+
+# Mensajes de los endpoints de referencia sin datos (forman parte del cuerpo en caché)
+NO_SEASONS = "No games found for the given competition_id"
+NO_TEAMS = "No teams found"
+
+
+async def warm_reference_cache():
+    # Todas las competiciones, tipos, equipos por competición, temporadas y equipos por temporada.
+    # Una consulta detrás de otra: la precarga no ocupa más de una conexión del pool
+    try:
+        competitions = app.json.loads((await cached_reference(COMPETITIONS_SQL)).body)
+        for competition in competitions:
+            await cached_reference(CLUBS_BY_COMPETITION_SQL, competition['competition_id'])
+            await cached_reference(SEASONS_SQL, competition['competition_id'], not_found=NO_SEASONS)
+        for comp_type in {competition['type'] for competition in competitions}:
+            await cached_reference(COMPETITIONS_BY_TYPE_SQL, comp_type)
+        for pair in await fetchall(COMPETITION_SEASONS_SQL):
+            await cached_reference(TEAMS_SQL, pair['competition_id'], pair['season'], not_found=NO_TEAMS)
+        log_event('reference_cache_warmed', entries=len(response_cache))
+    except Exception as e:
+        log_error('reference_cache_warm_error', e)
+
+
+@app.route('/')
+async def home():
+    return "Bienvenido a la predicción del rendimiento de jugadores de fútbol"
+
+
+@app.route('/api/pool_stats', methods=['GET'])
+async def get_pool_stats():
+    checkouts = pool_counters['checkouts']
+    return jsonify({
+        'size': DB_POOL_SIZE,
+        'open': db_pool.size,
+        'idle': db_pool.freesize,
+        'checkouts': checkouts,
+        'timeouts': pool_counters['timeouts'],
+        'wait_seconds_total': round(pool_counters['wait_seconds_total'], 6),
+        'wait_seconds_avg': round(pool_counters['wait_seconds_total'] / checkouts, 6) if checkouts else 0.0,
+        'wait_seconds_max': round(pool_counters['wait_seconds_max'], 6),
+    })
+
+
+# Estado del pool y de las cachés, leído al servir /metrics
+Gauge('tfm_db_pool_connections', 'Conexiones del pool por estado',
+      lambda: {('open',): db_pool.size, ('idle',): db_pool.freesize} if db_pool else {}, ('state',))
+Gauge('tfm_response_cache_entries', 'Respuestas en la caché de datos de referencia', lambda: len(response_cache))
+Gauge('tfm_response_cache_bytes', 'Bytes de la caché de datos de referencia (cuerpos y versiones comprimidas)',
+      lambda: response_cache.stats()['bytes'])
+Gauge('tfm_chart_renderer_rejected', 'Gráficos rechazados por el pool de dibujo saturado',
+      lambda: chart_renderer.stats()['rejected'])
+
+
+# Métricas en formato de texto de Prometheus
+@app.route('/metrics', methods=['GET'])
+async def get_metrics():
+    return Response(render(), content_type=CONTENT_TYPE)
+
+
+@app.route('/api/cache_stats', methods=['GET'])
+async def get_cache_stats():
+    return jsonify({
+        "responses": response_cache.stats(),
+        "counts": count_cache.stats(),
+        "predictions": prediction_cache.stats(),
+        "charts": chart_cache.stats()
+    })
+
+
+# Versión y esquema de columnas del modelo en uso
+@app.route('/api/model_info', methods=['GET'])
+async def get_model_info():
+    return jsonify(model_store.metadata())
+
+
+@app.route('/predict/<int:player_id>', methods=['GET'])
+async def predict_player(player_id):
+    sql = "SELECT assists, minutes_played, yellow_cards, red_cards FROM players WHERE player_id = %s"
+    player_data = await fetchone(sql, (player_id,))
+    if not player_data:
+        return jsonify({'error': 'Jugador no encontrado'}), 404
+
+    prediction = await asyncio.to_thread(model_store.get().predict, pd.DataFrame([player_data]))
+    return jsonify({'player_id': player_id, 'prediction': prediction[0]})
+
+
+@app.route('/api/competitions', methods=['GET'])
+async def get_competitions():
+    return await reference_response(COMPETITIONS_SQL)
+
+
+@app.route('/api/competitions/<comp_type>', methods=['GET'])
+async def get_competitions_by_type(comp_type):
+    return await reference_response(COMPETITIONS_BY_TYPE_SQL, comp_type)
+
+
+@app.route('/api/clubs/<competition_id>', methods=['GET'])
+async def get_clubs_by_competition(competition_id):
+    return await reference_response(CLUBS_BY_COMPETITION_SQL, competition_id)
+
+
+@app.route('/api/seasons', methods=['GET'])
+async def get_seasons_by_competition():
+    competition_id = request.args.get('competition_id')
+    if not competition_id:
+        return jsonify({"error": "competition_id is required"}), 400
+    return await reference_response(SEASONS_SQL, competition_id, not_found=NO_SEASONS)
+
+
+@app.route('/api/teams', methods=['GET'])
+async def get_teams_by_competition_and_season():
+    competition_id = request.args.get('competition_id')
+    season = request.args.get('season')
+    if not competition_id or not season:
+        return jsonify({"error": "competition_id and season are required"}), 400
+    return await reference_response(TEAMS_SQL, competition_id, season, not_found=NO_TEAMS)
+
+
+@app.route('/api/players', methods=['GET'])
+async def search_players():
+    try:
+        count_sql, count_params, page_sql, page_params, per_page = players_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Total (si no está en caché) y página a la vez
+    count_key = ('players', count_sql, tuple(count_params))
+    total = count_cache.get(count_key)
+    if total is None:
+        count_row, players = await asyncio.gather(fetchone(count_sql, count_params), fetchall(page_sql, page_params))
+        total = count_row['total']
+        count_cache.set(count_key, total)
+    else:
+        players = await fetchall(page_sql, page_params)
+
+    return jsonify({
+        "players": players,
+        "total": total,
+        "next_after": next_players_cursor(players, per_page)
+    })
+
+
+# Autocompletado: ?q=texto&type=player,club,country&limit=10, sin acentos ni mayúsculas y ordenado por relevancia
+@app.route('/api/typeahead', methods=['GET'])
+async def typeahead():
+    query = request.args.get('q', default='')
+    kinds = [kind for kind in request.args.get('type', default='').split(',') if kind]
+    if any(kind not in SEARCH_KINDS for kind in kinds):
+        return jsonify({"error": f"type must be a comma-separated list of {', '.join(SEARCH_KINDS)}"}), 400
+    limit = min(max(request.args.get('limit', default=10, type=int), 1), 50)
+    while dataset_state['search_index'] is None:
+        # El índice se está construyendo por primera vez: se espera a esa misma tarea (shield: si el
+        # cliente corta la petición, la construcción sigue para los demás)
+        await asyncio.shield(search_index_task())
+    return jsonify({"results": dataset_state['search_index'].search(query, kinds or None, limit)})
+
+
+@app.route('/api/top_scorers', methods=['GET'])
+async def get_top_scorers():
+    top_scorers = await fetchall(TOP_SCORERS_SQL)
+    if not top_scorers:
+        return jsonify({'error': 'No se encontraron jugadores con goles'}), 404
+    return jsonify(top_scorers)
+
+
+@app.route('/api/players/<int:player_id>', methods=['GET'])
+async def get_player_by_id(player_id):
+    # Datos del jugador y estadísticas a la vez
+    player, stats = await asyncio.gather(
+        fetchone(PLAYER_SQL, (player_id,)),
+        fetchone(PLAYER_STATS_SQL, {'player_id': player_id}),
+    )
+    if not player:
+        return jsonify({'error': 'Jugador no encontrado'}), 404
+    return jsonify({
+        "player": player,
+        "stats": player_stats(stats)
+    })
+
+
+@app.route('/api/games', methods=['GET'])
+async def get_games_by_competition():
+    competition_id = request.args.get('competition_id')
+    season = request.args.get('season')
+
+    if not competition_id:
+        return jsonify({"error": "competition_id is required"}), 400
+
+    # Los partidos solo cambian con el dataset: si el cliente ya tiene esta versión no se consulta MySQL
+    version = dataset_state['version']
+    etag = etag_for(version, 'games', competition_id, season or '') if version is not None else None
+    matched = matching_etag(etag, request) if etag else None
+    if matched:
+        return not_modified(matched, Response)
+
+    # Cursor sin búfer: las filas se leen de MySQL a medida que se envían
+    connection = await acquire_connection()
+    cursor = None
+    streaming = False
+    try:
+        cursor = await connection.cursor(aiomysql.SSDictCursor)
+        await execute(cursor, *games_query(competition_id, season))
+        first = await cursor.fetchone()
+        if first is None:
+            return jsonify({"error": "No games found"}), 404
+
+        async def generate():
+            try:
+                yield '[' + app.json.dumps(first)
+                while True:
+                    games = await cursor.fetchmany(STREAM_BATCH_ROWS)
+                    if not games:
+                        break
+                    yield ''.join(',' + app.json.dumps(game) for game in games)
+                yield ']\n'
+            finally:
+                # La conexión vuelve al pool cuando termina (o se corta) el envío
+                await release_streaming(connection, cursor)
+
+        streaming = True
+        # Comprimido al vuelo con gzip/brotli según Accept-Encoding
+        return send_stream(generate(), etag=etag, request=request, response_class=Response)
+    finally:
+        if not streaming:
+            await release_streaming(connection, cursor)
+
+
+async def release_streaming(connection, cursor):
+    try:
+        # close() lee las filas que queden sin enviar para dejar la conexión utilizable
+        if cursor is not None:
+            await cursor.close()
+    except Exception:
+        connection.close()
+    db_pool.release(connection)
+
+
+@app.route('/api/teamsSearch', methods=['GET'])
+async def get_teams():
+    try:
+        count_sql, params, page_sql, page_params = teams_query(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    count_key = ('teams', count_sql, tuple(params))
+    total = count_cache.get(count_key)
+    if total is None:
+        count_row, teams = await asyncio.gather(fetchone(count_sql, params), fetchall(page_sql, page_params))
+        total = count_row['total']
+        count_cache.set(count_key, total)
+    else:
+        teams = await fetchall(page_sql, page_params) if total else []
+
+    if not total:
+        return jsonify({"teams": [], "total": 0}), 200
+    return jsonify({
+        "teams": teams,
+        "total": total
+    })
+
+
+@app.route('/api/teams/<int:team_id>', methods=['GET'])
+async def get_team_details(team_id):
+    result = await fetchone(TEAM_DETAILS_SQL, (team_id,))
+    if result:
+        return jsonify(result), 200
+    return jsonify({"error": "Team not found"}), 404
+
+
+# Gráficos de equipo por temporada: (ruta, gráfico, mensaje si no hay datos)
+TEAM_CHARTS = [
+    ('/api/team_performance_chart', 'team_performance', "No performance data found"),
+    ('/api/team_goals_scored_chart', 'team_goals_scored', "No goals scored data found"),
+    ('/api/team_goals_conceded_chart', 'team_goals_conceded', "No goals conceded data found"),
+]
+
+PLAYER_CHARTS = [
+    ('/api/player_goals_chart/<int:player_id>', 'player_goals', "No data found for goals"),
+    ('/api/player_cards_chart/<int:player_id>', 'player_cards', "No data found for cards"),
+    ('/api/player_assists_chart/<int:player_id>', 'player_assists', "No data found for assists"),
+]
+
+
+def team_chart_view(kind, not_found):
+    async def view():
+        team_id = request.args.get('team_id')
+        competition_id = request.args.get('competition_id')
+        if not team_id or not competition_id:
+            return jsonify({"error": "team_id and competition_id are required"}), 400
+        rows = await fetchall(TEAM_CHART_SQL[kind], (team_id, competition_id))
+        if not rows:
+            return jsonify({"error": not_found}), 404
+        return await chart_response(kind, (team_id, competition_id), rows)
+    return view
+
+
+def player_chart_view(kind, not_found):
+    async def view(player_id):
+        rows = await fetchall(PLAYER_CHART_SQL[kind], (player_id,))
+        if not rows:
+            return jsonify({"error": not_found}), 404
+        return await chart_response(kind, (player_id,), rows)
+    return view
+
+
+for rule, kind, not_found in TEAM_CHARTS:
+    app.add_url_rule(rule, f'get_{kind}_chart', team_chart_view(kind, not_found), methods=['GET'])
+for rule, kind, not_found in PLAYER_CHARTS:
+    app.add_url_rule(rule, f'get_{kind}_chart', player_chart_view(kind, not_found), methods=['GET'])
+
+
+@app.route('/api/players/<int:player_id>/predictions', methods=['GET'])
+async def get_player_predictions(player_id):
+    try:
+        return jsonify(await predict_player_performance(player_id)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+async def predict_player_performance(player_id):
+    try:
+        prediction = await fetchone(STORED_PREDICTION_SQL, (player_id,))
+    except pymysql.err.ProgrammingError:
+        # La tabla aún no existe porque no se ha lanzado el proceso por lotes
+        prediction = None
+    if prediction:
+        return prediction
+
+    # Jugador sin predicción guardada: estadísticas por año y años de carrera a la vez, y se puntúa al vuelo
+    # una sola vez por jugador, versión del dataset y versión del modelo
+    try:
+        key = (player_id, model_version())
+        prediction, version = prediction_cache.get(key)
+        if prediction is None:
+            yearly_rows, career_rows = await asyncio.gather(
+                *(fetchall(sql, params) for sql, params in yearly_stats_queries(player_id)))
+            prediction = await asyncio.to_thread(score_single_player, *stats_frames(yearly_rows, career_rows))
+            if prediction is not None:
+                prediction_cache.set(key, prediction, version)
+        return prediction
+    except Exception as e:
+        log_error('prediction_error', e, player_id=player_id)
+        return None
+
+
+if __name__ == '__main__':
+    app.run(debug=True)
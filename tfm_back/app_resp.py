@@ -1,16 +1,23 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import joblib
 import pandas as pd
+from batch_scoring import batch_predict_response
+from data_engine import DataEngine, PlayerFeatures
+from model_store import ModelStore
+from search_index import SEARCH_KINDS
 
 app = Flask("__TFM__")
 CORS(app) 
 
-# Cargar el modelo
-model = joblib.load('model.pkl')
+# Cargar el modelo (última versión de models/, recargada sin reiniciar; si no hay, model.pkl)
+model_store = ModelStore()
 
-# Cargar el dataset de jugadores
-merged_data = pd.read_csv('merged_data.csv') 
+# Tablas limpias de data.py en memoria (Parquet, Feather o CSV de TFM_CLEAN_DIR),
+# con índices por id y por grupo; se recargan solas cuando cambian los ficheros
+data_engine = DataEngine()
+
+# Cargar el dataset de jugadores: solo las columnas del modelo, agrupadas por player_id
+player_features = PlayerFeatures('merged_data.csv')
 
 @app.route('/')
 def home():
@@ -20,30 +27,45 @@ def home():
 def predict():
     data = request.json
     input_data = pd.DataFrame([data])
-    prediction = model.predict(input_data)
+    prediction = model_store.get().predict(input_data)
     return jsonify({'prediction': prediction[0]})
 
+# Puntuación por lotes: lista JSON o NDJSON de filas, resultados en NDJSON en el mismo orden
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    return batch_predict_response(model_store.get())
+
+# Versión y esquema de columnas del modelo en uso
+@app.route('/api/model_info', methods=['GET'])
+def get_model_info():
+    return jsonify(model_store.metadata())
+
 @app.route('/predict/<int:player_id>', methods=['GET'])
 def predict_player(player_id):
-    # Buscar los datos del jugador por player_id
-    player_data = merged_data[merged_data['player_id'] == player_id]
-    
-    if player_data.empty:
+    # Filas del jugador por su índice (sin recorrer merged_data) y predicción en caché por versión del modelo
+    model, version = model_store.current()
+    prediction = player_features.predict(model, player_id, version=version)
+
+    if prediction is None:
         return jsonify({'error': 'Jugador no encontrado'}), 404
-    
-    # Seleccionar solo las columnas necesarias para la predicción
-    input_data = player_data[['assists', 'minutes_played', 'yellow_cards', 'red_cards']]  # Reemplaza con las características relevantes
 
-    # Hacer la predicción
-    prediction = model.predict(input_data)
-    
     # Devolver el resultado como JSON
-    return jsonify({'player_id': player_id, 'prediction': prediction[0]})
+    return jsonify({'player_id': player_id, 'prediction': prediction})
+
+# Autocompletado de jugadores, clubes y nacionalidades (índice reconstruido con cada recarga de los datos)
+@app.route('/api/typeahead', methods=['GET'])
+def typeahead():
+    query = request.args.get('q', default='')
+    kinds = [kind for kind in request.args.get('type', default='').split(',') if kind]
+    if any(kind not in SEARCH_KINDS for kind in kinds):
+        return jsonify({"error": f"type must be a comma-separated list of {', '.join(SEARCH_KINDS)}"}), 400
+    limit = min(max(request.args.get('limit', default=10, type=int), 1), 50)
+    return jsonify({"results": data_engine.snapshot().search.search(query, kinds or None, limit)})
 
 @app.route('/api/competitions', methods=['GET'])
 def get_competitions():
-  # Lee el archivo CSV
-  competitions = pd.read_csv('D:/UEM/TFM/tfm/data/competitions.csv')
+  # Tabla ya cargada en memoria: no se lee ningún fichero por petición
+  competitions = data_engine.snapshot().table('competitions')
   # Convierte el DataFrame a JSON
   competitions_json = competitions.to_json(orient='records')
   # Retorna directamente el JSON
@@ -51,10 +73,8 @@ def get_competitions():
 
 @app.route('/api/competitions/<comp_type>', methods=['GET'])
 def get_competitions_by_type(comp_type):
-    # Lee el archivo CSV
-    competitions = pd.read_csv('D:/UEM/TFM/tfm/data/competitions.csv')
-    # Filtra por el tipo de competición
-    filtered_competitions = competitions[competitions['type'] == comp_type]
+    # Competiciones del tipo pedido a partir del índice por tipo
+    filtered_competitions = data_engine.snapshot().rows('competitions', 'type', comp_type)
     # Convierte el DataFrame filtrado a JSON
     competitions_json = filtered_competitions.to_json(orient='records')
     # Retorna directamente el JSON
@@ -65,10 +85,8 @@ def get_competitions_by_type(comp_type):
 ## Devolvemos los equipos segun el ID de la competicion
 @app.route('/api/clubs/<competition_id>', methods=['GET'])
 def get_clubs_by_competition(competition_id):
-    # Lee el archivo CSV
-    clubs = pd.read_csv('D:/UEM/TFM/tfm/data/clubs.csv')
-    # Filtra los equipos por el id de la competición
-    filtered_clubs = clubs[clubs['domestic_competition_id'] == competition_id]
+    # Equipos de la competición a partir del índice por competición
+    filtered_clubs = data_engine.snapshot().rows('clubs', 'domestic_competition_id', competition_id)
     # Convierte el DataFrame filtrado a JSON
     clubs_json = filtered_clubs.to_json(orient='records')
     return clubs_json
@@ -76,8 +94,7 @@ def get_clubs_by_competition(competition_id):
 
 @app.route('/api/players', methods=['GET'])
 def search_players():
-    # Lee el archivo CSV
-    players = pd.read_csv('D:/UEM/TFM/tfm/data/players.csv')
+    data = data_engine.snapshot()
 
     # Obtén los parámetros de búsqueda de la URL
     name = request.args.get('name', default=None)
@@ -86,13 +103,12 @@ def search_players():
     page = int(request.args.get('page', 1))
     per_page = int(request.args.get('per_page', 10))
 
-    # Filtrar los jugadores basado en los parámetros proporcionados
+    # La posición usa su índice; el resto de filtros se aplican sobre la tabla en memoria
+    players = data.rows('players', 'position', position) if position else data.table('players')
     if name:
-        players = players[players['name'].str.contains(name, case=False, na=False)]
-    if position:
-        players = players[players['position'] == position]
+        players = players[players['name'].str.contains(name, case=False, na=False, regex=False)]
     if club:
-        players = players[players['current_club_name'].str.contains(club, case=False, na=False)]
+        players = players[players['current_club_name'].str.contains(club, case=False, na=False, regex=False)]
 
     # Convierte el DataFrame filtrado a JSON (como un objeto, no cadena)
     players_json = players.to_json(orient='records')
@@ -103,15 +119,10 @@ def search_players():
 def get_games_by_competition():
     competition_id = request.args.get('competition_id')
 
-    # Cargar el archivo games.csv al iniciar la aplicación
-    games_df = pd.read_csv('D:/UEM/TFM/tfm/data/games.csv')
-    
     if competition_id:
-        # Filtrar los juegos por competition_id
-        filtered_games = games_df[games_df['competition_id'] == competition_id]
-        # Ordenar los juegos por temporada de más reciente a más antigua
-        sorted_games = filtered_games.sort_values(by='season', ascending=False)
-        
+        # Partidos de la competición, ya ordenados de la temporada más reciente a la más antigua
+        sorted_games = data_engine.snapshot().rows('games', 'competition_id', competition_id)
+
         # Convertir a JSON
         games_list = sorted_games.to_json(orient='records')
         return games_list
@@ -127,15 +138,8 @@ def get_seasons_by_competition():
         if not competition_id:
             return jsonify({"error": "competition_id is required"}), 400
 
-        # Cargar el archivo games.csv
-        games_df = pd.read_csv('D:/UEM/TFM/tfm/data/games.csv')
-
-        # Asegurarse de que el competition_id sea del mismo tipo (convertir a numérico si es necesario)
-        games_df['competition_id'] = games_df['competition_id'].astype(str)
-        competition_id = str(competition_id)
-
         # Filtrar los juegos por competition_id
-        filtered_games = games_df[games_df['competition_id'] == competition_id]
+        filtered_games = data_engine.snapshot().rows('games', 'competition_id', competition_id)
 
         # Verificar si hay juegos para esa competición
         if filtered_games.empty:
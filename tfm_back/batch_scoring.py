@@ -0,0 +1,113 @@
+import json
+import math
+import os
+
+import pandas as pd
+from flask import Response, jsonify, request, stream_with_context
+
+# Filas que se puntúan en cada llamada a model.predict
+PREDICT_CHUNK_SIZE = int(os.environ.get('TFM_PREDICT_CHUNK_SIZE', 1000))
+
+# Columnas usadas por /predict/<player_id> si el modelo no guarda los nombres de sus columnas
+DEFAULT_FEATURES = ['assists', 'minutes_played', 'yellow_cards', 'red_cards']
+
+
+def model_features(model):
+    names = getattr(model, 'feature_names_in_', None)
+    return list(names) if names is not None else DEFAULT_FEATURES
+
+
+def validate_row(row, features):
+    # Devuelve (valores, None) si la fila es válida o (None, mensaje de error)
+    if not isinstance(row, dict):
+        return None, 'row must be a JSON object'
+    missing = [name for name in features if name not in row]
+    if missing:
+        return None, f"missing columns: {', '.join(missing)}"
+    values = []
+    for name in features:
+        value = row[name]
+        # bool es subclase de int y float(True) funciona: se rechaza antes de convertir
+        if isinstance(value, bool):
+            return None, f"column {name} must be numeric"
+        # Se aceptan también números en texto ("90"), como los que llegan de un CSV convertido a JSON.
+        # Los enteros también pasan a float: así un entero enorme da OverflowError aquí y no en el modelo
+        try:
+            value = float(value)
+        except (TypeError, ValueError, OverflowError):
+            return None, f"column {name} must be numeric"
+        # float() acepta "nan", "inf" y "1e999" (infinito) y json.loads acepta NaN e Infinity:
+        # el modelo no puede puntuarlos
+        if not math.isfinite(value):
+            return None, f"column {name} must be a finite number"
+        values.append(value)
+    return values, None
+
+
+def iter_ndjson(stream):
+    # Una fila JSON por línea; las líneas mal formadas se devuelven como error de esa fila
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield ValueError(f'invalid JSON: {e}')
+
+
+def _score_chunk(model, features, chunk):
+    valid = [(index, values) for index, values, _ in chunk if values is not None]
+    predictions = {}
+    if valid:
+        X = pd.DataFrame([values for _, values in valid], columns=features)
+        try:
+            predictions = dict(zip((index for index, _ in valid), model.predict(X)))
+        except Exception as e:
+            predictions = {index: e for index, _ in valid}
+
+    for index, values, error in chunk:
+        result = predictions.get(index)
+        if error is not None:
+            yield {'index': index, 'error': error}
+        elif isinstance(result, Exception):
+            yield {'index': index, 'error': str(result)}
+        else:
+            yield {'index': index, 'prediction': float(result)}
+
+
+def score_rows(model, rows, chunk_size=PREDICT_CHUNK_SIZE):
+    """Puntúa las filas por bloques y devuelve un resultado por fila, en el mismo orden."""
+    features = model_features(model)
+    chunk = []
+    for index, row in enumerate(rows):
+        if isinstance(row, Exception):
+            chunk.append((index, None, str(row)))
+        else:
+            values, error = validate_row(row, features)
+            chunk.append((index, values, error))
+        if len(chunk) >= chunk_size:
+            yield from _score_chunk(model, features, chunk)
+            chunk = []
+    if chunk:
+        yield from _score_chunk(model, features, chunk)
+
+
+def batch_predict_response(model):
+    # Entrada: lista JSON de filas, {"rows": [...]} o un flujo NDJSON (application/x-ndjson)
+    if request.mimetype == 'application/x-ndjson':
+        rows = iter_ndjson(request.stream)
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            data = data.get('rows')
+        if not isinstance(data, list):
+            return jsonify({"error": "body must be a JSON list of rows or NDJSON"}), 400
+        rows = data
+
+    # Los resultados se envían como NDJSON a medida que se puntúa cada bloque
+    def generate():
+        for result in score_rows(model, rows):
+            yield json.dumps(result) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
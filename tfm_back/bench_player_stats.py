@@ -0,0 +1,106 @@
+"""Benchmark de regresión de las estadísticas de /api/players/<id>.
+
+Compara las siete consultas secuenciales originales con la consulta agregada
+``PLAYER_STATS_SQL`` de queries.py (la que ejecuta el endpoint) sobre una
+muestra de jugadores, comprueba que los resultados coinciden y muestra los
+tiempos. No importa app.py. Se ejecuta desde ``tfm_back``:
+
+    python bench_player_stats.py --players 200 --repeat 3
+"""
+import argparse
+import statistics
+import time
+
+import pymysql
+
+from db_pool import DB_CONFIG
+from queries import PLAYER_STATS_SQL, player_stats
+
+
+def legacy_player_stats(cursor, player_id):
+    # Implementación anterior: una consulta por estadística
+    cursor.execute("SELECT COUNT(*) FROM game_events WHERE player_id = %s AND type = 'Goals'", (player_id,))
+    goals = cursor.fetchone()['COUNT(*)']
+    cursor.execute("SELECT COUNT(*) FROM game_events WHERE player_id = %s AND type = 'Cards'", (player_id,))
+    cards = cursor.fetchone()['COUNT(*)']
+    cursor.execute("SELECT COUNT(*) FROM game_events WHERE player_assist_id = %s", (player_id,))
+    assists = cursor.fetchone()['COUNT(*)']
+    cursor.execute("SELECT COUNT(DISTINCT game_id) FROM game_events WHERE player_id = %s OR player_assist_id = %s",
+                   (player_id, player_id))
+    games_played = cursor.fetchone()['COUNT(DISTINCT game_id)']
+    cursor.execute("SELECT MIN(YEAR(date)) AS first_year FROM game_events WHERE player_id = %s", (player_id,))
+    first_year = cursor.fetchone()['first_year']
+    cursor.execute("SELECT MAX(YEAR(date)) AS last_year FROM game_events WHERE player_id = %s", (player_id,))
+    last_year = cursor.fetchone()['last_year']
+
+    if first_year is not None and last_year is not None:
+        estimated_games_played = (last_year - first_year + 1) * 40
+    else:
+        estimated_games_played = 0
+
+    return {
+        "games_played": games_played,
+        "goals": goals,
+        "cards": cards,
+        "assists": assists,
+        "first_year": first_year,
+        "last_year": last_year,
+        "estimated_games_played": estimated_games_played
+    }
+
+
+def aggregated_player_stats(cursor, player_id):
+    # La consulta de /api/players/<id>, sin importar la aplicación Flask
+    cursor.execute(PLAYER_STATS_SQL, {'player_id': player_id})
+    return player_stats(cursor.fetchone())
+
+
+def time_run(func, cursor, player_ids):
+    start = time.perf_counter()
+    results = [func(cursor, player_id) for player_id in player_ids]
+    return time.perf_counter() - start, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=200, help='Número de jugadores de la muestra')
+    parser.add_argument('--repeat', type=int, default=3, help='Repeticiones de cada variante')
+    args = parser.parse_args()
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        with connection.cursor() as cursor:
+            # Jugadores con eventos, que son los que hacen trabajar a las consultas
+            cursor.execute("""
+                SELECT player_id FROM game_events
+                GROUP BY player_id
+                ORDER BY COUNT(*) DESC
+                LIMIT %s
+            """, (args.players,))
+            player_ids = [row['player_id'] for row in cursor.fetchall()]
+            if not player_ids:
+                raise SystemExit("La tabla game_events está vacía")
+
+            legacy_times, new_times = [], []
+            for _ in range(args.repeat):
+                elapsed, legacy_results = time_run(legacy_player_stats, cursor, player_ids)
+                legacy_times.append(elapsed)
+                elapsed, new_results = time_run(aggregated_player_stats, cursor, player_ids)
+                new_times.append(elapsed)
+
+                for player_id, old, new in zip(player_ids, legacy_results, new_results):
+                    if old != new:
+                        raise SystemExit(f"Resultados distintos para el jugador {player_id}: {old} != {new}")
+    finally:
+        connection.close()
+
+    legacy = statistics.median(legacy_times)
+    new = statistics.median(new_times)
+    print(f"Jugadores: {len(player_ids)}  repeticiones: {args.repeat}")
+    print(f"7 consultas:       {legacy * 1000 / len(player_ids):8.2f} ms/jugador")
+    print(f"consulta agregada: {new * 1000 / len(player_ids):8.2f} ms/jugador")
+    print(f"mejora:            {legacy / new:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Caché en memoria con expulsión LRU y caducidad opcional (``ttl`` en segundos).
+
+    El límite es de entradas (``maxsize``), de bytes (``maxbytes``, midiendo cada
+    valor con ``sizeof``, por defecto ``len``) o de ambos; ``None`` no limita.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, maxbytes=None, sizeof=len):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                value, expires, _ = item
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        size = self.sizeof(value) if self.maxbytes is not None else 0
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            # Un valor mayor que todo el límite no se guarda (vaciaría la caché sin quedarse)
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+            self._data[key] = (value, expires, size)
+            self.bytes += size
+            self._evict()
+
+    def resize(self, key):
+        """Vuelve a medir una entrada que ha crecido desde que se guardó y expulsa las que sobren."""
+        if self.maxbytes is None:
+            return
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                size = self.sizeof(item[0])
+                self._data[key] = (item[0], item[1], size)
+                self.bytes += size - item[2]
+                self._evict()
+
+    def _remove(self, key):
+        self.bytes -= self._data.pop(key)[2]
+
+    def _evict(self):
+        while self._data and ((self.maxsize is not None and len(self._data) > self.maxsize)
+                              or (self.maxbytes is not None and self.bytes > self.maxbytes)):
+            self.bytes -= self._data.popitem(last=False)[1][2]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'bytes': self.bytes,
+                'maxbytes': self.maxbytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+class VersionedCache:
+    """Caché LRU cuyas entradas pertenecen a una versión de los datos.
+
+    ``version()`` devuelve la versión actual (p. ej. la de dataset_version);
+    cuando cambia se vacía la caché y se llama a ``on_change(version)``.
+    ``maxsize``, ``maxbytes`` y ``sizeof`` son los límites de LRUCache.
+    """
+
+    def __init__(self, version, maxsize=4096, on_change=None, maxbytes=None, sizeof=len):
+        self._version_fn = version
+        self._cache = LRUCache(maxsize=maxsize, maxbytes=maxbytes, sizeof=sizeof)
+        self._lock = threading.Lock()
+        self.on_change = on_change
+        self.version = None
+        self._checked = False
+
+    def current_version(self):
+        version = self._version_fn()
+        changed = False
+        with self._lock:
+            # La primera consulta también cuenta como cambio (precarga al arrancar)
+            if not self._checked or version != self.version:
+                self._cache.clear()
+                self.version = version
+                self._checked = True
+                changed = True
+        if changed and self.on_change is not None:
+            self.on_change(version)
+        return version
+
+    def get(self, key):
+        # (valor o None, versión con la que hay que guardar el valor si se calcula)
+        version = self.current_version()
+        return self._cache.get(key), version
+
+    def set(self, key, value, version):
+        # Un valor calculado con datos de una versión anterior no se guarda
+        with self._lock:
+            if version == self.version:
+                self._cache.set(key, value)
+
+    def resize(self, key):
+        self._cache.resize(key)
+
+    def clear(self):
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def stats(self):
+        return dict(self._cache.stats(), version=self.version)
@@ -0,0 +1,406 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+from xml.sax.saxutils import escape
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Procesos dedicados a dibujar, trabajos pendientes admitidos y tiempo máximo por gráfico
+CHART_WORKERS = int(os.environ.get('TFM_CHART_WORKERS', os.cpu_count() or 1))
+CHART_QUEUE_SIZE = int(os.environ.get('TFM_CHART_QUEUE_SIZE', CHART_WORKERS * 4))
+CHART_TIMEOUT = float(os.environ.get('TFM_CHART_TIMEOUT', 10))
+
+# Tamaño máximo de la caché de gráficos en disco (TFM_CHART_CACHE_DIR)
+CHART_CACHE_DISK_BYTES = int(os.environ.get('TFM_CHART_CACHE_DISK_MB', 256)) * 1024 * 1024
+
+# Estilo de cada gráfico: columnas de los datos, color y textos
+CHARTS = {
+    'team_performance': {
+        'x': 'season', 'y': 'points', 'color': None, 'label': 'Puntos',
+        'xlabel': 'Temporada', 'ylabel': 'Puntos',
+        'title': 'Desempeño del equipo a lo largo de las temporadas',
+    },
+    'team_goals_scored': {
+        'x': 'season', 'y': 'goals_scored', 'color': 'green', 'label': 'Goles realizados',
+        'xlabel': 'Temporada', 'ylabel': 'Goles Realizados',
+        'title': 'Goles realizados por temporada',
+    },
+    'team_goals_conceded': {
+        'x': 'season', 'y': 'goals_conceded', 'color': 'red', 'label': 'Goles recibidos',
+        'xlabel': 'Temporada', 'ylabel': 'Goles Recibidos',
+        'title': 'Goles recibidos por temporada',
+    },
+    'player_goals': {
+        'x': 'year', 'y': 'goals', 'color': 'green', 'label': 'Goles',
+        'xlabel': 'Año', 'ylabel': 'Goles', 'title': 'Goles por año',
+    },
+    'player_cards': {
+        'x': 'year', 'y': 'cards', 'color': 'red', 'label': 'Tarjetas',
+        'xlabel': 'Año', 'ylabel': 'Tarjetas', 'title': 'Tarjetas por año',
+    },
+    'player_assists': {
+        'x': 'year', 'y': 'assists', 'color': 'blue', 'label': 'Asistencias',
+        'xlabel': 'Año', 'ylabel': 'Asistencias', 'title': 'Asistencias por año',
+    },
+}
+
+
+# Colores de matplotlib usados en el SVG (None es el color por defecto 'C0')
+SVG_COLORS = {None: '#1f77b4', 'green': '#008000', 'red': '#ff0000', 'blue': '#0000ff'}
+
+
+def _number(value):
+    # Los SUM() de MySQL llegan como Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    return value
+
+
+def chart_series(kind, rows):
+    chart = CHARTS[kind]
+    xs = [_number(row[chart['x']]) for row in rows]
+    ys = [_number(row[chart['y']]) for row in rows]
+    return xs, ys
+
+
+def chart_data(kind, xs, ys):
+    # Serie en bruto para los clientes que dibujan sus propios gráficos
+    chart = CHARTS[kind]
+    return {
+        'chart': kind,
+        'title': chart['title'],
+        'label': chart['label'],
+        'xlabel': chart['xlabel'],
+        'ylabel': chart['ylabel'],
+        'x': xs,
+        'y': ys,
+    }
+
+
+def chart_key(kind, params, rows):
+    # La clave depende del tipo de gráfico, los parámetros y los datos que se dibujan
+    payload = json.dumps([kind, params, rows], default=str, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def render_chart_png(kind, xs, ys):
+    # API orientada a objetos de matplotlib: sin el estado global de pyplot,
+    # la figura se libera al salir de la función
+    chart = CHARTS[kind]
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.plot(xs, ys, marker='o', color=chart['color'], label=chart['label'])
+    ax.set_xlabel(chart['xlabel'])
+    ax.set_ylabel(chart['ylabel'])
+    ax.set_title(chart['title'])
+    ax.grid(True)
+    ax.legend()
+
+    # Guardar la gráfica en un objeto de memoria
+    img = io.BytesIO()
+    fig.savefig(img, format='png')
+    return img.getvalue()
+
+
+def _ticks(low, high, count=5):
+    if low == high:
+        low, high = low - 1, high + 1
+    step = (high - low) / count
+    return [low + step * i for i in range(count + 1)], low, high
+
+
+def render_chart_svg(kind, xs, ys, width=800, height=480):
+    # Gráfico vectorial ligero generado a mano: no necesita matplotlib ni un proceso aparte
+    chart = CHARTS[kind]
+    color = SVG_COLORS.get(chart['color'], chart['color'])
+    left, right, top, bottom = 70, 20, 40, 60
+    plot_w, plot_h = width - left - right, height - top - bottom
+
+    # Eje X numérico si es posible; si no, posiciones equiespaciadas
+    numeric_x = all(isinstance(x, (int, float)) for x in xs)
+    positions = xs if numeric_x else list(range(len(xs)))
+    x_min, x_max = (min(positions), max(positions)) if positions else (0, 1)
+    if x_min == x_max:
+        x_min, x_max = x_min - 1, x_max + 1
+    y_ticks, y_min, y_max = _ticks(min(ys + [0]), max(ys + [0]))
+
+    def px(x):
+        return left + (x - x_min) / (x_max - x_min) * plot_w
+
+    def py(y):
+        return top + plot_h - (y - y_min) / (y_max - y_min) * plot_h
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="12">',
+        '<rect width="100%" height="100%" fill="white"/>',
+        f'<text x="{width / 2}" y="{top / 2 + 6}" text-anchor="middle" font-size="16">{escape(chart["title"])}</text>',
+    ]
+    for tick in y_ticks:
+        y = py(tick)
+        parts.append(f'<line x1="{left}" y1="{y:.1f}" x2="{left + plot_w}" y2="{y:.1f}" stroke="#dddddd"/>')
+        parts.append(f'<text x="{left - 6}" y="{y + 4:.1f}" text-anchor="end">{tick:g}</text>')
+    for x, label in zip(positions, xs):
+        parts.append(f'<line x1="{px(x):.1f}" y1="{top}" x2="{px(x):.1f}" y2="{top + plot_h}" stroke="#dddddd"/>')
+        parts.append(f'<text x="{px(x):.1f}" y="{top + plot_h + 18}" text-anchor="middle">{escape(str(label))}</text>')
+    parts.append(f'<rect x="{left}" y="{top}" width="{plot_w}" height="{plot_h}" fill="none" stroke="black"/>')
+    points = ' '.join(f'{px(x):.1f},{py(y):.1f}' for x, y in zip(positions, ys))
+    parts.append(f'<polyline points="{points}" fill="none" stroke="{color}" stroke-width="1.5"/>')
+    for x, y in zip(positions, ys):
+        parts.append(f'<circle cx="{px(x):.1f}" cy="{py(y):.1f}" r="4" fill="{color}"/>')
+    parts.append(f'<text x="{left + plot_w / 2}" y="{height - 15}" text-anchor="middle">{escape(chart["xlabel"])}</text>')
+    parts.append(f'<text transform="translate(18 {top + plot_h / 2}) rotate(-90)" text-anchor="middle">{escape(chart["ylabel"])}</text>')
+    parts.append(f'<line x1="{left + plot_w - 130}" y1="{top + 20}" x2="{left + plot_w - 105}" y2="{top + 20}" stroke="{color}" stroke-width="1.5"/>')
+    parts.append(f'<text x="{left + plot_w - 100}" y="{top + 24}">{escape(chart["label"])}</text>')
+    parts.append('</svg>')
+    return '\n'.join(parts).encode('utf-8')
+
+
+class RendererBusy(Exception):
+    """La cola de gráficos pendientes está llena."""
+
+
+class RenderTimeout(Exception):
+    """El gráfico no se ha dibujado dentro del tiempo máximo."""
+
+
+class ChartRenderer:
+    """Dibuja los gráficos en un pool de procesos, fuera del GIL de los hilos de Flask.
+
+    Admite como mucho ``queue_size`` trabajos en curso o en espera; por encima
+    de ese límite ``render`` lanza RendererBusy en lugar de encolar.
+
+    Un gráfico que supera ``timeout`` lanza RenderTimeout. Si aún estaba en la
+    cola se cancela; si ya se estaba dibujando, el proceso no se puede
+    interrumpir, así que se recicla el pool entero: se terminan sus procesos
+    (con lo que su hueco se libera) y el siguiente gráfico arranca un pool
+    nuevo. Los demás trabajos de ese pool se reintentan una vez en el nuevo.
+    """
+
+    def __init__(self, workers=CHART_WORKERS, queue_size=CHART_QUEUE_SIZE, timeout=CHART_TIMEOUT):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._lock = threading.Lock()
+        self._executor = None
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _get_executor(self):
+        # El pool se crea en el primer uso para no arrancar procesos al importar;
+        # 'spawn' evita heredar por fork el estado de los hilos del servidor
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _reset_executor(self, executor, terminate=False):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        # Los procesos se leen antes de shutdown, que deja de guardarlos
+        processes = list((executor._processes or {}).values()) if terminate else []
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            # Al morir sus procesos el pool marca sus trabajos como fallidos y libera sus huecos
+            process.terminate()
+
+    def render(self, kind, xs, ys):
+        try:
+            return self._render(kind, xs, ys)
+        except BrokenProcessPool:
+            # El pool se ha reciclado con este trabajo dentro (otro gráfico colgado o un proceso muerto)
+            return self._render(kind, xs, ys)
+
+    def _render(self, kind, xs, ys):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise RendererBusy(f'Hay {self.queue_size} gráficos pendientes')
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(render_chart_png, kind, xs, ys)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._reset_executor(executor)
+            raise
+        except Exception:
+            self._slots.release()
+            raise
+        # El hueco se libera cuando termina el trabajo, no cuando deja de esperarse
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            if not future.cancel():
+                # Ya se está dibujando: solo se recupera el proceso terminando el pool
+                self._reset_executor(executor, terminate=True)
+            with self._lock:
+                self.timeouts += 1
+            raise RenderTimeout(f'El gráfico {kind} ha tardado más de {self.timeout} s')
+        except BrokenProcessPool:
+            # Un proceso ha muerto: el siguiente gráfico usará un pool nuevo
+            self._reset_executor(executor)
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queue_size': self.queue_size,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+            }
+
+
+class ChartCache:
+    """Caché de gráficos ya dibujados, direccionada por contenido.
+
+    Guarda en memoria hasta ``max_bytes`` con expulsión LRU y, si se indica
+    ``directory``, también en disco para sobrevivir a reinicios. El disco tiene
+    su propio límite, ``max_disk_bytes``: al superarlo se borran los ficheros
+    usados hace más tiempo (la fecha de modificación se actualiza en cada
+    lectura) hasta quedar en el 90 % del límite.
+    """
+
+    def __init__(self, max_bytes, directory=None, max_disk_bytes=CHART_CACHE_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._data = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            # Lo que ya haya en el directorio (de ejecuciones anteriores) cuenta para el límite
+            self._sweep_disk()
+
+    def _path(self, key, ext):
+        return os.path.join(self.directory, f'{key}.{ext}')
+
+    def _remember(self, key, body):
+        with self._lock:
+            if key in self._data:
+                self._size -= len(self._data.pop(key))
+            if len(body) > self.max_bytes:
+                return
+            self._data[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get(self, key, ext='png'):
+        cache_key = (key, ext)
+        with self._lock:
+            body = self._data.get(cache_key)
+            if body is not None:
+                self._data.move_to_end(cache_key)
+                self.hits += 1
+                return body
+        if self.directory:
+            try:
+                with open(self._path(key, ext), 'rb') as f:
+                    body = f.read()
+            except OSError:
+                body = None
+            if body is not None:
+                try:
+                    # Marca de uso para el barrido LRU del disco
+                    os.utime(self._path(key, ext))
+                except OSError:
+                    pass
+                self._remember(cache_key, body)
+                with self._lock:
+                    self.hits += 1
+                return body
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, body, ext='png'):
+        self._remember((key, ext), body)
+        if self.directory:
+            # Escritura atómica para que nunca se lea un fichero a medias
+            path = self._path(key, ext)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(body)
+                os.replace(tmp_path, path)
+            except OSError:
+                return
+            with self._lock:
+                self._disk_size += len(body)
+                over_budget = self._disk_size > self.max_disk_bytes
+            if over_budget:
+                self._sweep_disk()
+
+    def _sweep_disk(self):
+        # Tamaño real del directorio (puede compartirse entre procesos) y borrado de los menos usados
+        with self._disk_lock:
+            files = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.tmp') or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files)
+            evicted = 0
+            if total > self.max_disk_bytes:
+                target = self.max_disk_bytes * 0.9
+                for _, size, path in sorted(files):
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    total -= size
+                    evicted += 1
+            with self._lock:
+                self._disk_size = total
+                self.disk_evictions += evicted
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_bytes': self._disk_size,
+                'max_disk_bytes': self.max_disk_bytes,
+                'disk_evictions': self.disk_evictions,
+            }
@@ -1,165 +1,780 @@
+"""Limpieza de los CSV de Transfermarkt (data/*.csv -> data_clean/*_clean.csv).
+
+Modo completo (por defecto): cada tabla se carga entera, como hasta ahora.
+Modo streaming (--stream): primero se limpian las tablas pequeñas y se guardan
+sus conjuntos de ids; las tablas grandes se leen por bloques de --chunk-size
+filas, se filtran con esos ids y se añaden al CSV de salida, de modo que la
+memoria máxima depende del tamaño del bloque y no del dataset.
+
+Con --format parquet o feather las salidas se guardan en formato columnar con
+tipos explícitos (ids int32, códigos como category, fechas como timestamp) y se
+escribe schema.json con las columnas y tipos de cada tabla.
+
+Modo incremental (--incremental): etl_state.json guarda la marca de agua (fecha
+máxima) de cada tabla de hechos y la huella de competitions y clubs. Solo se
+limpian las filas desde la marca de agua y se fusionan por clave con las salidas
+existentes; si cambian competitions o clubs se vuelve a ejecutar todo. Las filas
+nuevas se añaden al final del CSV o como un fichero más del directorio Parquet
+de la tabla; solo se reescribe la tabla si cambian filas ya escritas (o en
+Feather). schema.json se actualiza tras cada fusión.
+
+Las tablas forman un grafo de dependencias (TABLES[...]['deps']): con
+--workers N las tablas independientes se limpian a la vez en N procesos, también
+en modo incremental, y el log muestra el tiempo de cada etapa.
+
+    python data.py --stream --chunk-size 500000 --format parquet --workers 4
+    python data.py --incremental
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
 import numpy as np  # Para manejar NaN
 
-# Cargamos los datasets
-appearances = pd.read_csv('D:/UEM/TFM_DATA/tfm_data/data/appearances.csv')
-club_games = pd.read_csv('D:/UEM/TFM_DATA/tfm_data/data/club_games.csv')
-clubs = pd.read_csv('D:/UEM/TFM_DATA/tfm_data/data/clubs.csv')
-competitions = pd.read_csv('D:/UEM/TFM_DATA/tfm_data/data/competitions.csv')
-game_events = pd.read_csv('D:/UEM/TFM_DATA/tfm_data/data/game_events.csv')
-game_lineups = pd.read_csv('D:/UEM/TFM_DATA/tfm_data/data/game_lineups.csv')
-games = pd.read_csv('D:/UEM/TFM_DATA/tfm_data/data/games.csv')
-player_valuations = pd.read_csv('D:/UEM/TFM_DATA/tfm_data/data/player_valuations.csv')
-players = pd.read_csv('D:/UEM/TFM_DATA/tfm_data/data/players.csv')
-transfers = pd.read_csv('D:/UEM/TFM_DATA/tfm_data/data/transfers.csv')
-
-# Eliminamos filas con valores nulos en columnas clave y convertimos fechas
-
-# competitions
-competitions.dropna(subset=['competition_id', 'competition_code','name'], inplace=True)
-competitions = competitions.replace('', 'null')
-
-# clubs
-clubs.dropna(subset=['club_id','domestic_competition_id', 'name'], inplace=True)
-clubs = clubs.replace('', 'null')
-filtered_clubs_df = clubs[
-    (clubs['domestic_competition_id'].isin(competitions['competition_id']))
-]
-
-# games
-games.dropna(subset=['game_id', 'competition_id','season', 'home_club_id', 'away_club_id'], inplace=True)
-games['date'] = pd.to_datetime(games['date'], errors='coerce')
-# Eliminamos las columnas 'home_club_name' y 'away_club_name', ya que tenemos los ids
-games.drop(columns=['home_club_name', 'away_club_name'], inplace=True)
-games = games.replace('', 'null')
-# Filtrar el DataFrame de games para que solo incluya los clubes que existen en el DataFrame de clubs
-filtered_games_df = games[
-    (games['home_club_id'].isin(filtered_clubs_df['club_id'])) & 
-    (games['away_club_id'].isin(filtered_clubs_df['club_id']))
-]
-
-# game_lineups 
-game_lineups.dropna(subset=['game_lineups_id', 'game_id','player_id', 'club_id'], inplace=True)
-game_lineups['date'] = pd.to_datetime(game_lineups['date'], errors='coerce')
-game_lineups = game_lineups.replace('', 'null')
-filtered_game_lineups_df = game_lineups[
-    (game_lineups['club_id'].isin(filtered_clubs_df['club_id'])) & 
-    (game_lineups['game_id'].isin(filtered_games_df['game_id']))
-]
-
-# club_games
-club_games.dropna(subset=['game_id', 'club_id','opponent_id'], inplace=True)
-filtered_club_games_df = club_games[
-    (club_games['club_id'].isin(filtered_clubs_df['club_id'])) & 
-    (club_games['opponent_id'].isin(filtered_clubs_df['club_id']))
-]
-
-# players
-players.dropna(subset=['player_id', 'current_club_id','current_club_domestic_competition_id'], inplace=True)
-players['date_of_birth'] = pd.to_datetime(players['date_of_birth'], errors='coerce')
-players['contract_expiration_date'] = pd.to_datetime(players['contract_expiration_date'], errors='coerce')
-players['contract_expiration_date'] = players['contract_expiration_date'].dt.strftime('%Y-%m-%d')
-# Reemplazar NaT (nulos) por NaN de NumPy para evitar problemas
-players['contract_expiration_date'] = players['contract_expiration_date'].replace('NaT', np.nan)
-players.drop(columns=['current_club_name'], inplace=True)
-filtered_players_df = players[
-    (players['current_club_id'].isin(filtered_clubs_df['club_id'])) 
-]
-
-# game_events
-game_events.dropna(subset=['game_event_id', 'date', 'game_id', 'club_id', 'player_id'], inplace=True)
-game_events['date'] = pd.to_datetime(game_events['date'], errors='coerce')
-
-# Reemplaza 'description' y 'player_in_id' si es necesario
-game_events.drop(columns=['description'], inplace=True)
-game_events.drop(columns=['player_in_id'], inplace=True)
-
-# Reemplazar 'null' por pd.NA en player_assist_id
-game_events['player_assist_id'] = game_events['player_assist_id'].replace('null', pd.NA)
-
-# Convierte player_id y player_assist_id a enteros
-game_events['player_id'] = pd.to_numeric(game_events['player_id'], errors='coerce', downcast='integer')
-game_events['player_assist_id'] = pd.to_numeric(game_events['player_assist_id'], errors='coerce', downcast='integer')
-
-# Asegúrate de que los tipos sean correctos
-game_events['player_id'] = game_events['player_id'].astype('Int64')  # Tipo entero con soporte para NaN
-game_events['player_assist_id'] = game_events['player_assist_id'].astype('Int64')  # Tipo entero con soporte para NaN
-
-# Filtrar por 'club_id' y 'game_id'
-filtered_game_events_df = game_events[
-    (game_events['club_id'].isin(filtered_clubs_df['club_id'])) &
-    (game_events['game_id'].isin(filtered_games_df['game_id'])) &
-    ((game_events['player_assist_id'].isnull()) | (game_events['player_assist_id'].isin(filtered_players_df['player_id'])))
-]
-
-# player_valuations 
-player_valuations.dropna(subset=['player_id', 'current_club_id','player_club_domestic_competition_id'], inplace=True)
-player_valuations['date'] = pd.to_datetime(player_valuations['date'], errors='coerce')
-player_valuations = player_valuations.replace('', 'null')
-filtered_player_valuations_df = player_valuations[
-    (player_valuations['current_club_id'].isin(filtered_clubs_df['club_id']))
-]
-
-# appearances
-appearances.dropna(subset=['appearance_id','game_id', 'player_id','player_club_id','player_current_club_id','competition_id'], inplace=True)
-appearances['date'] = pd.to_datetime(appearances['date'], errors='coerce')
-appearances.drop(columns=['player_name'], inplace=True)
-filtered_appearances_df = appearances[
-    (appearances['player_club_id'].isin(filtered_clubs_df['club_id']))  & 
-    (appearances['player_current_club_id'].isin(filtered_clubs_df['club_id']))  & 
-    (appearances['competition_id'].isin(competitions['competition_id']))  & 
-    (appearances['game_id'].isin(filtered_club_games_df['game_id']))
-]
-
-# transfers
-transfers.dropna(subset=['player_id', 'transfer_date','from_club_id','to_club_id'], inplace=True)
-transfers['transfer_date'] = pd.to_datetime(transfers['transfer_date'], errors='coerce')
-transfers.drop(columns=['from_club_name','to_club_name','player_name'], inplace=True)
-transfers = transfers.replace('', 'null')
-filtered_transfers_df = transfers[
-    (transfers['from_club_id'].isin(filtered_clubs_df['club_id'])) & 
-    (transfers['to_club_id'].isin(filtered_clubs_df['club_id']))
-]
-
-# Guardamos los DataFrames actualizados
-competitions.to_csv('D:/UEM/TFM_DATA/tfm_data/data_clean/competitions_clean.csv', index=False)
-filtered_appearances_df.to_csv('D:/UEM/TFM_DATA/tfm_data/data_clean/appearances_clean.csv', index=False)
-filtered_clubs_df.to_csv('D:/UEM/TFM_DATA/tfm_data/data_clean/clubs_clean.csv', index=False)
-filtered_club_games_df.to_csv('D:/UEM/TFM_DATA/tfm_data/data_clean/club_games_clean.csv', index=False)
-filtered_games_df.to_csv('D:/UEM/TFM_DATA/tfm_data/data_clean/games_clean.csv', index=False)
-filtered_game_events_df.to_csv('D:/UEM/TFM_DATA/tfm_data/data_clean/game_events_clean.csv', index=False, na_rep='NULL')
-filtered_game_lineups_df.to_csv('D:/UEM/TFM_DATA/tfm_data/data_clean/game_lineups_clean.csv', index=False)
-filtered_players_df.to_csv('D:/UEM/TFM_DATA/tfm_data/data_clean/players_clean.csv', index=False, na_rep='NULL')
-filtered_player_valuations_df.to_csv('D:/UEM/TFM_DATA/tfm_data/data_clean/player_valuations_clean.csv', index=False)
-filtered_transfers_df.to_csv('D:/UEM/TFM_DATA/tfm_data/data_clean/transfers_clean.csv', index=False)
-
-
-
-# Unir los datasets por game_id para obtener información adicional sobre los partidos
-#merged_data = pd.merge(appearances, games, on='game_id')
-
-# Seleccionar las columnas más relevantes para el modelo
-#features = merged_data[['player_id', 'minutes_played', 'goals', 'assists', 'yellow_cards', 'red_cards', 'date']]
-#target = merged_data['goals']  # Como ejemplo, predecir la cantidad de goles
-
-# Convertir la fecha a formato de datetime para obtener información temporal (si es necesario)
-#merged_data['date'] = pd.to_datetime(merged_data['date'])
-
-# Filtrar por jugador específico (se puede utilizar para crear un endpoint)
-#def filtrar_por_jugador(player_id):
-#    return merged_data[merged_data['player_id'] == player_id]
-
-# Dividir los datos en conjuntos de entrenamiento y prueba
-#X_train, X_test, y_train, y_test = train_test_split(features, target, test_size=0.2, random_state=42)
-
-# Entrenar el modelo
-#model = RandomForestRegressor()
-#model.fit(X_train, y_train)
-
-# Exportamos los datos mergeados
-#merged_data.to_csv('merged_data.csv', index=False)
-# Guardar el modelo
-#import joblib
-#joblib.dump(model, 'model.pkl')
\ No newline at end of file
+DATA_DIR = os.environ.get('TFM_DATA_DIR', 'D:/UEM/TFM_DATA/tfm_data/data')
+CLEAN_DIR = os.environ.get('TFM_CLEAN_DIR', 'D:/UEM/TFM_DATA/tfm_data/data_clean')
+
+# Filas por bloque en modo streaming
+CHUNK_SIZE = 500000
+
+# Procesos para las etapas independientes del grafo de tablas (--workers)
+ETL_WORKERS = int(os.environ.get('TFM_ETL_WORKERS', os.cpu_count() or 1))
+
+OUTPUT_FORMATS = ('csv', 'parquet', 'feather')
+SCHEMA_FILE = 'schema.json'
+
+# Tipos explícitos de las salidas columnares (solo se aplican a las columnas presentes).
+# Los ids son siempre Int32 (entero con nulos): el tipo no depende de si un bloque trae nulos,
+# así todos los bloques de una tabla comparten el esquema con el que se abrió el Parquet.
+ID_COLUMNS = ['club_id', 'game_id', 'player_id', 'appearance_id', 'opponent_id',
+              'home_club_id', 'away_club_id', 'current_club_id', 'player_club_id',
+              'player_current_club_id', 'from_club_id', 'to_club_id', 'season']
+NULLABLE_INT_COLUMNS = ['player_assist_id', 'player_in_id', 'country_id', 'last_season',
+                        'home_club_goals', 'away_club_goals', 'home_club_position', 'away_club_position',
+                        'own_goals', 'own_position', 'opponent_goals', 'opponent_position', 'is_win',
+                        'minute', 'number', 'team_captain', 'attendance', 'height_in_cm', 'squad_size',
+                        'foreigners_number', 'national_team_players', 'stadium_seats',
+                        'goals', 'assists', 'yellow_cards', 'red_cards', 'minutes_played', 'games',
+                        'points', 'goals_for', 'goals_against', 'wins', 'draws', 'losses']
+CATEGORY_COLUMNS = ['competition_id', 'domestic_competition_id', 'current_club_domestic_competition_id',
+                    'player_club_domestic_competition_id', 'competition_code', 'domestic_league_code',
+                    'type', 'sub_type', 'competition_type', 'confederation', 'position', 'sub_position',
+                    'foot', 'hosting', 'round', 'country_name', 'country_of_citizenship', 'country_of_birth',
+                    'home_club_formation', 'away_club_formation', 'transfer_season']
+DATE_COLUMNS = ['date', 'date_of_birth', 'contract_expiration_date', 'transfer_date']
+
+STATE_FILE = 'etl_state.json'
+
+# Tablas de referencia: si cambian, todas las demás pueden cambiar y se limpia todo
+REFERENCE_TABLES = ['competitions', 'clubs']
+
+# Tablas que se actualizan de forma incremental, en orden de dependencias:
+#   watermark: columna de fecha de la marca de agua (None: filas de los partidos nuevos)
+#   key:       columnas que identifican cada fila al fusionar
+INCREMENTAL_TABLES = {
+    'games': {'watermark': 'date', 'key': ['game_id']},
+    'club_games': {'watermark': None, 'key': ['game_id', 'club_id']},
+    'game_lineups': {'watermark': 'date', 'key': ['game_lineups_id']},
+    'game_events': {'watermark': 'date', 'key': ['game_event_id']},
+    'player_valuations': {'watermark': 'date', 'key': ['player_id', 'date']},
+    'appearances': {'watermark': 'date', 'key': ['appearance_id']},
+    'transfers': {'watermark': 'transfer_date', 'key': ['player_id', 'transfer_date', 'from_club_id', 'to_club_id']},
+}
+
+TEAM_SEASON_KEYS = ['club_id', 'competition_id', 'season']
+
+# Resumen por equipo, competición y temporada (tabla team_season_stats)
+def build_team_season_stats(games_df):
+    # Cada partido aporta una fila desde el punto de vista del local y otra del visitante
+    home = pd.DataFrame({
+        'club_id': games_df['home_club_id'],
+        'competition_id': games_df['competition_id'],
+        'season': games_df['season'],
+        'goals_for': games_df['home_club_goals'],
+        'goals_against': games_df['away_club_goals'],
+    })
+    away = pd.DataFrame({
+        'club_id': games_df['away_club_id'],
+        'competition_id': games_df['competition_id'],
+        'season': games_df['season'],
+        'goals_for': games_df['away_club_goals'],
+        'goals_against': games_df['home_club_goals'],
+    })
+    rows = pd.concat([home, away], ignore_index=True)
+    # Goles como float (NaN si faltan) también cuando vienen como Int32 de Parquet, donde pd.NA no se compara
+    rows[['goals_for', 'goals_against']] = rows[['goals_for', 'goals_against']].astype('float64')
+    rows['wins'] = (rows['goals_for'] > rows['goals_against']).astype(int)
+    rows['draws'] = (rows['goals_for'] == rows['goals_against']).astype(int)
+    rows['losses'] = (rows['goals_for'] < rows['goals_against']).astype(int)
+    rows['points'] = rows['wins'] * 3 + rows['draws']
+
+    # observed: competition_id llega como category desde Parquet/Feather y no se quieren combinaciones vacías
+    stats = rows.groupby(TEAM_SEASON_KEYS, as_index=False, observed=True).agg(
+        games=('club_id', 'size'),
+        points=('points', 'sum'),
+        goals_for=('goals_for', 'sum'),
+        goals_against=('goals_against', 'sum'),
+        wins=('wins', 'sum'),
+        draws=('draws', 'sum'),
+        losses=('losses', 'sum'),
+    )
+    stats[['goals_for', 'goals_against']] = stats[['goals_for', 'goals_against']].astype(int)
+    return stats
+
+# Actualización incremental: solo se recalculan las (competición, temporada) con partidos nuevos
+def refresh_team_season_stats(stats_df, games_df, new_games_df):
+    affected = new_games_df[['competition_id', 'season']].drop_duplicates()
+    affected_games = games_df.merge(affected, on=['competition_id', 'season'])
+    refreshed = build_team_season_stats(affected_games)
+    untouched = stats_df.merge(affected, on=['competition_id', 'season'], how='left', indicator=True)
+    untouched = untouched[untouched['_merge'] == 'left_only'].drop(columns='_merge')
+    return pd.concat([untouched, refreshed], ignore_index=True).sort_values(TEAM_SEASON_KEYS, ignore_index=True)
+
+# Eliminamos filas con valores nulos en columnas clave y convertimos fechas.
+# Cada función limpia una tabla (o un bloque de ella); refs contiene los ids
+# válidos de las tablas de las que depende.
+
+def clean_competitions(competitions, refs):
+    competitions = competitions.dropna(subset=['competition_id', 'competition_code','name'])
+    competitions = competitions.replace('', 'null')
+    return competitions
+
+def clean_clubs(clubs, refs):
+    clubs = clubs.dropna(subset=['club_id','domestic_competition_id', 'name'])
+    clubs = clubs.replace('', 'null')
+    return clubs[
+        (clubs['domestic_competition_id'].isin(refs['competition_ids']))
+    ]
+
+def clean_games(games, refs):
+    games = games.dropna(subset=['game_id', 'competition_id','season', 'home_club_id', 'away_club_id'])
+    games['date'] = pd.to_datetime(games['date'], errors='coerce')
+    # Eliminamos las columnas 'home_club_name' y 'away_club_name', ya que tenemos los ids
+    games = games.drop(columns=['home_club_name', 'away_club_name'])
+    games = games.replace('', 'null')
+    # Filtrar el DataFrame de games para que solo incluya los clubes que existen en el DataFrame de clubs
+    return games[
+        (games['home_club_id'].isin(refs['club_ids'])) & 
+        (games['away_club_id'].isin(refs['club_ids']))
+    ]
+
+def clean_game_lineups(game_lineups, refs):
+    game_lineups = game_lineups.dropna(subset=['game_lineups_id', 'game_id','player_id', 'club_id'])
+    game_lineups['date'] = pd.to_datetime(game_lineups['date'], errors='coerce')
+    game_lineups = game_lineups.replace('', 'null')
+    return game_lineups[
+        (game_lineups['club_id'].isin(refs['club_ids'])) & 
+        (game_lineups['game_id'].isin(refs['game_ids']))
+    ]
+
+def clean_club_games(club_games, refs):
+    club_games = club_games.dropna(subset=['game_id', 'club_id','opponent_id'])
+    return club_games[
+        (club_games['club_id'].isin(refs['club_ids'])) & 
+        (club_games['opponent_id'].isin(refs['club_ids']))
+    ]
+
+def clean_players(players, refs):
+    players = players.dropna(subset=['player_id', 'current_club_id','current_club_domestic_competition_id'])
+    players['date_of_birth'] = pd.to_datetime(players['date_of_birth'], errors='coerce')
+    players['contract_expiration_date'] = pd.to_datetime(players['contract_expiration_date'], errors='coerce')
+    players['contract_expiration_date'] = players['contract_expiration_date'].dt.strftime('%Y-%m-%d')
+    # Reemplazar NaT (nulos) por NaN de NumPy para evitar problemas
+    players['contract_expiration_date'] = players['contract_expiration_date'].replace('NaT', np.nan)
+    players = players.drop(columns=['current_club_name'])
+    return players[
+        (players['current_club_id'].isin(refs['club_ids'])) 
+    ]
+
+def clean_game_events(game_events, refs):
+    game_events = game_events.dropna(subset=['game_event_id', 'date', 'game_id', 'club_id', 'player_id'])
+    game_events['date'] = pd.to_datetime(game_events['date'], errors='coerce')
+
+    # Reemplaza 'description' y 'player_in_id' si es necesario
+    game_events = game_events.drop(columns=['description', 'player_in_id'])
+
+    # Reemplazar 'null' por pd.NA en player_assist_id
+    game_events['player_assist_id'] = game_events['player_assist_id'].replace('null', pd.NA)
+
+    # Convierte player_id y player_assist_id a enteros
+    game_events['player_id'] = pd.to_numeric(game_events['player_id'], errors='coerce', downcast='integer')
+    game_events['player_assist_id'] = pd.to_numeric(game_events['player_assist_id'], errors='coerce', downcast='integer')
+
+    # Asegúrate de que los tipos sean correctos
+    game_events['player_id'] = game_events['player_id'].astype('Int64')  # Tipo entero con soporte para NaN
+    game_events['player_assist_id'] = game_events['player_assist_id'].astype('Int64')  # Tipo entero con soporte para NaN
+
+    # Filtrar por 'club_id' y 'game_id'
+    return game_events[
+        (game_events['club_id'].isin(refs['club_ids'])) &
+        (game_events['game_id'].isin(refs['game_ids'])) &
+        ((game_events['player_assist_id'].isnull()) | (game_events['player_assist_id'].isin(refs['player_ids'])))
+    ]
+
+def clean_player_valuations(player_valuations, refs):
+    player_valuations = player_valuations.dropna(subset=['player_id', 'current_club_id','player_club_domestic_competition_id'])
+    player_valuations['date'] = pd.to_datetime(player_valuations['date'], errors='coerce')
+    player_valuations = player_valuations.replace('', 'null')
+    return player_valuations[
+        (player_valuations['current_club_id'].isin(refs['club_ids']))
+    ]
+
+def clean_appearances(appearances, refs):
+    appearances = appearances.dropna(subset=['appearance_id','game_id', 'player_id','player_club_id','player_current_club_id','competition_id'])
+    appearances['date'] = pd.to_datetime(appearances['date'], errors='coerce')
+    appearances = appearances.drop(columns=['player_name'])
+    return appearances[
+        (appearances['player_club_id'].isin(refs['club_ids']))  & 
+        (appearances['player_current_club_id'].isin(refs['club_ids']))  & 
+        (appearances['competition_id'].isin(refs['competition_ids']))  & 
+        (appearances['game_id'].isin(refs['club_game_ids']))
+    ]
+
+def clean_transfers(transfers, refs):
+    transfers = transfers.dropna(subset=['player_id', 'transfer_date','from_club_id','to_club_id'])
+    transfers['transfer_date'] = pd.to_datetime(transfers['transfer_date'], errors='coerce')
+    transfers = transfers.drop(columns=['from_club_name','to_club_name','player_name'])
+    transfers = transfers.replace('', 'null')
+    return transfers[
+        (transfers['from_club_id'].isin(refs['club_ids'])) & 
+        (transfers['to_club_id'].isin(refs['club_ids']))
+    ]
+
+# Tablas en orden de dependencias:
+#   deps:    tablas cuyos ids se necesitan para filtrar
+#   exports: ids que la tabla aporta a las siguientes (nombre en refs -> columna)
+#   chunked: tablas grandes que en modo streaming se leen por bloques
+#   derived: tablas resumen que se construyen una vez, a partir de la tabla limpia ya escrita
+TABLES = {
+    'competitions': {'clean': clean_competitions, 'deps': [], 'exports': {'competition_ids': 'competition_id'}},
+    'clubs': {'clean': clean_clubs, 'deps': ['competitions'], 'exports': {'club_ids': 'club_id'}},
+    'games': {'clean': clean_games, 'deps': ['clubs'], 'exports': {'game_ids': 'game_id'},
+              'derived': {'team_season_stats': build_team_season_stats}},
+    'players': {'clean': clean_players, 'deps': ['clubs'], 'exports': {'player_ids': 'player_id'},
+                'na_rep': 'NULL'},
+    'club_games': {'clean': clean_club_games, 'deps': ['clubs'], 'exports': {'club_game_ids': 'game_id'},
+                   'chunked': True},
+    'game_lineups': {'clean': clean_game_lineups, 'deps': ['clubs', 'games'], 'chunked': True},
+    'game_events': {'clean': clean_game_events, 'deps': ['clubs', 'games', 'players'], 'chunked': True,
+                    'na_rep': 'NULL'},
+    'player_valuations': {'clean': clean_player_valuations, 'deps': ['clubs'], 'chunked': True},
+    'appearances': {'clean': clean_appearances, 'deps': ['competitions', 'clubs', 'club_games'], 'chunked': True},
+    'transfers': {'clean': clean_transfers, 'deps': ['clubs'], 'chunked': True},
+}
+
+def count_coerced(series, values, coerced):
+    # Valores que no eran números y han pasado a nulo, acumulados por columna en ``coerced``
+    lost = int((values.isna() & series.notna()).sum())
+    if lost:
+        coerced[series.name] = coerced.get(series.name, 0) + lost
+    return values
+
+def apply_dtypes(df, coerced=None):
+    df = df.copy()
+    coerced = {} if coerced is None else coerced
+    for column in df.columns:
+        if column in ID_COLUMNS:
+            values = pd.to_numeric(df[column], errors='coerce')
+            df[column] = count_coerced(df[column], values, coerced).astype('Int32')
+        elif column in NULLABLE_INT_COLUMNS:
+            values = pd.to_numeric(df[column], errors='coerce')
+            # Solo si no se pierden decimales (p. ej. porcentajes)
+            if ((values.dropna() % 1) == 0).all():
+                df[column] = count_coerced(df[column], values, coerced).astype('Int32')
+        elif column in CATEGORY_COLUMNS:
+            df[column] = df[column].astype('category')
+        elif column in DATE_COLUMNS:
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+    return df
+
+class TableWriter:
+    """Escribe una tabla limpia, bloque a bloque, en CSV, Parquet o Feather."""
+
+    def __init__(self, path, fmt='csv', na_rep=''):
+        self.path = path
+        self.fmt = fmt
+        self.na_rep = na_rep
+        self.rows = 0
+        self.dtypes = None
+        # Valores no numéricos convertidos a nulo, por columna
+        self.coerced = {}
+        self._parquet = None
+        self._schema = None
+        self._blocks = 0
+
+    def write(self, df):
+        if self.fmt != 'csv':
+            df = apply_dtypes(df, self.coerced)
+        if self.dtypes is None:
+            self.dtypes = {column: str(dtype) for column, dtype in df.dtypes.items()}
+
+        if self.fmt == 'csv':
+            # El primer bloque crea el fichero con cabecera; los siguientes se añaden al final
+            df.to_csv(self.path, index=False, mode='w' if self._blocks == 0 else 'a',
+                      header=(self._blocks == 0), na_rep=self.na_rep)
+        elif self.fmt == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._parquet is None:
+                if os.path.isdir(self.path):
+                    # Directorio de partes de una ejecución incremental anterior: se sustituye entero
+                    shutil.rmtree(self.path)
+                self._schema = self._parquet_schema(pa, pa.Schema.from_pandas(df, preserve_index=False))
+                self._parquet = pq.ParquetWriter(self.path, self._schema)
+            self._parquet.write_table(pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+        else:
+            # Feather no admite añadir bloques: solo se usa con tablas completas
+            if self._blocks:
+                raise ValueError('El formato feather no admite escritura por bloques; usa parquet')
+            df.reset_index(drop=True).to_feather(self.path)
+
+        self._blocks += 1
+        self.rows += len(df)
+
+    @staticmethod
+    def _parquet_schema(pa, schema):
+        # Esquema común a todos los bloques: diccionarios con índices int32 y
+        # columnas vacías en el primer bloque como texto
+        fields = []
+        for field in schema:
+            if pa.types.is_dictionary(field.type):
+                field = field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+            elif pa.types.is_null(field.type):
+                field = field.with_type(pa.string())
+            fields.append(field)
+        return pa.schema(fields)
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+            self._parquet = None
+
+def output_path(clean_dir, name, fmt='csv'):
+    return os.path.join(clean_dir, f'{name}_clean.{fmt}')
+
+def schema_entry(writer):
+    # Entrada de schema.json de una salida: fichero, filas, tipos y valores convertidos a nulo
+    entry = {'file': os.path.basename(writer.path), 'rows': writer.rows, 'columns': writer.dtypes or {}}
+    if writer.coerced:
+        entry['coerced_to_null'] = writer.coerced
+    return entry
+
+def write_schema(clean_dir, tables, fmt):
+    # Manifiesto con el fichero, número de filas y tipo de cada columna de las salidas,
+    # en el orden de TABLES aunque las etapas terminen en otro orden
+    order = [t for name in TABLES for t in [name, *TABLES[name].get('derived', {})]]
+    manifest = {'format': fmt, 'tables': {t: tables[t] for t in order if t in tables}}
+    path = os.path.join(clean_dir, SCHEMA_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def load_schema(clean_dir):
+    try:
+        with open(os.path.join(clean_dir, SCHEMA_FILE), encoding='utf-8') as f:
+            return json.load(f).get('tables', {})
+    except (OSError, ValueError):
+        return {}
+
+def read_clean_table(name, clean_dir=CLEAN_DIR, columns=None, fmt=None):
+    """Lee una tabla limpia en el formato indicado o en el más rápido disponible (Parquet, Feather o CSV)."""
+    for candidate in ([fmt] if fmt else ['parquet', 'feather']):
+        path = output_path(clean_dir, name, candidate)
+        if candidate == 'parquet' and os.path.exists(path):
+            return pd.read_parquet(path, columns=columns)
+        if candidate == 'feather' and os.path.exists(path):
+            return pd.read_feather(path, columns=columns)
+    return pd.read_csv(output_path(clean_dir, name), usecols=columns)
+
+def read_table(name, data_dir=DATA_DIR, chunksize=None):
+    path = os.path.join(data_dir, f'{name}.csv')
+    if chunksize:
+        return pd.read_csv(path, chunksize=chunksize)
+    # Modo completo: un único bloque con la tabla entera
+    return [pd.read_csv(path)]
+
+def run_table(name, refs, data_dir=DATA_DIR, clean_dir=CLEAN_DIR, chunksize=None, fmt='csv'):
+    """Limpia una tabla y guarda el resultado; devuelve los ids que exporta y el esquema de las salidas."""
+    spec = TABLES[name]
+    chunked = bool(chunksize) and spec.get('chunked', False)
+    writer = TableWriter(output_path(clean_dir, name, fmt), fmt, na_rep=spec.get('na_rep', ''))
+    exported = {key: [] for key in spec.get('exports', {})}
+    outputs = {}
+
+    try:
+        for chunk in read_table(name, data_dir, chunksize if chunked else None):
+            cleaned = spec['clean'](chunk, refs)
+            writer.write(cleaned)
+            for key, column in exported.items():
+                column.append(cleaned[spec['exports'][key]].unique())
+    finally:
+        writer.close()
+    outputs[name] = writer
+
+    # Las tablas resumen se calculan sobre la salida completa: un grupo repartido entre
+    # dos bloques no puede quedar escrito dos veces ni a medias
+    for derived_name, build in spec.get('derived', {}).items():
+        derived_writer = TableWriter(output_path(clean_dir, derived_name, fmt), fmt)
+        try:
+            derived_writer.write(build(read_clean_table(name, clean_dir, fmt=fmt)))
+        finally:
+            derived_writer.close()
+        outputs[derived_name] = derived_writer
+
+    ids = {key: pd.Index(np.concatenate(parts)).unique() if parts else pd.Index([])
+           for key, parts in exported.items()}
+    schema = {table: schema_entry(w) for table, w in outputs.items()}
+    for table, w in outputs.items():
+        if w.coerced:
+            print(f"{table}: aviso, valores no numéricos convertidos a nulo: {w.coerced}")
+    return ids, schema
+
+def dep_refs(name, refs):
+    # Solo los ids que exportan las dependencias directas de la tabla
+    return {key: refs[key] for dep in TABLES[name]['deps'] for key in TABLES[dep].get('exports', {})}
+
+def run_stage(name, refs, data_dir=DATA_DIR, clean_dir=CLEAN_DIR, chunksize=None, fmt='csv'):
+    # Etapa del grafo (se ejecuta en un proceso del pool): limpia la tabla y mide el tiempo
+    start = time.perf_counter()
+    ids, schema = run_table(name, refs, data_dir, clean_dir, chunksize, fmt)
+    return name, ids, schema, time.perf_counter() - start
+
+def run_graph(stages, deps, submit, finish, workers=1):
+    """Ejecuta las etapas según su grafo de dependencias.
+
+    ``stages`` va en un orden válido para la ejecución secuencial y ``deps[name]``
+    son las etapas que deben terminar antes (las que no están en ``stages`` ya se
+    dan por hechas). ``submit(name)`` devuelve ``(función, argumentos)`` en el
+    momento de lanzar la etapa, con los resultados de sus dependencias ya
+    recibidos por ``finish``, que recibe lo que devuelve la función (el primer
+    elemento es el nombre de la etapa). Con ``workers`` > 1 cada etapa se lanza en
+    cuanto han terminado sus dependencias, con hasta ``workers`` procesos a la vez.
+    """
+    if workers <= 1:
+        for name in stages:
+            function, args = submit(name)
+            finish(function(*args))
+        return
+
+    pending = list(stages)
+    done = set()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        running = set()
+        while pending or running:
+            for name in [n for n in pending if all(d in done or d not in stages for d in deps[n])]:
+                pending.remove(name)
+                function, args = submit(name)
+                running.add(executor.submit(function, *args))
+            if not running:
+                raise ValueError(f"Dependencias circulares o desconocidas en: {', '.join(pending)}")
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                result = future.result()
+                finish(result)
+                done.add(result[0])
+
+def run(data_dir=DATA_DIR, clean_dir=CLEAN_DIR, chunksize=None, fmt='csv', workers=1):
+    """Ejecuta las etapas según el grafo de dependencias de TABLES.
+
+    Cada tabla se lanza en cuanto han terminado sus dependencias, con hasta
+    ``workers`` procesos a la vez; entre etapas solo viajan los conjuntos de ids.
+    """
+    refs = {}
+    tables = {}
+    start = time.perf_counter()
+
+    def submit(name):
+        return run_stage, (name, dep_refs(name, refs), data_dir, clean_dir, chunksize, fmt)
+
+    def finish(result):
+        name, ids, schema, seconds = result
+        refs.update(ids)
+        tables.update(schema)
+        print(f"{name}: {schema[name]['rows']} filas en {seconds:.1f} s")
+
+    run_graph(list(TABLES), {name: spec['deps'] for name, spec in TABLES.items()}, submit, finish, workers)
+
+    print(f"ETL completa en {time.perf_counter() - start:.1f} s")
+    write_schema(clean_dir, tables, fmt)
+    return refs
+
+# --- Modo incremental ---
+
+def file_fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_state(clean_dir=CLEAN_DIR):
+    try:
+        with open(os.path.join(clean_dir, STATE_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_state(clean_dir, fmt, fingerprints, watermarks):
+    path = os.path.join(clean_dir, STATE_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'format': fmt, 'fingerprints': fingerprints, 'watermarks': watermarks}, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+def parse_dates(df):
+    # Las fechas leídas de CSV vuelven como texto; se comparan y fusionan como timestamp
+    for column in ('date', 'transfer_date'):
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], errors='coerce')
+    return df
+
+def compute_watermarks(clean_dir, fmt):
+    watermarks = {}
+    for name, spec in INCREMENTAL_TABLES.items():
+        if spec['watermark']:
+            dates = parse_dates(read_clean_table(name, clean_dir, columns=[spec['watermark']], fmt=fmt))
+            latest = dates[spec['watermark']].max()
+            watermarks[name] = None if pd.isna(latest) else latest.strftime('%Y-%m-%d')
+    return watermarks
+
+def read_delta(name, refs, data_dir, watermark=None, game_ids=None, chunksize=CHUNK_SIZE):
+    """Limpia solo las filas desde la marca de agua (o de los partidos nuevos), leyendo por bloques."""
+    spec = INCREMENTAL_TABLES[name]
+    parts = []
+    for chunk in read_table(name, data_dir, chunksize):
+        if spec['watermark']:
+            # Se incluye el propio día de la marca de agua para recoger filas tardías de esa fecha
+            dates = pd.to_datetime(chunk[spec['watermark']], errors='coerce')
+            chunk = chunk[dates >= pd.Timestamp(watermark)] if watermark else chunk
+        else:
+            chunk = chunk[chunk['game_id'].isin(game_ids)]
+        if not chunk.empty:
+            parts.append(TABLES[name]['clean'](chunk, refs))
+    if not parts:
+        return None
+    return pd.concat(parts, ignore_index=True)
+
+def key_index(df, key):
+    return pd.MultiIndex.from_frame(df[key])
+
+def as_csv_text(df, na_rep=''):
+    # Filas como texto CSV, para comparar igual las leídas del CSV y las recién limpiadas
+    return pd.read_csv(io.StringIO(df.to_csv(index=False, na_rep=na_rep)), dtype=str, keep_default_na=False)
+
+def existing_rows(name, rows, key, clean_dir, fmt, na_rep=''):
+    """Filas ya escritas con las mismas claves que ``rows``, como texto CSV."""
+    path = output_path(clean_dir, name, fmt)
+    if fmt == 'csv':
+        chunks = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=CHUNK_SIZE)
+    else:
+        # Solo se leen las filas con la primera columna de la clave entre las del delta
+        values = rows[key[0]].dropna().unique().tolist()
+        chunks = [as_csv_text(pd.read_parquet(path, filters=[(key[0], 'in', values)]), na_rep)]
+    wanted = key_index(as_csv_text(rows, na_rep), key)
+    parts = [chunk[key_index(chunk, key).isin(wanted)] for chunk in chunks]
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=rows.columns)
+
+def rows_changed(name, rows, key, clean_dir, fmt, na_rep=''):
+    """Indica si alguna de las filas ya existentes en la salida ha cambiado (se comparan como texto CSV)."""
+    if fmt != 'csv':
+        # Mismos tipos que la salida columnar para que el texto coincida
+        rows = apply_dtypes(rows)
+    existing = existing_rows(name, rows, key, clean_dir, fmt, na_rep).sort_values(key, ignore_index=True)
+    return not existing.equals(as_csv_text(rows, na_rep).sort_values(key, ignore_index=True))
+
+def append_parquet(path, rows):
+    """Añade filas a una salida Parquet como un fichero más, sin reescribir las existentes.
+
+    La primera vez el fichero de la tabla pasa a ser un directorio (mismo nombre)
+    con la salida completa como primera parte; pd.read_parquet lee ambos igual.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    if os.path.isfile(path):
+        os.replace(path, path + '.tmp')
+        os.makedirs(path)
+        os.replace(path + '.tmp', os.path.join(path, 'part-00000.parquet'))
+    parts = sorted(p for p in os.listdir(path) if not p.startswith('.'))
+    schema = pq.read_schema(os.path.join(path, parts[0]))
+    table = pa.Table.from_pandas(apply_dtypes(rows), schema=schema, preserve_index=False)
+    # Se escribe con un nombre oculto (pyarrow ignora los que empiezan por punto) y se
+    # renombra: un lector nunca ve una parte a medias
+    name = f'part-{len(parts):05d}.parquet'
+    pq.write_table(table, os.path.join(path, f'.{name}.tmp'))
+    os.replace(os.path.join(path, f'.{name}.tmp'), os.path.join(path, name))
+
+def merge_delta(name, delta, clean_dir=CLEAN_DIR, fmt='csv'):
+    """Fusiona las filas nuevas o modificadas con la salida limpia de la tabla.
+
+    Devuelve ``(tabla, entrada)``: la tabla completa si se ha reescrito (si no, None)
+    y su entrada de schema.json, o ``{'appended': filas}`` si solo se han añadido filas.
+    """
+    key = INCREMENTAL_TABLES[name]['key']
+    path = output_path(clean_dir, name, fmt)
+    na_rep = TABLES[name].get('na_rep', '')
+
+    if fmt in ('csv', 'parquet'):
+        existing_keys = parse_dates(read_clean_table(name, clean_dir, columns=key, fmt=fmt))
+        overlap = key_index(parse_dates(delta.copy()), key).isin(key_index(existing_keys, key))
+        # Las filas del día de la marca de agua se releen siempre; si no han cambiado se ignoran
+        if not overlap.any() or not rows_changed(name, delta[overlap], key, clean_dir, fmt, na_rep):
+            # Solo filas nuevas: se añaden sin reescribir la tabla
+            new_rows = delta[~overlap]
+            if new_rows.empty:
+                pass
+            elif fmt == 'csv':
+                new_rows.to_csv(path, index=False, mode='a', header=False, na_rep=na_rep)
+            else:
+                append_parquet(path, new_rows)
+            return None, {'appended': len(new_rows)}
+
+    # Hay filas modificadas (o Feather, que no admite añadir): se reescribe la tabla sustituyéndolas
+    existing = parse_dates(read_clean_table(name, clean_dir, fmt=fmt))
+    merged = pd.concat([existing, parse_dates(delta.copy())], ignore_index=True)
+    merged = merged.drop_duplicates(subset=key, keep='last')
+    writer = TableWriter(path, fmt, na_rep=na_rep)
+    try:
+        writer.write(merged)
+    finally:
+        writer.close()
+    return merged, schema_entry(writer)
+
+def run_delta_stage(name, refs, data_dir, clean_dir, fmt, watermark, game_ids, chunksize):
+    """Etapa incremental del grafo (se ejecuta en un proceso del pool).
+
+    Devuelve ``(nombre, ids, esquema, resumen, segundos)``: los ids del delta, las
+    entradas de schema.json que cambian y el resumen (filas y nueva marca de
+    agua), o None si no hay filas nuevas. players se limpia entera.
+    """
+    start = time.perf_counter()
+    if name not in INCREMENTAL_TABLES:
+        ids, schema = run_table(name, refs, data_dir, clean_dir, chunksize, fmt)
+        return name, ids, schema, None, time.perf_counter() - start
+
+    delta = read_delta(name, refs, data_dir, watermark, game_ids, chunksize or CHUNK_SIZE)
+    if delta is None or delta.empty:
+        return name, {}, {}, None, time.perf_counter() - start
+
+    merged, entry = merge_delta(name, delta, clean_dir, fmt)
+    schema = {name: entry}
+    ids = {ref_name: pd.Index(delta[column].unique()) for ref_name, column in TABLES[name].get('exports', {}).items()}
+    if name == 'games':
+        # Resumen por equipo y temporada: solo se recalculan las temporadas afectadas
+        games = merged if merged is not None else read_clean_table('games', clean_dir, fmt=fmt)
+        stats = read_clean_table('team_season_stats', clean_dir, fmt=fmt)
+        writer = TableWriter(output_path(clean_dir, 'team_season_stats', fmt), fmt)
+        try:
+            writer.write(refresh_team_season_stats(stats, games, delta))
+        finally:
+            writer.close()
+        schema['team_season_stats'] = schema_entry(writer)
+
+    latest = None
+    column = INCREMENTAL_TABLES[name]['watermark']
+    if column:
+        value = parse_dates(delta[[column]].copy())[column].max()
+        latest = None if pd.isna(value) else value.strftime('%Y-%m-%d')
+    return name, ids, schema, {'rows': len(delta), 'watermark': latest}, time.perf_counter() - start
+
+def delta_deps(name):
+    # Dependencias en modo incremental: las de TABLES y, para las tablas sin fecha, los partidos nuevos
+    deps = list(TABLES[name]['deps'])
+    if name in INCREMENTAL_TABLES and INCREMENTAL_TABLES[name]['watermark'] is None:
+        deps.append('games')
+    return deps
+
+def run_incremental(data_dir=DATA_DIR, clean_dir=CLEAN_DIR, chunksize=None, fmt='csv', workers=1):
+    state = load_state(clean_dir)
+    fingerprints = {name: file_fingerprint(os.path.join(data_dir, f'{name}.csv')) for name in REFERENCE_TABLES}
+
+    if state is None or state.get('format') != fmt or state.get('fingerprints') != fingerprints:
+        # Primera ejecución o cambios en competitions/clubs: cascada completa
+        print("Tablas de referencia nuevas o modificadas: limpieza completa")
+        refs = run(data_dir, clean_dir, chunksize, fmt, workers)
+        save_state(clean_dir, fmt, fingerprints, compute_watermarks(clean_dir, fmt))
+        return refs
+
+    # Ids de las tablas de referencia, tomados de las salidas ya limpias
+    refs = {
+        'competition_ids': pd.Index(read_clean_table('competitions', clean_dir, ['competition_id'], fmt)['competition_id']).unique(),
+        'club_ids': pd.Index(read_clean_table('clubs', clean_dir, ['club_id'], fmt)['club_id']).unique(),
+        'game_ids': pd.Index(read_clean_table('games', clean_dir, ['game_id'], fmt)['game_id']).unique(),
+        'club_game_ids': pd.Index(read_clean_table('club_games', clean_dir, ['game_id'], fmt)['game_id']).unique(),
+    }
+    watermarks = dict(state.get('watermarks', {}))
+    new_game_ids = {'games': pd.Index([])}
+    tables = load_schema(clean_dir)
+    start = time.perf_counter()
+
+    # players es pequeña y cambia en cada descarga (valor de mercado, club): se limpia entera,
+    # como una etapa más del grafo junto a los deltas de las tablas de hechos
+    stages = ['players', *INCREMENTAL_TABLES]
+
+    def submit(name):
+        return run_delta_stage, (name, dep_refs(name, refs), data_dir, clean_dir, fmt,
+                                 watermarks.get(name), new_game_ids['games'], chunksize)
+
+    def finish(result):
+        name, ids, schema, summary, seconds = result
+        for ref_name, values in ids.items():
+            # Las tablas incrementales aportan ids nuevos; players, todos los suyos
+            incremental = name in INCREMENTAL_TABLES and ref_name in refs
+            refs[ref_name] = refs[ref_name].append(values).unique() if incremental else values
+        if name == 'games':
+            new_game_ids['games'] = ids.get('game_ids', pd.Index([]))
+
+        for table, entry in schema.items():
+            if 'appended' in entry:
+                if table in tables:
+                    tables[table]['rows'] += entry['appended']
+            else:
+                tables[table] = entry
+        if schema:
+            # El manifiesto se reescribe tras cada fusión para no quedar desfasado si la ejecución se corta
+            write_schema(clean_dir, tables, fmt)
+
+        if name not in INCREMENTAL_TABLES:
+            print(f"{name}: {schema[name]['rows']} filas en {seconds:.1f} s")
+        elif summary is None:
+            print(f"{name}: sin cambios ({seconds:.1f} s)")
+        else:
+            print(f"{name}: {summary['rows']} filas desde la marca de agua en {seconds:.1f} s")
+            latest = summary['watermark']
+            if latest and (watermarks.get(name) is None or latest > watermarks[name]):
+                watermarks[name] = latest
+
+    run_graph(stages, {name: delta_deps(name) for name in stages}, submit, finish, workers)
+
+    print(f"ETL incremental completa en {time.perf_counter() - start:.1f} s")
+    save_state(clean_dir, fmt, fingerprints, watermarks)
+    return refs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data-dir', default=DATA_DIR, help='Directorio con los CSV originales')
+    parser.add_argument('--clean-dir', default=CLEAN_DIR, help='Directorio de salida de los *_clean.csv')
+    parser.add_argument('--stream', action='store_true', help='Procesar las tablas grandes por bloques')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Filas por bloque en modo streaming')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv', help='Formato de las tablas limpias')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Procesar solo las filas nuevas desde la última ejecución')
+    parser.add_argument('--workers', type=int, default=ETL_WORKERS,
+                        help='Procesos para limpiar en paralelo las tablas independientes (1 = secuencial)')
+    args = parser.parse_args()
+    if args.stream and args.format == 'feather':
+        parser.error('--format feather no admite --stream; usa parquet')
+
+    os.makedirs(args.clean_dir, exist_ok=True)
+    chunksize = args.chunk_size if args.stream else None
+    if args.incremental:
+        run_incremental(args.data_dir, args.clean_dir, chunksize, args.format, args.workers)
+    else:
+        run(args.data_dir, args.clean_dir, chunksize=chunksize, fmt=args.format, workers=args.workers)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from batch_scoring import DEFAULT_FEATURES
+from cache import LRUCache
+from data import CLEAN_DIR, output_path, read_clean_table
+from search_index import SearchIndex
+
+# Tablas que sirve app_resp.py: columna id (índice hash) y columnas con índice de grupos
+ENGINE_TABLES = {
+    'competitions': {'id': 'competition_id', 'groups': ['type']},
+    'clubs': {'id': 'club_id', 'groups': ['domestic_competition_id']},
+    'players': {'id': 'player_id', 'groups': ['current_club_id', 'position']},
+    'games': {'id': 'game_id', 'groups': ['competition_id']},
+}
+
+
+def source_path(name, clean_dir=CLEAN_DIR):
+    # El mismo orden de preferencia que read_clean_table: Parquet, Feather y CSV
+    for fmt in ('parquet', 'feather', 'csv'):
+        path = output_path(clean_dir, name, fmt)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class DataSnapshot:
+    """Versión inmutable de las tablas en memoria con sus índices.
+
+    Cada petición trabaja con una sola instantánea, así que una recarga nunca
+    mezcla filas de dos versiones de los datos.
+    """
+
+    def __init__(self, tables, version):
+        self.version = version
+        self.tables = tables
+        self._ids = {}
+        self._groups = {}
+        for name, spec in ENGINE_TABLES.items():
+            frame = tables[name]
+            # Índice hash id -> posición y grupos valor -> posiciones (en el orden de la tabla)
+            self._ids[name] = dict(zip(frame[spec['id']].tolist(), range(len(frame))))
+            for column in [c for c in spec['groups'] if c in frame.columns]:
+                indices = frame.groupby(column, sort=False, observed=True).indices
+                self._groups[(name, column)] = {str(key): positions for key, positions in indices.items()}
+
+        # Índice de autocompletado de esta versión de los datos
+        players = tables['players'].reindex(
+            columns=['player_id', 'name', 'country_of_citizenship', 'market_value_in_eur'])
+        clubs = tables['clubs'][['club_id', 'name']]
+        self.search = SearchIndex.from_records(players.to_dict('records'), clubs.to_dict('records'))
+
+    def table(self, name):
+        return self.tables[name]
+
+    def get(self, name, id_value):
+        # Una fila por id como dict, o None
+        position = self._ids[name].get(id_value)
+        return None if position is None else self.tables[name].iloc[position].to_dict()
+
+    def rows(self, name, column, value):
+        # Filas de un grupo (p. ej. partidos de una competición) sin recorrer la tabla
+        frame = self.tables[name]
+        groups = self._groups.get((name, column))
+        if groups is None:
+            # Columna sin índice: filtro sobre la tabla
+            return frame[frame[column].astype(str) == str(value)]
+        positions = groups.get(str(value))
+        return frame.iloc[positions] if positions is not None else frame.iloc[0:0]
+
+
+class DataEngine:
+    """Tablas limpias de data.py cargadas una vez en memoria y recargadas cuando cambian los ficheros.
+
+    La instantánea nueva se construye entera antes de sustituir a la anterior.
+    """
+
+    def __init__(self, clean_dir=CLEAN_DIR, check_interval=5.0):
+        self.clean_dir = clean_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._checked_at = 0.0
+        self.snapshot()
+
+    def _version(self):
+        # Ruta y fecha de modificación de cada tabla: cambia en cuanto data.py reescribe una salida
+        version = []
+        for name in ENGINE_TABLES:
+            path = source_path(name, self.clean_dir)
+            if path is None:
+                raise FileNotFoundError(f"No hay salida limpia de {name} en {self.clean_dir}; ejecuta data.py")
+            version.append((os.path.basename(path), os.path.getmtime(path)))
+        return tuple(version)
+
+    def _load(self, version):
+        tables = {name: read_clean_table(name, self.clean_dir) for name in ENGINE_TABLES}
+        for frame in tables.values():
+            # Fechas como texto (igual que en los CSV originales) para la salida JSON
+            for column in frame.select_dtypes(include='datetime').columns:
+                frame[column] = frame[column].dt.strftime('%Y-%m-%d')
+
+        # players limpio no guarda el nombre del club; se añade para la búsqueda por club
+        club_names = tables['clubs'].set_index('club_id')['name']
+        tables['players']['current_club_name'] = tables['players']['current_club_id'].map(club_names)
+        # Tampoco games limpio: /api/games devuelve los nombres de los dos equipos, como el games.csv original
+        tables['games']['home_club_name'] = tables['games']['home_club_id'].map(club_names)
+        tables['games']['away_club_name'] = tables['games']['away_club_id'].map(club_names)
+        # Partidos de más reciente a más antiguo: los grupos por competición ya salen ordenados
+        tables['games'] = tables['games'].sort_values('season', ascending=False, kind='stable', ignore_index=True)
+        return DataSnapshot(tables, version)
+
+    def snapshot(self):
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked_at < self.check_interval:
+            return self._snapshot
+        with self._lock:
+            if self._snapshot is None or now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                version = self._version()
+                if self._snapshot is None or version != self._snapshot.version:
+                    self._snapshot = self._load(version)
+            return self._snapshot
+
+
+class PlayerFeatures:
+    """Filas de merged_data agrupadas por jugador para /predict/<player_id>.
+
+    Solo se guardan player_id y las columnas del modelo, ordenadas por jugador
+    en una matriz contigua; las filas de un jugador son un rango de esa matriz
+    (un slice sin copia) localizado con un índice de desplazamientos.
+    """
+
+    def __init__(self, path='merged_data.csv', features=DEFAULT_FEATURES, cache_size=4096):
+        self.features = list(features)
+        frame = pd.read_csv(path, usecols=['player_id'] + self.features)
+        # Orden estable: dentro de cada jugador se mantiene el orden del fichero
+        frame = frame.sort_values('player_id', kind='stable')
+        self._values = np.ascontiguousarray(frame[self.features].to_numpy(dtype='float64'))
+        player_ids, starts, counts = np.unique(frame['player_id'].to_numpy(), return_index=True, return_counts=True)
+        self._offsets = {int(pid): (int(start), int(start + count))
+                         for pid, start, count in zip(player_ids, starts, counts)}
+        # Predicciones por (versión del modelo, jugador)
+        self._predictions = LRUCache(maxsize=cache_size)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def rows(self, player_id):
+        # Matriz de características del jugador (vista sobre la matriz común) o None
+        offsets = self._offsets.get(player_id)
+        if offsets is None:
+            return None
+        start, end = offsets
+        return pd.DataFrame(self._values[start:end], columns=self.features, copy=False)
+
+    def predict(self, model, player_id, version=None):
+        # /predict/<player_id> solo devuelve la predicción de la primera fila del jugador:
+        # se predice y se guarda en caché ese valor, no el array de todas sus filas
+        key = (version, player_id)
+        prediction = self._predictions.get(key)
+        if prediction is None:
+            rows = self.rows(player_id)
+            if rows is None:
+                return None
+            prediction = float(model.predict(rows.iloc[:1])[0])
+            self._predictions.set(key, prediction)
+        return prediction
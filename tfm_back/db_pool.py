@@ -0,0 +1,216 @@
+import os
+import queue
+import threading
+import time
+
+import pymysql
+
+# Configuración de la base de datos MySQL (se puede sobreescribir con variables de entorno)
+DB_CONFIG = {
+    'host': os.environ.get('TFM_DB_HOST', 'localhost'),
+    'user': os.environ.get('TFM_DB_USER', 'root'),
+    'password': os.environ.get('TFM_DB_PASSWORD', 'root'),
+    'database': os.environ.get('TFM_DB_NAME', 'tfm_bbdd'),
+    'cursorclass': pymysql.cursors.DictCursor,
+    # Cada consulta ve los datos más recientes aunque la conexión se reutilice
+    'autocommit': True,
+}
+
+# Tamaño máximo del pool y tiempo máximo de espera para obtener una conexión
+DB_POOL_SIZE = int(os.environ.get('TFM_DB_POOL_SIZE', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('TFM_DB_POOL_TIMEOUT', 30))
+
+
+class PoolExhausted(Exception):
+    """No se ha podido obtener una conexión del pool dentro del tiempo de espera."""
+
+
+class PooledConnection:
+    """Envoltorio de una conexión pymysql: close() la devuelve al pool en lugar de cerrarla."""
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def close(self):
+        # Idempotente, igual que connection.close() en los endpoints
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection)
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise pymysql.err.InterfaceError(0, 'La conexión ya se ha devuelto al pool')
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ConnectionPool:
+    """Pool de conexiones MySQL acotado y seguro entre hilos.
+
+    Las conexiones se crean bajo demanda hasta ``size``; al sacar una conexión se
+    comprueba con ``ping`` y se reconecta si el servidor la ha cerrado.
+    ``on_wait(segundos)`` recibe la espera de cada petición de conexión y
+    ``on_timeout()`` se llama cada vez que una agota la espera (métricas).
+    """
+
+    def __init__(self, config, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, on_wait=None, on_timeout=None):
+        self.config = dict(config)
+        self.size = size
+        self.timeout = timeout
+        self.on_wait = on_wait
+        self.on_timeout = on_timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._created = 0
+        # Contadores
+        self.checkouts = 0
+        self.reconnects = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _connect(self):
+        return pymysql.connect(**self.config)
+
+    def _reserve_slot(self):
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return True
+            return False
+
+    def _free_slot(self):
+        with self._lock:
+            self._created -= 1
+
+    def _checkout(self):
+        # Primero una conexión libre; si no hay, abrimos una nueva si queda hueco
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        if self._reserve_slot():
+            try:
+                return self._connect()
+            except Exception:
+                self._free_slot()
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self.timeouts += 1
+            if self.on_timeout is not None:
+                self.on_timeout()
+            raise PoolExhausted(f'No hay conexiones libres tras {self.timeout} s (tamaño del pool: {self.size})')
+
+    def _health_check(self, connection):
+        # ping(reconnect=True) reabre la conexión si el servidor la ha cerrado
+        try:
+            connection.ping(reconnect=False)
+            return connection
+        except pymysql.err.Error:
+            pass
+        with self._lock:
+            self.reconnects += 1
+        try:
+            connection.ping(reconnect=True)
+            return connection
+        except pymysql.err.Error:
+            try:
+                connection.close()
+            except pymysql.err.Error:
+                pass
+            return self._connect()
+
+    def get_connection(self):
+        start = time.perf_counter()
+        connection = self._checkout()
+        waited = time.perf_counter() - start
+        try:
+            connection = self._health_check(connection)
+        except Exception:
+            self._free_slot()
+            raise
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        if self.on_wait is not None:
+            self.on_wait(waited)
+        return PooledConnection(self, connection)
+
+    def release(self, connection):
+        try:
+            # Descartamos cualquier transacción abierta antes de reutilizar la conexión
+            connection.rollback()
+        except pymysql.err.Error:
+            try:
+                connection.close()
+            except pymysql.err.Error:
+                pass
+            self._free_slot()
+            return
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+            self._free_slot()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'open': self._created,
+                'idle': self._idle.qsize(),
+                'checkouts': self.checkouts,
+                'reconnects': self.reconnects,
+                'timeouts': self.timeouts,
+                'wait_seconds_total': round(self.wait_seconds_total, 6),
+                'wait_seconds_avg': round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+                'wait_seconds_max': round(self.wait_seconds_max, 6),
+            }
+
+
+# Versión de los datos cargados: load_mysql.py la incrementa tras cada recarga
+DATASET_VERSION_SQL = "SELECT version FROM dataset_version WHERE id = 1"
+
+
+class DatasetVersion:
+    """Versión de dataset_version, consultada como mucho cada ``check_interval`` segundos.
+
+    Sin la tabla (migraciones sin aplicar) la versión es None y las cachés que
+    dependen de ella no se invalidan nunca.
+    """
+
+    def __init__(self, pool, check_interval=5.0):
+        self.pool = pool
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = None
+
+    def get(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._version
+        with self._lock:
+            if self._checked_at is None or now - self._checked_at >= self.check_interval:
+                connection = self.pool.get_connection()
+                try:
+                    with connection.cursor() as cursor:
+                        cursor.execute(DATASET_VERSION_SQL)
+                        row = cursor.fetchone()
+                    self._version = row['version'] if row else None
+                except pymysql.err.ProgrammingError:
+                    self._version = None
+                finally:
+                    connection.close()
+                self._checked_at = now
+            return self._version
@@ -0,0 +1,217 @@
+"""Carga de las tablas limpias de data.py en MySQL (base de datos de app.py).
+
+Cada tabla se carga en paralelo en una tabla sombra ``<tabla>_new`` con
+``LOAD DATA LOCAL INFILE`` (o ``executemany`` por lotes si el servidor no lo
+permite o solo hay salidas Parquet/Feather). Antes se aplican las migraciones
+pendientes (migrate.py), de modo que las tablas sombra nacen con el esquema al
+día. Los índices secundarios se crean cuando la tabla ya está cargada y, al
+final, todas las tablas se sustituyen a la vez con un único ``RENAME TABLE``:
+los lectores nunca ven una tabla a medias.
+
+    python load_mysql.py --clean-dir D:/UEM/TFM_DATA/tfm_data/data_clean
+"""
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pymysql
+
+from data import CLEAN_DIR, output_path, read_clean_table
+from db_pool import DB_CONFIG
+from migrate import migrate
+
+# Tabla de MySQL -> tabla limpia de data.py
+LOAD_TABLES = {
+    'competition': 'competitions',
+    'clubs': 'clubs',
+    'games': 'games',
+    'players': 'players',
+    'game_events': 'game_events',
+    'team_season_stats': 'team_season_stats',
+}
+
+# Filas por executemany cuando no se puede usar LOAD DATA LOCAL INFILE
+INSERT_BATCH_SIZE = 10000
+
+
+def connect():
+    return pymysql.connect(**dict(DB_CONFIG, local_infile=True))
+
+
+def table_columns(cursor, table):
+    # Las columnas generadas las calcula MySQL y no se cargan
+    cursor.execute(f'SHOW COLUMNS FROM {table}')
+    return [row['Field'] for row in cursor.fetchall() if 'GENERATED' not in row['Extra'].upper()]
+
+
+def secondary_indexes(cursor, table):
+    # [(nombre, definición para ALTER TABLE ... ADD)] de los índices que no son la clave primaria
+    cursor.execute(f'SHOW INDEX FROM {table}')
+    indexes = {}
+    for row in cursor.fetchall():
+        if row['Key_name'] == 'PRIMARY':
+            continue
+        index = indexes.setdefault(row['Key_name'], {'unique': not row['Non_unique'], 'parts': []})
+        if row.get('Expression'):
+            part = f"({row['Expression']})"
+        else:
+            part = f"`{row['Column_name']}`" + (f"({row['Sub_part']})" if row['Sub_part'] else '')
+        index['parts'].append((row['Seq_in_index'], part))
+    return [
+        (name, f"ADD {'UNIQUE ' if index['unique'] else ''}INDEX `{name}` "
+               f"({', '.join(part for _, part in sorted(index['parts']))})")
+        for name, index in indexes.items()
+    ]
+
+
+def prepare_shadow(cursor, table):
+    # La tabla sombra copia la definición actual (incluidas las migraciones) sin índices secundarios
+    shadow = f'{table}_new'
+    cursor.execute(f'DROP TABLE IF EXISTS {shadow}')
+    cursor.execute(f'CREATE TABLE {shadow} LIKE {table}')
+    indexes = secondary_indexes(cursor, shadow)
+    if indexes:
+        cursor.execute(f'ALTER TABLE {shadow} ' + ', '.join(f'DROP INDEX `{name}`' for name, _ in indexes))
+    return shadow, indexes
+
+
+def load_data_infile(cursor, shadow, path, columns):
+    with open(path, encoding='utf-8', newline='') as f:
+        first_line = f.readline()
+    header = next(csv.reader([first_line]))
+    # pandas escribe los CSV con el fin de línea del sistema (\r\n en Windows)
+    line_end = '\\r\\n' if first_line.endswith('\r\n') else '\\n'
+
+    targets, assignments = [], []
+    for i, column in enumerate(header):
+        if column in columns:
+            targets.append(f'@v{i}')
+            # Vacío o NULL (na_rep de players y game_events) se guardan como NULL
+            assignments.append(f"`{column}` = NULLIF(NULLIF(@v{i}, ''), 'NULL')")
+        else:
+            targets.append('@skip')
+
+    cursor.execute(f"""
+        LOAD DATA LOCAL INFILE %s INTO TABLE {shadow} CHARACTER SET utf8mb4
+        FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+        LINES TERMINATED BY '{line_end}'
+        IGNORE 1 LINES
+        ({', '.join(targets)})
+        SET {', '.join(assignments)}
+    """, (os.path.abspath(path),))
+
+
+def insert_batches(cursor, shadow, name, clean_dir, columns, batch_size=INSERT_BATCH_SIZE):
+    path = output_path(clean_dir, name)
+    if os.path.exists(path):
+        chunks = pd.read_csv(path, chunksize=batch_size, na_values=['NULL'])
+    else:
+        df = read_clean_table(name, clean_dir)
+        chunks = (df.iloc[start:start + batch_size] for start in range(0, len(df), batch_size))
+
+    for chunk in chunks:
+        names = [column for column in chunk.columns if column in columns]
+        values = chunk[names].astype(object)
+        values = values.where(values.notna(), None)
+        sql = (f"INSERT INTO {shadow} ({', '.join(f'`{n}`' for n in names)}) "
+               f"VALUES ({', '.join(['%s'] * len(names))})")
+        cursor.executemany(sql, list(values.itertuples(index=False, name=None)))
+
+
+def load_table(table, name, clean_dir=CLEAN_DIR, use_infile=True, batch_size=INSERT_BATCH_SIZE):
+    """Carga una tabla limpia en ``<tabla>_new`` y crea después sus índices; devuelve filas, método y tiempo."""
+    start = time.perf_counter()
+    connection = connect()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SET SESSION unique_checks = 0, foreign_key_checks = 0')
+            shadow, indexes = prepare_shadow(cursor, table)
+            columns = table_columns(cursor, shadow)
+
+            method = 'executemany'
+            path = output_path(clean_dir, name)
+            if use_infile and os.path.exists(path):
+                try:
+                    load_data_infile(cursor, shadow, path, columns)
+                    method = 'LOAD DATA'
+                except (pymysql.err.OperationalError, pymysql.err.InternalError) as e:
+                    # local_infile desactivado en el servidor: inserciones por lotes
+                    print(f"{table}: LOAD DATA LOCAL INFILE no disponible ({e}); se usa executemany")
+                    cursor.execute(f'TRUNCATE TABLE {shadow}')
+            if method == 'executemany':
+                insert_batches(cursor, shadow, name, clean_dir, columns, batch_size)
+
+            # Índices secundarios al final: se construyen una sola vez sobre la tabla ya cargada
+            if indexes:
+                cursor.execute(f'ALTER TABLE {shadow} ' + ', '.join(definition for _, definition in indexes))
+
+            cursor.execute(f'SELECT COUNT(*) AS total FROM {shadow}')
+            rows = cursor.fetchone()['total']
+        connection.commit()
+    finally:
+        connection.close()
+    return table, rows, method, time.perf_counter() - start
+
+
+def swap_tables(cursor, tables):
+    # Un único RENAME TABLE es atómico: todas las tablas cambian a la vez
+    for table in tables:
+        cursor.execute(f'DROP TABLE IF EXISTS {table}_old')
+    cursor.execute('RENAME TABLE ' + ', '.join(f'{t} TO {t}_old, {t}_new TO {t}' for t in tables))
+    for table in tables:
+        cursor.execute(f'DROP TABLE {table}_old')
+
+
+def run(clean_dir=CLEAN_DIR, tables=None, workers=None, use_infile=True, batch_size=INSERT_BATCH_SIZE):
+    tables = list(tables or LOAD_TABLES)
+    start = time.perf_counter()
+
+    connection = connect()
+    try:
+        # Esquema base y migraciones antes de crear las tablas sombra a partir de las actuales
+        migrate(connection)
+
+        with ThreadPoolExecutor(max_workers=workers or len(tables)) as executor:
+            futures = [executor.submit(load_table, table, LOAD_TABLES[table], clean_dir, use_infile, batch_size)
+                       for table in tables]
+            try:
+                for future in futures:
+                    table, rows, method, seconds = future.result()
+                    print(f"{table}: {rows} filas ({method}) en {seconds:.1f} s")
+            except Exception:
+                # Si falla una tabla no se sustituye ninguna
+                for future in futures:
+                    future.exception()
+                with connection.cursor() as cursor:
+                    for table in tables:
+                        cursor.execute(f'DROP TABLE IF EXISTS {table}_new')
+                raise
+
+        with connection.cursor() as cursor:
+            swap_tables(cursor, tables)
+            # Nueva versión del dataset: los servidores vacían sus cachés de respuestas
+            cursor.execute("UPDATE dataset_version SET version = version + 1, loaded_at = NOW() WHERE id = 1")
+        connection.commit()
+    finally:
+        connection.close()
+
+    print(f"Carga completa en {time.perf_counter() - start:.1f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clean-dir', default=CLEAN_DIR, help='Directorio con las salidas de data.py')
+    parser.add_argument('--tables', nargs='+', choices=list(LOAD_TABLES), help='Tablas a cargar (por defecto todas)')
+    parser.add_argument('--workers', type=int, default=None, help='Tablas cargadas a la vez (por defecto todas)')
+    parser.add_argument('--batch-size', type=int, default=INSERT_BATCH_SIZE, help='Filas por executemany')
+    parser.add_argument('--no-infile', action='store_true', help='No usar LOAD DATA LOCAL INFILE')
+    args = parser.parse_args()
+
+    run(args.clean_dir, args.tables, args.workers, not args.no_infile, args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""Métricas de peticiones y consultas SQL en formato texto de Prometheus, y registro estructurado.
+
+Sin dependencias externas: histogramas y contadores en memoria del proceso,
+expuestos en ``/metrics`` por app.py y app_async.py.
+
+- ``tfm_http_request_duration_seconds``: latencia por endpoint, método y código.
+- ``tfm_db_query_duration_seconds``: duración de cada consulta por endpoint y tabla.
+- ``tfm_db_queries_per_request``: consultas SQL ejecutadas por petición.
+- ``tfm_db_pool_wait_seconds``: espera para obtener una conexión del pool.
+- ``tfm_chart_render_seconds``: tiempo de dibujo de los gráficos no cacheados.
+
+El registro sustituye a los ``print``: una línea JSON por evento en el logger
+``tfm``. Las peticiones se registran por muestreo (TFM_LOG_SAMPLE_RATE); las
+lentas (TFM_SLOW_REQUEST_MS, TFM_SLOW_QUERY_MS) y los errores, siempre.
+"""
+import bisect
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+import pymysql
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LOG_SAMPLE_RATE = float(os.environ.get('TFM_LOG_SAMPLE_RATE', 0.01))
+SLOW_REQUEST_MS = float(os.environ.get('TFM_SLOW_REQUEST_MS', 1000))
+SLOW_QUERY_MS = float(os.environ.get('TFM_SLOW_QUERY_MS', 500))
+
+# Límites superiores (segundos) de los cubos de los histogramas de tiempo
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+logger = logging.getLogger('tfm')
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(os.environ.get('TFM_LOG_LEVEL', 'INFO'))
+    logger.propagate = False
+
+
+def log_event(event, level=logging.INFO, sample_rate=1.0, **fields):
+    """Una línea JSON con el evento y sus campos; con ``sample_rate`` < 1 solo se registra esa fracción."""
+    if sample_rate < 1.0 and random.random() >= sample_rate:
+        return
+    if logger.isEnabledFor(level):
+        logger.log(level, json.dumps(dict(ts=round(time.time(), 3), event=event, **fields), default=str))
+
+
+def log_error(event, error, **fields):
+    # Los errores se registran siempre y se cuentan en tfm_errors_total
+    ERRORS.inc(event)
+    log_event(event, level=logging.ERROR, error=str(error), error_type=type(error).__name__, **fields)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def lines(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        for labels, value in values:
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+
+
+class Gauge:
+    """Valor leído en el momento de servir /metrics: ``read()`` devuelve un número o ``{etiquetas: valor}``."""
+
+    def __init__(self, name, documentation, read, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._read = read
+        REGISTRY.append(self)
+
+    def lines(self):
+        values = self._read()
+        if not isinstance(values, dict):
+            values = {(): values}
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} gauge'
+        for labels, value in sorted(values.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}'
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # etiquetas -> [observaciones por cubo (la última, +Inf), suma]
+        self._series = {}
+        REGISTRY.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def lines(self):
+        with self._lock:
+            series = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        names = self.labelnames + ('le',)
+        for labels, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}'
+            label_text = _format_labels(self.labelnames, labels)
+            yield f'{self.name}_sum{label_text} {_format_value(total)}'
+            yield f'{self.name}_count{label_text} {cumulative}'
+
+
+REGISTRY = []
+
+REQUEST_LATENCY = Histogram('tfm_http_request_duration_seconds', 'Duración de las peticiones HTTP',
+                            ('endpoint', 'method', 'status'))
+QUERY_LATENCY = Histogram('tfm_db_query_duration_seconds', 'Duración de las consultas SQL', ('endpoint', 'table'))
+QUERIES_PER_REQUEST = Histogram('tfm_db_queries_per_request', 'Consultas SQL por petición', ('endpoint',),
+                                buckets=COUNT_BUCKETS)
+POOL_WAIT = Histogram('tfm_db_pool_wait_seconds', 'Espera para obtener una conexión del pool',
+                      buckets=POOL_WAIT_BUCKETS)
+POOL_TIMEOUTS = Counter('tfm_db_pool_timeouts_total', 'Peticiones de conexión que han agotado la espera')
+ERRORS = Counter('tfm_errors_total', 'Errores registrados por tipo de evento', ('event',))
+CHART_RENDER = Histogram('tfm_chart_render_seconds', 'Tiempo de dibujo de los gráficos', ('chart', 'format'))
+
+
+def render():
+    """Todas las métricas en el formato de texto de Prometheus."""
+    return '\n'.join(line for metric in REGISTRY for line in metric.lines()) + '\n'
+
+
+# Petición en curso (por hilo en Flask, por tarea en asyncio): endpoint, consultas y tiempo en MySQL
+_current_request = contextvars.ContextVar('tfm_request', default=None)
+
+
+def start_request(endpoint):
+    state = {'endpoint': endpoint, 'start': time.perf_counter(), 'queries': 0, 'db_seconds': 0.0}
+    _current_request.set(state)
+    return state
+
+
+def finish_request(state, method, status):
+    _current_request.set(None)
+    seconds = time.perf_counter() - state['start']
+    endpoint = state['endpoint']
+    REQUEST_LATENCY.observe(seconds, endpoint, method, str(status))
+    QUERIES_PER_REQUEST.observe(state['queries'], endpoint)
+
+    slow = seconds * 1000 >= SLOW_REQUEST_MS
+    log_event('slow_request' if slow else 'request',
+              level=logging.WARNING if slow or status >= 500 else logging.INFO,
+              sample_rate=1.0 if slow or status >= 500 else LOG_SAMPLE_RATE,
+              endpoint=endpoint, method=method, status=status, duration_ms=round(seconds * 1000, 2),
+              queries=state['queries'], db_ms=round(state['db_seconds'] * 1000, 2))
+
+
+_TABLE = re.compile(r'\bFROM\s+(\w+)', re.IGNORECASE)
+
+
+def record_query(sql, seconds):
+    # Tabla principal (primer FROM que no es una subconsulta) como etiqueta de baja cardinalidad
+    match = _TABLE.search(sql)
+    table = match.group(1) if match else 'other'
+    state = _current_request.get()
+    endpoint = state['endpoint'] if state else 'background'
+    if state:
+        state['queries'] += 1
+        state['db_seconds'] += seconds
+    QUERY_LATENCY.observe(seconds, endpoint, table)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        log_event('slow_query', level=logging.WARNING, endpoint=endpoint, table=table,
+                  duration_ms=round(seconds * 1000, 2), sql=' '.join(sql.split())[:1000])
+
+
+class TimedCursorMixin:
+    """Cursor pymysql que mide cada consulta (se indica como ``cursorclass`` del pool).
+
+    ``executemany`` ejecuta sus lotes con ``execute``, así que también queda medido.
+    """
+
+    def execute(self, query, args=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, args)
+        finally:
+            record_query(query, time.perf_counter() - start)
+
+
+class TimedDictCursor(TimedCursorMixin, pymysql.cursors.DictCursor):
+    pass
+
+
+class TimedSSDictCursor(TimedCursorMixin, pymysql.cursors.SSDictCursor):
+    pass
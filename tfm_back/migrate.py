@@ -0,0 +1,95 @@
+"""Migraciones versionadas del esquema de MySQL (sql/migrations/NNNN_descripcion.sql).
+
+Crea las tablas de sql/schema.sql si no existen y aplica en orden las
+migraciones pendientes, registrando cada una en la tabla ``schema_migrations``.
+
+    python migrate.py            # aplica las pendientes
+    python migrate.py --status   # muestra las aplicadas y las pendientes
+"""
+import argparse
+import os
+import re
+
+import pymysql
+
+from db_pool import DB_CONFIG
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql')
+SCHEMA_PATH = os.path.join(SQL_DIR, 'schema.sql')
+MIGRATIONS_DIR = os.path.join(SQL_DIR, 'migrations')
+
+MIGRATION_FILE = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+MIGRATIONS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT NOT NULL PRIMARY KEY,
+        name VARCHAR(128) NOT NULL,
+        applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+def run_sql_file(cursor, path):
+    # Sentencias separadas por ';' (sin procedimientos ni delimitadores propios)
+    with open(path, encoding='utf-8') as f:
+        lines = [line for line in f if not line.lstrip().startswith('--')]
+    for statement in ''.join(lines).split(';'):
+        if statement.strip():
+            cursor.execute(statement)
+
+
+def available_migrations(directory=MIGRATIONS_DIR):
+    # [(versión, nombre, ruta)] ordenadas por versión
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    return sorted(migrations)
+
+
+def applied_versions(cursor):
+    cursor.execute(MIGRATIONS_TABLE_SQL)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row['version'] for row in cursor.fetchall()}
+
+
+def migrate(connection, directory=MIGRATIONS_DIR, schema_path=SCHEMA_PATH):
+    """Crea el esquema base y aplica las migraciones pendientes; devuelve las versiones aplicadas."""
+    applied = []
+    with connection.cursor() as cursor:
+        run_sql_file(cursor, schema_path)
+        done = applied_versions(cursor)
+        for version, name, path in available_migrations(directory):
+            if version in done:
+                continue
+            # En MySQL cada sentencia DDL se confirma sola: una migración debe poder
+            # reanudarse a mano si falla a medias, por eso son pequeñas
+            run_sql_file(cursor, path)
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            connection.commit()
+            print(f"Migración {version:04d} aplicada: {name}")
+            applied.append(version)
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--status', action='store_true', help='Mostrar las migraciones sin aplicarlas')
+    args = parser.parse_args()
+
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        if args.status:
+            with connection.cursor() as cursor:
+                done = applied_versions(cursor)
+            for version, name, _ in available_migrations():
+                print(f"{version:04d} {name}: {'aplicada' if version in done else 'pendiente'}")
+        elif not migrate(connection):
+            print("El esquema ya está al día")
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+import time
+
+import joblib
+
+# Directorio de los modelos versionados generados por train_model.py
+MODEL_DIR = os.environ.get('TFM_MODEL_DIR', 'models')
+LATEST_FILE = 'LATEST'
+
+
+def write_latest(version, model_dir=MODEL_DIR):
+    # Escritura atómica del puntero a la última versión
+    path = os.path.join(model_dir, LATEST_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(tmp_path, path)
+
+
+class ModelStore:
+    """Modelo en uso por el servidor, recargado cuando ``models/LATEST`` cambia de versión.
+
+    Si no hay modelos versionados se usa ``fallback_path`` (el model.pkl original).
+    Con ``preload=False`` el modelo no se carga hasta el primer ``get()``.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, fallback_path='model.pkl', check_interval=5.0, preload=True):
+        self.model_dir = model_dir
+        self.fallback_path = fallback_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._model = None
+        self._version = None
+        self._metadata = {}
+        self._checked_at = 0.0
+        if preload:
+            self.get()
+
+    def _latest_version(self):
+        try:
+            with open(os.path.join(self.model_dir, LATEST_FILE), encoding='utf-8') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def _load(self, version):
+        if version is None:
+            return joblib.load(self.fallback_path), {'version': None, 'path': self.fallback_path}
+        model = joblib.load(os.path.join(self.model_dir, f'model-{version}.pkl'))
+        try:
+            with open(os.path.join(self.model_dir, f'model-{version}.json'), encoding='utf-8') as f:
+                metadata = json.load(f)
+        except OSError:
+            metadata = {'version': version}
+        return model, metadata
+
+    def get(self):
+        now = time.monotonic()
+        if self._model is not None and now - self._checked_at < self.check_interval:
+            return self._model
+        with self._lock:
+            if self._model is None or now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                version = self._latest_version()
+                if self._model is None or version != self._version:
+                    # El modelo nuevo se carga entero antes de sustituir al anterior
+                    self._model, self._metadata = self._load(version)
+                    self._version = version
+            return self._model
+
+    def current(self):
+        # Modelo y versión leídos juntos (p. ej. para cachés por versión)
+        self.get()
+        with self._lock:
+            return self._model, self._version
+
+    def metadata(self):
+        self.get()
+        return dict(self._metadata)
@@ -0,0 +1,216 @@
+"""Predicciones de rendimiento de los jugadores (goles, asistencias y tarjetas para 2024).
+
+Proceso por lotes: entrena un único modelo con las estadísticas por año de todos
+los jugadores, puntúa a todos los jugadores de una vez y guarda el resultado en
+la tabla ``player_predictions`` junto con la versión del modelo. El endpoint
+``/api/players/<id>/predictions`` solo tiene que buscar la fila del jugador.
+
+    python predictions.py
+"""
+import os
+import threading
+import time
+
+import joblib
+import pandas as pd
+import pymysql
+from sklearn.linear_model import LinearRegression
+
+from db_pool import DB_CONFIG
+from queries import GAMES_PER_YEAR
+
+PREDICTION_MODEL_PATH = os.environ.get('TFM_PREDICTION_MODEL', 'prediction_model.pkl')
+
+FEATURES = ['assists', 'cards']
+TARGET = 'goals'
+
+# Goles, asistencias y tarjetas por jugador y año (solo años con alguno de ellos)
+YEARLY_STATS_SQL = """
+    SELECT player_id, year, SUM(goals) AS goals, SUM(assists) AS assists, SUM(cards) AS cards
+    FROM (
+        SELECT player_id, event_year AS year,
+               COUNT(CASE WHEN type = 'Goals' THEN 1 END) AS goals,
+               0 AS assists,
+               COUNT(CASE WHEN type = 'Cards' THEN 1 END) AS cards
+        FROM game_events
+        WHERE {player_filter}
+        GROUP BY player_id, year
+        UNION ALL
+        SELECT player_assist_id AS player_id, event_year AS year, 0, COUNT(*), 0
+        FROM game_events
+        WHERE {assist_filter}
+        GROUP BY player_assist_id, year
+    ) AS yearly
+    GROUP BY player_id, year
+    HAVING SUM(goals) > 0 OR SUM(assists) > 0 OR SUM(cards) > 0
+    ORDER BY player_id, year
+"""
+
+# Primer y último año de la carrera de cada jugador
+CAREER_YEARS_SQL = """
+    SELECT player_id, MIN(event_year) AS first_year, MAX(event_year) AS last_year
+    FROM game_events
+    WHERE {player_filter}
+    GROUP BY player_id
+"""
+
+# Predicción guardada de un jugador (la que sirve /api/players/<id>/predictions)
+STORED_PREDICTION_SQL = """
+    SELECT predicted_goals_2024, predicted_assists_2024, predicted_cards_2024
+    FROM player_predictions
+    WHERE player_id = %s
+"""
+
+PREDICTIONS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS player_predictions (
+        player_id INT NOT NULL PRIMARY KEY,
+        model_version VARCHAR(32) NOT NULL,
+        predicted_goals_2024 DOUBLE NOT NULL,
+        predicted_assists_2024 DOUBLE NOT NULL,
+        predicted_cards_2024 DOUBLE NOT NULL
+    )
+"""
+
+
+def yearly_stats_queries(player_id=None):
+    """``[(sql, params), (sql, params)]`` de las estadísticas por año y de los años de carrera.
+
+    Las dos consultas son independientes y se pueden lanzar a la vez (app_async.py).
+    """
+    # Sin player_id se leen todos los jugadores
+    if player_id is None:
+        params = ()
+        yearly_sql = YEARLY_STATS_SQL.format(player_filter='TRUE', assist_filter='player_assist_id IS NOT NULL')
+        career_sql = CAREER_YEARS_SQL.format(player_filter='TRUE')
+    else:
+        params = (player_id,)
+        yearly_sql = YEARLY_STATS_SQL.format(player_filter='player_id = %s', assist_filter='player_assist_id = %s')
+        career_sql = CAREER_YEARS_SQL.format(player_filter='player_id = %s')
+    return [(yearly_sql, params * 2), (career_sql, params)]
+
+
+def stats_frames(yearly_rows, career_rows):
+    yearly = pd.DataFrame(yearly_rows, columns=['player_id', 'year', 'goals', 'assists', 'cards'])
+    careers = pd.DataFrame(career_rows, columns=['player_id', 'first_year', 'last_year'])
+    yearly[['goals', 'assists', 'cards']] = yearly[['goals', 'assists', 'cards']].astype(float)
+    return yearly, careers
+
+
+def fetch_yearly_stats(cursor, player_id=None):
+    results = []
+    for sql, params in yearly_stats_queries(player_id):
+        cursor.execute(sql, params)
+        results.append(cursor.fetchall())
+    return stats_frames(*results)
+
+
+def train_model(yearly):
+    # Un único modelo para todos los jugadores: goles a partir de asistencias y tarjetas por año
+    model = LinearRegression()
+    model.fit(yearly[FEATURES], yearly[TARGET])
+    return model
+
+
+def score_players(model, yearly, careers):
+    # Promedios por jugador y predicción de todos los jugadores en una sola llamada
+    averages = yearly.groupby('player_id')[FEATURES].mean()
+    careers = careers.set_index('player_id').reindex(averages.index)
+    years_played = (careers['last_year'] - careers['first_year'] + 1).fillna(0)
+    estimated_games_played = years_played * GAMES_PER_YEAR
+    factor = (GAMES_PER_YEAR / estimated_games_played).where(estimated_games_played > 0, 0)
+
+    predictions = pd.DataFrame(index=averages.index)
+    predictions['predicted_goals_2024'] = model.predict(averages[FEATURES]) if len(averages) else []
+    predictions['predicted_assists_2024'] = averages['assists'] * factor
+    predictions['predicted_cards_2024'] = averages['cards'] * factor
+    return predictions.round(2).reset_index()
+
+
+def save_model(model, path=PREDICTION_MODEL_PATH):
+    version = time.strftime('%Y%m%d%H%M%S')
+    joblib.dump({'model': model, 'version': version, 'features': FEATURES}, path)
+    return version
+
+
+_loaded = {'mtime': None, 'artifact': None}
+_loaded_lock = threading.Lock()
+
+
+def load_model(path=PREDICTION_MODEL_PATH):
+    # Se recarga solo si el fichero ha cambiado; None si aún no se ha entrenado
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _loaded_lock:
+        if _loaded['mtime'] != mtime:
+            _loaded['artifact'] = joblib.load(path)
+            _loaded['mtime'] = mtime
+        return _loaded['artifact']
+
+
+def model_version(path=PREDICTION_MODEL_PATH):
+    # Versión del modelo guardado; None si aún no se ha entrenado (se usa en la clave de la caché de las apps)
+    artifact = load_model(path)
+    return artifact['version'] if artifact is not None else None
+
+
+def predict_single_player(cursor, player_id):
+    # Jugadores que aún no están en player_predictions: se puntúan al vuelo con el modelo guardado
+    return score_single_player(*fetch_yearly_stats(cursor, player_id))
+
+
+def score_single_player(yearly, careers):
+    if yearly.empty:
+        return None
+
+    artifact = load_model()
+    # Sin modelo entrenado todavía: regresión con los datos del propio jugador
+    # (las apps guardan el resultado en caché para no entrenar en cada petición)
+    model = artifact['model'] if artifact is not None else train_model(yearly)
+
+    row = score_players(model, yearly, careers).iloc[0]
+    return {
+        "predicted_goals_2024": float(row['predicted_goals_2024']),
+        "predicted_assists_2024": float(row['predicted_assists_2024']),
+        "predicted_cards_2024": float(row['predicted_cards_2024'])
+    }
+
+
+def write_predictions(connection, predictions, version, batch_size=5000):
+    rows = [
+        (int(r.player_id), version, float(r.predicted_goals_2024),
+         float(r.predicted_assists_2024), float(r.predicted_cards_2024))
+        for r in predictions.itertuples(index=False)
+    ]
+    sql = """
+        REPLACE INTO player_predictions
+            (player_id, model_version, predicted_goals_2024, predicted_assists_2024, predicted_cards_2024)
+        VALUES (%s, %s, %s, %s, %s)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(PREDICTIONS_TABLE_SQL)
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+    connection.commit()
+
+
+def main():
+    connection = pymysql.connect(**DB_CONFIG)
+    try:
+        start = time.perf_counter()
+        with connection.cursor() as cursor:
+            yearly, careers = fetch_yearly_stats(cursor)
+
+        model = train_model(yearly)
+        version = save_model(model)
+        predictions = score_players(model, yearly, careers)
+        write_predictions(connection, predictions, version)
+
+        print(f"Modelo {version}: {len(predictions)} jugadores puntuados en {time.perf_counter() - start:.1f} s")
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""SQL de los endpoints, compartida por app.py (Flask) y app_async.py (ASGI).
+
+Solo texto SQL y funciones puras que construyen consultas o dan forma a sus
+resultados: cada aplicación las ejecuta con su propio driver (pymysql o
+aiomysql, ambos con parámetros ``%s``).
+"""
+
+# Promedio de partidos por año usado para estimar los partidos jugados
+GAMES_PER_YEAR = 40
+
+COMPETITIONS_SQL = "SELECT * FROM competition"
+COMPETITIONS_BY_TYPE_SQL = "SELECT * FROM competition WHERE type = %s"
+CLUBS_BY_COMPETITION_SQL = "SELECT * FROM clubs WHERE domestic_competition_id = %s"
+SEASONS_SQL = "SELECT DISTINCT season FROM games WHERE competition_id = %s ORDER BY season DESC"
+COMPETITION_SEASONS_SQL = "SELECT DISTINCT competition_id, season FROM games"
+TEAMS_SQL = """
+    SELECT
+        c.club_id AS team_id,
+        c.name AS team_name
+    FROM clubs c
+    JOIN games g ON g.home_club_id = c.club_id OR g.away_club_id = c.club_id
+    WHERE g.competition_id = %s AND g.season = %s
+    GROUP BY c.club_id, c.name
+"""
+
+PLAYER_SQL = "SELECT * FROM players WHERE player_id = %s"
+
+# Todas las estadísticas del jugador en una sola pasada sobre sus filas de game_events
+PLAYER_STATS_SQL = """
+    SELECT
+        COUNT(DISTINCT game_id) AS games_played,
+        COUNT(CASE WHEN player_id = %(player_id)s AND type = 'Goals' THEN 1 END) AS goals,
+        COUNT(CASE WHEN player_id = %(player_id)s AND type = 'Cards' THEN 1 END) AS cards,
+        COUNT(CASE WHEN player_assist_id = %(player_id)s THEN 1 END) AS assists,
+        MIN(CASE WHEN player_id = %(player_id)s THEN event_year END) AS first_year,
+        MAX(CASE WHEN player_id = %(player_id)s THEN event_year END) AS last_year
+    FROM game_events
+    WHERE player_id = %(player_id)s OR player_assist_id = %(player_id)s
+"""
+
+TOP_SCORERS_SQL = """
+    SELECT p.player_id, p.name, p.country_of_birth, p.image_url, COUNT(ge.player_id) AS goals
+    FROM players p
+    JOIN game_events ge ON p.player_id = ge.player_id
+    WHERE ge.type = 'Goals'
+    GROUP BY p.player_id
+    ORDER BY goals DESC
+    LIMIT 3
+"""
+
+# Partidos de una competición (y opcionalmente de una temporada) con el nombre de los dos equipos
+GAMES_SQL = """
+    SELECT
+        g.game_id,
+        g.competition_id,
+        g.season,
+        g.date,
+        g.round,
+        g.home_club_id,
+        hc.name AS home_club_name,
+        g.away_club_id,
+        ac.name AS away_club_name,
+        g.home_club_goals,
+        g.away_club_goals,
+        g.stadium,
+        g.attendance,
+        g.referee
+    FROM games g
+    JOIN clubs hc ON g.home_club_id = hc.club_id
+    JOIN clubs ac ON g.away_club_id = ac.club_id
+    WHERE g.competition_id = %s {season_filter}
+    ORDER BY g.season DESC
+"""
+
+TEAM_DETAILS_SQL = """
+    SELECT
+        name,
+        squad_size,
+        average_age,
+        national_team_players,
+        foreigners_percentage,
+        stadium_name
+    FROM clubs
+    WHERE club_id = %s
+"""
+
+# Series de los gráficos (clave de charts.CHARTS -> SQL): por equipo y competición, búsqueda
+# por clave primaria en el resumen por temporada; por jugador, sobre game_events
+TEAM_CHART_SQL = {
+    'team_performance': """
+        SELECT season, points
+        FROM team_season_stats
+        WHERE club_id = %s AND competition_id = %s
+        ORDER BY season
+    """,
+    'team_goals_scored': """
+        SELECT season, goals_for AS goals_scored
+        FROM team_season_stats
+        WHERE club_id = %s AND competition_id = %s
+        ORDER BY season
+    """,
+    'team_goals_conceded': """
+        SELECT season, goals_against AS goals_conceded
+        FROM team_season_stats
+        WHERE club_id = %s AND competition_id = %s
+        ORDER BY season
+    """,
+}
+
+PLAYER_CHART_SQL = {
+    'player_goals': """
+        SELECT event_year AS year, COUNT(*) AS goals
+        FROM game_events
+        WHERE player_id = %s AND type = 'Goals'
+        GROUP BY year
+        ORDER BY year
+    """,
+    'player_cards': """
+        SELECT event_year AS year, COUNT(*) AS cards
+        FROM game_events
+        WHERE player_id = %s AND type = 'Cards'
+        GROUP BY year
+        ORDER BY year
+    """,
+    'player_assists': """
+        SELECT event_year AS year, COUNT(*) AS assists
+        FROM game_events
+        WHERE player_assist_id = %s
+        GROUP BY year
+        ORDER BY year
+    """,
+}
+
+
+def games_query(competition_id, season=None):
+    if season:
+        return GAMES_SQL.format(season_filter='AND g.season = %s'), (competition_id, season)
+    return GAMES_SQL.format(season_filter=''), (competition_id,)
+
+
+def player_stats(row):
+    # Fila de PLAYER_STATS_SQL con la estimación de partidos jugados a partir de los años en activo
+    row = row or {}
+    first_year = row.get('first_year')
+    last_year = row.get('last_year')
+
+    if first_year is not None and last_year is not None:
+        years_played = last_year - first_year + 1  # Incluye el año inicial
+        estimated_games_played = years_played * GAMES_PER_YEAR
+    else:
+        first_year = None
+        last_year = None
+        estimated_games_played = 0
+
+    return {
+        "games_played": row.get('games_played') or 0,
+        "goals": row.get('goals') or 0,
+        "cards": row.get('cards') or 0,
+        "assists": row.get('assists') or 0,
+        "first_year": first_year,
+        "last_year": last_year,
+        "estimated_games_played": estimated_games_played
+    }
+
+
+# Tamaño máximo de página de las búsquedas
+MAX_PER_PAGE = 100
+
+
+def int_arg(args, name, default, minimum, maximum=None):
+    """Parámetro entero de la URL acotado a [minimum, maximum]; ValueError si no es un entero."""
+    value = args.get(name, type=int)
+    if value is None:
+        if args.get(name):
+            raise ValueError(f"{name} must be an integer")
+        return default
+    value = max(value, minimum)
+    return min(value, maximum) if maximum is not None else value
+
+
+def players_query(args):
+    """Consultas de /api/players a partir de los parámetros de la URL.
+
+    Devuelve ``(count_sql, count_params, page_sql, page_params, per_page)``.
+    ``page`` (>= 1) y ``per_page`` (1..MAX_PER_PAGE) se acotan a su rango. Lanza
+    ValueError, con el mensaje para el cliente, si alguno no es un entero o si el
+    cursor ``after`` no tiene la forma ``<market_value>,<player_id>``.
+    """
+    name = args.get('name', default=None)
+    position = args.get('position', default=None)
+    club = args.get('current_club_name', default=None)
+    nationality = args.get('country_of_citizenship', default=None)
+    min_market_value = args.get('minPrice', default=0, type=float)
+    max_market_value = args.get('maxPrice', default=250000000, type=float)
+    page = int_arg(args, 'page', 1, 1)
+    per_page = int_arg(args, 'per_page', 10, 1, MAX_PER_PAGE)
+    # Cursor de paginación por clave: "<market_value>,<player_id>" del último jugador recibido
+    after = args.get('after', default=None)
+
+    where = " WHERE TRUE"
+    params = []
+
+    if name:
+        where += " AND p.name LIKE %s"
+        params.append(f"%{name}%")
+    if position:
+        where += " AND p.position = %s"
+        params.append(position)
+    if club:
+        where += " AND c.name LIKE %s"
+        params.append(f"%{club}%")
+    if nationality:
+        where += " AND p.country_of_citizenship LIKE %s"
+        params.append(f"%{nationality}%")
+    if min_market_value is not None and max_market_value is not None:
+        where += " AND p.market_value_in_eur BETWEEN %s AND %s"
+        params.extend([min_market_value, max_market_value])
+
+    from_sql = """
+        FROM players p
+        JOIN clubs c ON p.current_club_id = c.club_id
+    """
+
+    page_sql = "SELECT p.*, c.name" + from_sql + where
+    page_params = list(params)
+    if after:
+        # Paginación por clave: coste constante sea cual sea la profundidad
+        try:
+            after_value, after_id = after.split(',')
+            after_value, after_id = float(after_value), int(after_id)
+        except ValueError:
+            raise ValueError("after must be '<market_value>,<player_id>'")
+        page_sql += """
+            AND (p.market_value_in_eur < %s
+                 OR (p.market_value_in_eur = %s AND p.player_id < %s))
+        """
+        page_params.extend([after_value, after_value, after_id])
+        page_sql += " ORDER BY p.market_value_in_eur DESC, p.player_id DESC LIMIT %s"
+        page_params.append(per_page)
+    else:
+        page_sql += " ORDER BY p.market_value_in_eur DESC, p.player_id DESC LIMIT %s OFFSET %s"
+        page_params.extend([per_page, (page - 1) * per_page])
+
+    return "SELECT COUNT(*) AS total" + from_sql + where, params, page_sql, page_params, per_page
+
+
+def next_players_cursor(players, per_page):
+    # Cursor para pedir la página siguiente con ?after= (None en la última página)
+    if len(players) < per_page or not players:
+        return None
+    last = players[-1]
+    return f"{last['market_value_in_eur']},{last['player_id']}"
+
+
+def teams_query(args):
+    """Consultas de /api/teamsSearch: ``(count_sql, params, page_sql, page_params)``.
+
+    ``page`` y ``per_page`` se tratan igual que en players_query (ValueError si no son enteros).
+    """
+    name = args.get('name')
+    country = args.get('country')
+    competition = args.get('competition')
+    page = int_arg(args, 'page', 1, 1)
+    per_page = int_arg(args, 'per_page', 10, 1, MAX_PER_PAGE)
+
+    from_sql = """
+        FROM clubs c
+        JOIN competition co ON c.domestic_competition_id = co.competition_id
+        WHERE 1=1
+    """
+
+    params = []
+
+    if name:
+        from_sql += " AND c.name LIKE %s"
+        params.append(f"%{name}%")
+
+    # País y competición por igualdad exacta para poder usar los índices
+    if country:
+        from_sql += " AND co.country_name = %s"
+        params.append(country)
+
+    if competition:
+        from_sql += " AND c.domestic_competition_id = %s"
+        params.append(competition)
+
+    page_sql = """
+        SELECT
+            c.club_id AS team_id,
+            c.name AS team_name,
+            co.country_name,
+            co.name
+    """ + from_sql + " ORDER BY c.name, c.club_id LIMIT %s OFFSET %s"
+    return "SELECT COUNT(*) AS total" + from_sql, params, page_sql, params + [per_page, (page - 1) * per_page]
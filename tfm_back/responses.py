@@ -0,0 +1,161 @@
+import gzip
+import hashlib
+import os
+import zlib
+
+from flask import Response, request as flask_request
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se usa gzip
+    brotli = None
+
+# Por debajo de este tamaño no compensa comprimir
+COMPRESS_MIN_BYTES = int(os.environ.get('TFM_COMPRESS_MIN_BYTES', 1024))
+
+# Los cuerpos en caché se comprimen una sola vez, con más nivel que los que se comprimen por petición
+CACHED_LEVELS = {'br': 9, 'gzip': 9}
+DYNAMIC_LEVELS = {'br': 4, 'gzip': 6}
+
+
+def _request(request):
+    # Petición que se pasa explícitamente (la de Quart en app_async.py) o la de Flask en curso
+    return flask_request if request is None else request
+
+
+def etag_for(*parts):
+    # ETag fuerte a partir de la versión del dataset y de la ruta con sus parámetros
+    return hashlib.sha256('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:32]
+
+
+def compress(body, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def choose_encoding(body_size=None, request=None):
+    # br si el cliente lo acepta y está instalado, si no gzip; nada para cuerpos pequeños
+    # (body_size=None: respuesta en streaming de tamaño desconocido)
+    if body_size is not None and body_size < COMPRESS_MIN_BYTES:
+        return None
+    accepted = _request(request).accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def variant_etag(etag, encoding):
+    # Cada codificación es una representación distinta y lleva su propio ETag fuerte
+    return f'{etag}-{encoding}' if encoding else etag
+
+
+def matching_etag(etag, request=None):
+    """ETag (de cualquier codificación) que el cliente ya tiene, o None."""
+    if_none_match = _request(request).if_none_match
+    for candidate in (etag, variant_etag(etag, 'gzip'), variant_etag(etag, 'br')):
+        if if_none_match.contains(candidate):
+            return candidate
+    return None
+
+
+def not_modified(etag, response_class=Response):
+    response = response_class(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+class CachedBody:
+    """Cuerpo de una respuesta guardado en caché junto con sus versiones comprimidas."""
+
+    def __init__(self, body, status=200, etag=None, mimetype='application/json'):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        # Sin versión del dataset el ETag sale del propio contenido
+        self.etag = etag or hashlib.sha256(body).hexdigest()[:32]
+        self._encoded = {}
+
+    def encoded(self, encoding):
+        if encoding is None:
+            return self.body
+        data = self._encoded.get(encoding)
+        if data is None:
+            data = self._encoded[encoding] = compress(self.body, encoding, CACHED_LEVELS[encoding])
+        return data
+
+    def size(self):
+        # Bytes que ocupa la entrada en la caché de respuestas (cuerpo y versiones comprimidas guardadas)
+        return len(self.body) + sum(len(data) for data in list(self._encoded.values()))
+
+
+def send_body(entry, request=None, response_class=Response):
+    """Respuesta para un CachedBody: 304 si el cliente ya lo tiene y, si no, el cuerpo comprimido.
+
+    Fuera de Flask (app_async.py) se pasan la petición y la clase de respuesta de Quart.
+    """
+    if entry.status == 200:
+        matched = matching_etag(entry.etag, request)
+        if matched:
+            return not_modified(matched, response_class)
+
+    encoding = choose_encoding(len(entry.body), request)
+    response = response_class(entry.encoded(encoding), status=entry.status, mimetype=entry.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(variant_etag(entry.etag, encoding))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _stream_compressor(encoding):
+    # (comprimir un bloque, terminar): cada bloque se vacía del compresor al enviarlo,
+    # para que el cliente lo reciba sin esperar al final
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=DYNAMIC_LEVELS['br'])
+        return lambda chunk: compressor.process(chunk) + compressor.flush(), compressor.finish
+    compressor = zlib.compressobj(DYNAMIC_LEVELS['gzip'], zlib.DEFLATED, 31)  # 31: formato gzip
+    return lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _encoded_chunks(chunks, encoding):
+    process, finish = _stream_compressor(encoding) if encoding else (None, None)
+    for chunk in chunks:
+        chunk = chunk.encode('utf-8')
+        yield process(chunk) if encoding else chunk
+    if encoding:
+        yield finish()
+
+
+async def _encoded_chunks_async(chunks, encoding):
+    process, finish = _stream_compressor(encoding) if encoding else (None, None)
+    async for chunk in chunks:
+        chunk = chunk.encode('utf-8')
+        yield process(chunk) if encoding else chunk
+    if encoding:
+        yield finish()
+
+
+def send_stream(chunks, etag=None, mimetype='application/json', request=None, response_class=Response):
+    """Respuesta en streaming (generador de bloques de texto), comprimida al vuelo si el cliente lo acepta.
+
+    Acepta también generadores asíncronos (app_async.py, con la petición y la clase de respuesta de Quart).
+    """
+    encoding = choose_encoding(request=request)
+    if hasattr(chunks, '__aiter__'):
+        body = _encoded_chunks_async(chunks, encoding)
+    else:
+        body = _encoded_chunks(chunks, encoding)
+    response = response_class(body, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if etag:
+        response.set_etag(variant_etag(etag, encoding))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,186 @@
+"""Índice en memoria para el autocompletado de jugadores, clubes y nacionalidades.
+
+Los textos se normalizan sin acentos ni mayúsculas ("Müller" y "muller" son lo
+mismo). Las consultas de 3 o más caracteres se resuelven con un índice de
+trigramas (equivalente a ``LIKE '%texto%'`` sin recorrer la tabla) y las más
+cortas con un índice de prefijos de palabra. Los resultados se ordenan por
+relevancia: coincidencia exacta, prefijo del nombre, prefijo de una palabra y
+subcadena; a igualdad, primero el de más peso (valor de mercado o número de
+jugadores).
+"""
+import bisect
+import re
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+SEARCH_KINDS = ('player', 'club', 'country')
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+# Letras que NFKD no descompone (Ødegaard, Błaszczykowski...)
+_LETTERS = str.maketrans({'ø': 'o', 'æ': 'ae', 'œ': 'oe', 'ł': 'l', 'đ': 'd', 'ð': 'd', 'þ': 'th', 'ı': 'i'})
+
+
+def normalize(text):
+    # Sin acentos, en minúsculas y con un solo espacio entre palabras
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).casefold().translate(_LETTERS)
+    return _NON_ALNUM.sub(' ', text).strip()
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """Índice de trigramas y prefijos sobre una lista de documentos ``(tipo, id, texto, peso)``.
+
+    Los documentos se guardan ordenados por peso descendente: dentro de cada
+    nivel de relevancia, la posición ya es el orden del resultado y la búsqueda
+    puede parar en cuanto tiene ``limit`` resultados.
+    """
+
+    def __init__(self, documents):
+        rows = []
+        for kind, doc_id, label, weight in documents:
+            norm = normalize(label)
+            if norm:
+                weight = float(weight or 0)
+                rows.append((-(weight if weight == weight else 0.0), norm, kind, doc_id, label))  # NaN -> 0
+        rows.sort(key=lambda row: (row[0], row[1]))
+
+        self._docs = [(kind, doc_id, label) for _, _, kind, doc_id, label in rows]
+        self._norms = [norm for _, norm, _, _, _ in rows]
+        self._kinds = np.array([SEARCH_KINDS.index(kind) for kind, _, _ in self._docs], dtype=np.int8)
+
+        postings = {}
+        tokens = []
+        for position, norm in enumerate(self._norms):
+            for gram in trigrams(norm):
+                postings.setdefault(gram, []).append(position)
+            tokens.extend((token, position) for token in set(norm.split()))
+        # Listas de posiciones ordenadas (se añaden en orden) para intersecarlas con numpy
+        self._postings = {gram: np.array(positions, dtype=np.int32) for gram, positions in postings.items()}
+
+        # Texto completo y palabras ordenados alfabéticamente para buscar prefijos con bisect
+        full = sorted((norm, position) for position, norm in enumerate(self._norms))
+        self._full = [norm for norm, _ in full]
+        self._full_docs = np.array([position for _, position in full], dtype=np.int32)
+        tokens.sort()
+        self._tokens = [token for token, _ in tokens]
+        self._token_docs = np.array([position for _, position in tokens], dtype=np.int32)
+
+    def __len__(self):
+        return len(self._docs)
+
+    @staticmethod
+    def _prefix_range(keys, positions, prefix):
+        start = bisect.bisect_left(keys, prefix)
+        end = bisect.bisect_left(keys, prefix + '\uffff')
+        return positions[start:end]
+
+    def _substring_matches(self, query):
+        # Documentos que contienen la consulta: intersección de las listas de sus trigramas
+        lists = []
+        for gram in trigrams(query):
+            positions = self._postings.get(gram)
+            if positions is None:
+                return np.empty(0, dtype=np.int32)
+            lists.append(positions)
+        lists.sort(key=len)
+        result = lists[0]
+        for positions in lists[1:]:
+            result = np.intersect1d(result, positions, assume_unique=True)
+            if not len(result):
+                break
+        return result
+
+    def search(self, query, kinds=None, limit=10):
+        query = normalize(query)
+        if not query:
+            return []
+        allowed = None if not kinds else np.isin(self._kinds, [SEARCH_KINDS.index(kind) for kind in kinds])
+        found = []
+        taken = set()
+
+        def take(positions, verify=None):
+            # Añade por orden de posición (peso) los que falten hasta limit; True si ya está completo
+            if allowed is not None:
+                positions = positions[allowed[positions]]
+            for position in np.unique(positions).tolist():
+                if position not in taken and (verify is None or verify(self._norms[position])):
+                    taken.add(position)
+                    found.append(position)
+                    if len(found) >= limit:
+                        return True
+            return False
+
+        # Relevancia: 1) texto exacto, 2) el texto empieza por la consulta,
+        # 3) alguna palabra empieza por ella, 4) la contiene en cualquier posición
+        exact = self._full_docs[bisect.bisect_left(self._full, query):bisect.bisect_right(self._full, query)]
+        done = (take(exact)
+                or take(self._prefix_range(self._full, self._full_docs, query)))
+        if not done:
+            if ' ' not in query:
+                done = take(self._prefix_range(self._tokens, self._token_docs, query))
+            else:
+                done = take(self._substring_matches(query), lambda norm: (' ' + query) in (' ' + norm))
+        if not done and len(query) >= 3:
+            take(self._substring_matches(query), lambda norm: query in norm)
+
+        return [{'type': kind, 'id': doc_id, 'label': label}
+                for kind, doc_id, label in (self._docs[p] for p in found)]
+
+    @classmethod
+    def from_records(cls, players, clubs):
+        """Índice a partir de filas de players (player_id, name, country_of_citizenship,
+        market_value_in_eur) y de clubs (club_id, name)."""
+        documents = []
+        countries = {}
+        for player in players:
+            documents.append(('player', player['player_id'], player['name'], player.get('market_value_in_eur')))
+            country = player.get('country_of_citizenship')
+            if isinstance(country, str) and country:
+                countries[country] = countries.get(country, 0) + 1
+        documents.extend(('club', club['club_id'], club['name'], 0) for club in clubs)
+        # Las nacionalidades se identifican por su propio nombre (filtro country_of_citizenship)
+        documents.extend(('country', country, country, count) for country, count in countries.items())
+        return cls(documents)
+
+
+class SearchIndexStore:
+    """Índice en uso por el servidor, reconstruido cuando cambia la versión de los datos.
+
+    ``version()`` se consulta como mucho cada ``check_interval`` segundos. La
+    reconstrucción la hace una sola petición; el resto sigue usando el índice
+    anterior hasta que el nuevo está completo.
+    """
+
+    def __init__(self, build, version, check_interval=60.0):
+        self._build = build
+        self._version_fn = version
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < self.check_interval:
+            return self._index
+        # Sin índice hay que esperar a que se construya; con índice, quien no consigue el lock sigue con el actual
+        if not self._lock.acquire(blocking=self._index is None):
+            return self._index
+        try:
+            if self._index is None or now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                version = self._version_fn()
+                if self._index is None or version != self._version:
+                    self._index = self._build()
+                    self._version = version
+            return self._index
+        finally:
+            self._lock.release()
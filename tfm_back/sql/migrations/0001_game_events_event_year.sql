@@ -0,0 +1,4 @@
+-- Año del evento como columna almacenada: las agrupaciones por año
+-- (gráficos y predicciones del jugador) pueden resolverse con un índice.
+ALTER TABLE game_events
+    ADD COLUMN event_year SMALLINT AS (YEAR(date)) STORED;
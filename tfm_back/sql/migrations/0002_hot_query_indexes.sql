@@ -0,0 +1,27 @@
+-- Índices para las consultas de los endpoints de app.py.
+
+-- Estadísticas, gráficos y predicciones del jugador; máximos goleadores
+ALTER TABLE game_events
+    ADD INDEX idx_game_events_player_type_year (player_id, type, event_year),
+    ADD INDEX idx_game_events_assist_year (player_assist_id, event_year),
+    ADD INDEX idx_game_events_type_player (type, player_id);
+
+-- /api/games, /api/seasons y /api/teams por competición y temporada, y por equipo local/visitante
+ALTER TABLE games
+    ADD INDEX idx_games_competition_season (competition_id, season),
+    ADD INDEX idx_games_home_club (home_club_id, competition_id, season),
+    ADD INDEX idx_games_away_club (away_club_id, competition_id, season);
+
+-- /api/clubs/<competition_id> y /api/teamsSearch (filtro por competición y orden por nombre)
+ALTER TABLE clubs
+    ADD INDEX idx_clubs_domestic_competition (domestic_competition_id),
+    ADD INDEX idx_clubs_name (name, club_id);
+
+-- /api/players: orden y paginación por valor de mercado
+ALTER TABLE players
+    ADD INDEX idx_players_market_value (market_value_in_eur, player_id);
+
+-- /api/competitions/<comp_type> y filtro por país de /api/teamsSearch
+ALTER TABLE competition
+    ADD INDEX idx_competition_type (type),
+    ADD INDEX idx_competition_country (country_name);
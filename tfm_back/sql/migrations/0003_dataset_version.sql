@@ -0,0 +1,9 @@
+-- Versión de los datos cargados: load_mysql.py la incrementa tras cada
+-- sustitución de tablas y app.py invalida con ella sus cachés.
+CREATE TABLE IF NOT EXISTS dataset_version (
+    id TINYINT NOT NULL PRIMARY KEY,
+    version INT NOT NULL,
+    loaded_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT IGNORE INTO dataset_version (id, version) VALUES (1, 0);
@@ -0,0 +1,119 @@
+-- Tablas de tfm_bbdd que usa app.py, cargadas por load_mysql.py a partir de
+-- las salidas de data.py. Las columnas siguen a los *_clean.csv; las que no
+-- aparecen en el CSV se quedan a NULL.
+CREATE TABLE IF NOT EXISTS competition (
+    competition_id VARCHAR(10) NOT NULL,
+    competition_code VARCHAR(64) NOT NULL,
+    name VARCHAR(128) NOT NULL,
+    sub_type VARCHAR(64),
+    type VARCHAR(32),
+    country_id INT,
+    country_name VARCHAR(64),
+    domestic_league_code VARCHAR(10),
+    confederation VARCHAR(32),
+    url VARCHAR(255),
+    is_major_national_league VARCHAR(8),
+    PRIMARY KEY (competition_id)
+);
+
+CREATE TABLE IF NOT EXISTS clubs (
+    club_id INT NOT NULL,
+    club_code VARCHAR(128),
+    name VARCHAR(128) NOT NULL,
+    domestic_competition_id VARCHAR(10) NOT NULL,
+    total_market_value DOUBLE,
+    squad_size SMALLINT,
+    average_age DOUBLE,
+    foreigners_number SMALLINT,
+    foreigners_percentage DOUBLE,
+    national_team_players SMALLINT,
+    stadium_name VARCHAR(128),
+    stadium_seats INT,
+    net_transfer_record VARCHAR(32),
+    coach_name VARCHAR(128),
+    last_season SMALLINT,
+    filename VARCHAR(255),
+    url VARCHAR(255),
+    PRIMARY KEY (club_id)
+);
+
+CREATE TABLE IF NOT EXISTS games (
+    game_id INT NOT NULL,
+    competition_id VARCHAR(10) NOT NULL,
+    season SMALLINT NOT NULL,
+    round VARCHAR(64),
+    date DATE,
+    home_club_id INT NOT NULL,
+    away_club_id INT NOT NULL,
+    home_club_goals SMALLINT,
+    away_club_goals SMALLINT,
+    home_club_position SMALLINT,
+    away_club_position SMALLINT,
+    home_club_manager_name VARCHAR(128),
+    away_club_manager_name VARCHAR(128),
+    stadium VARCHAR(128),
+    attendance INT,
+    referee VARCHAR(128),
+    url VARCHAR(255),
+    home_club_formation VARCHAR(32),
+    away_club_formation VARCHAR(32),
+    aggregate VARCHAR(16),
+    competition_type VARCHAR(32),
+    PRIMARY KEY (game_id)
+);
+
+CREATE TABLE IF NOT EXISTS players (
+    player_id INT NOT NULL,
+    first_name VARCHAR(128),
+    last_name VARCHAR(128),
+    name VARCHAR(255) NOT NULL,
+    last_season SMALLINT,
+    current_club_id INT NOT NULL,
+    player_code VARCHAR(128),
+    country_of_birth VARCHAR(64),
+    city_of_birth VARCHAR(128),
+    country_of_citizenship VARCHAR(64),
+    date_of_birth DATE,
+    sub_position VARCHAR(64),
+    position VARCHAR(32),
+    foot VARCHAR(16),
+    height_in_cm SMALLINT,
+    contract_expiration_date DATE,
+    agent_name VARCHAR(128),
+    image_url VARCHAR(255),
+    url VARCHAR(255),
+    current_club_domestic_competition_id VARCHAR(10) NOT NULL,
+    market_value_in_eur BIGINT,
+    highest_market_value_in_eur BIGINT,
+    PRIMARY KEY (player_id),
+    KEY idx_players_current_club (current_club_id)
+);
+
+CREATE TABLE IF NOT EXISTS game_events (
+    game_event_id VARCHAR(64) NOT NULL,
+    date DATE NOT NULL,
+    game_id INT NOT NULL,
+    minute SMALLINT,
+    type VARCHAR(32),
+    club_id INT NOT NULL,
+    player_id INT NOT NULL,
+    player_assist_id INT,
+    PRIMARY KEY (game_event_id)
+);
+
+-- Resumen por equipo, competición y temporada que alimenta los gráficos de equipo.
+-- La clave primaria permite resolver cada gráfico con una única búsqueda por índice;
+-- sql/team_season_stats.sql lo actualiza de forma incremental.
+CREATE TABLE IF NOT EXISTS team_season_stats (
+    club_id INT NOT NULL,
+    competition_id VARCHAR(10) NOT NULL,
+    season SMALLINT NOT NULL,
+    games SMALLINT NOT NULL,
+    points SMALLINT NOT NULL,
+    goals_for SMALLINT NOT NULL,
+    goals_against SMALLINT NOT NULL,
+    wins SMALLINT NOT NULL,
+    draws SMALLINT NOT NULL,
+    losses SMALLINT NOT NULL,
+    PRIMARY KEY (club_id, competition_id, season)
+);
@@ -0,0 +1,28 @@
+-- Actualización incremental de team_season_stats (definida en schema.sql) tras
+-- añadir partidos: se recalculan solo las temporadas desde @from_season
+-- (p. ej. SET @from_season = 2024;).
+REPLACE INTO team_season_stats
+    (club_id, competition_id, season, games, points, goals_for, goals_against, wins, draws, losses)
+SELECT
+    club_id,
+    competition_id,
+    season,
+    COUNT(*) AS games,
+    SUM(CASE WHEN goals_for > goals_against THEN 3 WHEN goals_for = goals_against THEN 1 ELSE 0 END) AS points,
+    COALESCE(SUM(goals_for), 0) AS goals_for,
+    COALESCE(SUM(goals_against), 0) AS goals_against,
+    COALESCE(SUM(goals_for > goals_against), 0) AS wins,
+    COALESCE(SUM(goals_for = goals_against), 0) AS draws,
+    COALESCE(SUM(goals_for < goals_against), 0) AS losses
+FROM (
+    SELECT home_club_id AS club_id, competition_id, season,
+           home_club_goals AS goals_for, away_club_goals AS goals_against
+    FROM games
+    WHERE season >= @from_season
+    UNION ALL
+    SELECT away_club_id AS club_id, competition_id, season,
+           away_club_goals AS goals_for, home_club_goals AS goals_against
+    FROM games
+    WHERE season >= @from_season
+) AS team_games
+GROUP BY club_id, competition_id, season;
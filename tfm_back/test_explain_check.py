@@ -0,0 +1,121 @@
+"""Pruebas de regresión con EXPLAIN: las consultas de los endpoints (queries.py) usan índices.
+
+Una prueba por consulta de QUERIES contra la base de datos configurada (TFM_DB_*)
+después de migrate.py y load_mysql.py; falla si la consulta recorre una tabla
+entera (``type = ALL``). Sin MySQL o sin datos cargados las pruebas se saltan
+indicando el motivo.
+
+    python -m pytest test_explain_check.py -rs
+"""
+import pymysql
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from db_pool import DB_CONFIG
+from predictions import CAREER_YEARS_SQL, YEARLY_STATS_SQL
+from queries import (CLUBS_BY_COMPETITION_SQL, COMPETITION_SEASONS_SQL, COMPETITIONS_BY_TYPE_SQL, PLAYER_CHART_SQL,
+                     PLAYER_STATS_SQL, SEASONS_SQL, TEAM_CHART_SQL, TEAM_DETAILS_SQL, TEAMS_SQL, TOP_SCORERS_SQL,
+                     games_query, players_query, teams_query)
+
+# Valores de ejemplo sacados de la propia base de datos
+SAMPLES_SQL = {
+    'player_id': "SELECT player_id FROM game_events WHERE type = 'Goals' LIMIT 1",
+    'competition_id': "SELECT competition_id FROM games LIMIT 1",
+    'season': "SELECT MAX(season) AS season FROM games",
+    'club_id': "SELECT home_club_id AS club_id FROM games LIMIT 1",
+    'comp_type': "SELECT type AS comp_type FROM competition LIMIT 1",
+    'country': "SELECT country_name AS country FROM competition WHERE country_name IS NOT NULL LIMIT 1",
+    'player_name': "SELECT name AS player_name FROM players WHERE name IS NOT NULL LIMIT 1",
+    'club_name': "SELECT name AS club_name FROM clubs WHERE name IS NOT NULL LIMIT 1",
+    'nationality': "SELECT country_of_citizenship AS nationality FROM players "
+                   "WHERE country_of_citizenship IS NOT NULL LIMIT 1",
+    'after_cursor': "SELECT CONCAT(market_value_in_eur, ',', player_id) AS after_cursor FROM players "
+                    "WHERE market_value_in_eur IS NOT NULL LIMIT 1",
+}
+
+
+def players_page(args):
+    # Consulta de la página de /api/players tal como la construye el endpoint a partir de la URL
+    _, _, page_sql, page_params, _ = players_query(MultiDict(args))
+    return page_sql, page_params
+
+
+def teams_page(args):
+    _, _, page_sql, page_params = teams_query(MultiDict(args))
+    return page_sql, page_params
+
+
+# (endpoint, función que recibe los valores de ejemplo y devuelve (SQL, parámetros)):
+# la SQL sale de queries.py y predictions.py, la misma que ejecuta cada endpoint
+QUERIES = [
+    ('/api/competitions/<comp_type>', lambda s: (COMPETITIONS_BY_TYPE_SQL, (s['comp_type'],))),
+    ('/api/clubs/<competition_id>', lambda s: (CLUBS_BY_COMPETITION_SQL, (s['competition_id'],))),
+    ('/api/players', lambda s: players_page({})),
+    ('/api/players?name&current_club_name&country_of_citizenship',
+     lambda s: players_page({'name': s['player_name'], 'current_club_name': s['club_name'],
+                             'country_of_citizenship': s['nationality']})),
+    ('/api/players?after', lambda s: players_page({'after': s['after_cursor']})),
+    ('/api/top_scorers', lambda s: (TOP_SCORERS_SQL, None)),
+    ('/api/players/<id>', lambda s: (PLAYER_STATS_SQL, {'player_id': s['player_id']})),
+    ('/api/games', lambda s: games_query(s['competition_id'], s['season'])),
+    ('/api/games (todas las temporadas)', lambda s: games_query(s['competition_id'])),
+    ('/api/seasons', lambda s: (SEASONS_SQL, (s['competition_id'],))),
+    ('/api/teams', lambda s: (TEAMS_SQL, (s['competition_id'], s['season']))),
+    ('/api/teamsSearch?competition', lambda s: teams_page({'competition': s['competition_id']})),
+    ('/api/teamsSearch?country', lambda s: teams_page({'country': s['country']})),
+    ('/api/teams/<id>', lambda s: (TEAM_DETAILS_SQL, (s['club_id'],))),
+    ('precarga de la caché (competiciones y temporadas)', lambda s: (COMPETITION_SEASONS_SQL, None)),
+    ('/api/players/<id>/predictions (estadísticas por año)',
+     lambda s: (YEARLY_STATS_SQL.format(player_filter='player_id = %s', assist_filter='player_assist_id = %s'),
+                (s['player_id'], s['player_id']))),
+    ('/api/players/<id>/predictions (años de carrera)',
+     lambda s: (CAREER_YEARS_SQL.format(player_filter='player_id = %s'), (s['player_id'],))),
+]
+QUERIES += [(f'/api/{chart}_chart', lambda s, sql=sql: (sql, (s['club_id'], s['competition_id'])))
+            for chart, sql in TEAM_CHART_SQL.items()]
+QUERIES += [(f'/api/{chart}_chart/<id>', lambda s, sql=sql: (sql, (s['player_id'],)))
+            for chart, sql in PLAYER_CHART_SQL.items()]
+
+
+def full_scans(cursor, sql, params):
+    cursor.execute('EXPLAIN ' + sql, params)
+    scans = []
+    for row in cursor.fetchall():
+        table = row.get('table') or ''
+        extra = row.get('Extra') or ''
+        # Tablas derivadas (<derived2>, <union1,2>) y joins con "Range checked for each record" usan índices por fila
+        if row.get('type') == 'ALL' and not table.startswith('<') and 'Range checked' not in extra:
+            scans.append(f"{table} (rows={row.get('rows')}, key={row.get('key')}, {extra})")
+    return scans
+
+
+@pytest.fixture(scope='module')
+def cursor():
+    try:
+        connection = pymysql.connect(**dict(DB_CONFIG, connect_timeout=5))
+    except pymysql.err.OperationalError as e:
+        pytest.skip(f"MySQL no disponible ({DB_CONFIG['host']}:{DB_CONFIG.get('port', 3306)}): {e}")
+    try:
+        with connection.cursor() as cursor:
+            yield cursor
+    finally:
+        connection.close()
+
+
+@pytest.fixture(scope='module')
+def samples(cursor):
+    values = {}
+    for name, sql in SAMPLES_SQL.items():
+        cursor.execute(sql)
+        row = cursor.fetchone()
+        if not row or row[name] is None:
+            # Con las tablas vacías el plan de MySQL no dice nada de los índices
+            pytest.skip(f"Sin datos para {name}: carga antes las tablas con load_mysql.py")
+        values[name] = row[name]
+    return values
+
+
+@pytest.mark.parametrize('build', [build for _, build in QUERIES], ids=[endpoint for endpoint, _ in QUERIES])
+def test_query_uses_indexes(cursor, samples, build):
+    scans = full_scans(cursor, *build(samples))
+    assert not scans, f"recorrido completo de {'; '.join(scans)}"
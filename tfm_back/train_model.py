@@ -0,0 +1,127 @@
+"""Entrenamiento del modelo de /predict a partir de los CSV limpios de data.py.
+
+Lee appearances (una fila por jugador y partido), entrena un RandomForestRegressor
+con todos los núcleos y guarda un artefacto versionado (``models/model-<versión>.pkl``
++ ``.json`` con el esquema de columnas, tiempo de entrenamiento y memoria residente
+máxima del proceso). ``models/LATEST`` apunta a la última versión y los servidores
+la cargan sin reiniciarse.
+
+    python train_model.py --clean-dir D:/UEM/TFM_DATA/tfm_data/data_clean
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import joblib
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import train_test_split
+
+try:
+    import resource
+except ImportError:  # resource solo existe en Unix: en Windows no se mide la memoria
+    resource = None
+
+from data import CLEAN_DIR, read_clean_table
+from model_store import MODEL_DIR, write_latest
+
+# Columnas del modelo (las mismas que usan /predict y /predict/<player_id>)
+FEATURES = ['assists', 'minutes_played', 'yellow_cards', 'red_cards']
+TARGET = 'goals'
+
+APPEARANCE_DTYPES = {
+    'game_id': 'int32',
+    'player_id': 'int32',
+    'goals': 'int16',
+    'assists': 'int16',
+    'minutes_played': 'int16',
+    'yellow_cards': 'int8',
+    'red_cards': 'int8',
+}
+
+
+def build_features(clean_dir=CLEAN_DIR):
+    """Filas de entrenamiento con tipos compactos; devuelve también cuántas se han descartado por nulos.
+
+    Solo se leen las columnas necesarias (Parquet/Feather si data.py los ha generado; pyarrow ya las
+    lee en varios hilos). appearances ya tiene una fila por jugador y partido: no hace falta agrupar
+    ni unir con games. Los tipos enteros sin nulos no admiten NaN (y RandomForestRegressor tampoco):
+    se descartan las filas con algún valor nulo antes de convertir.
+    """
+    appearances = read_clean_table('appearances', clean_dir, columns=list(APPEARANCE_DTYPES))
+    features = appearances.dropna()
+    return features.astype(APPEARANCE_DTYPES), len(appearances) - len(features)
+
+
+def peak_rss_mb():
+    # Memoria residente máxima del proceso (incluye los arrays de NumPy, que tracemalloc no ve)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    return round(peak / 1024 / (1024 if sys.platform == 'darwin' else 1), 1)
+
+
+def train(features, n_jobs=-1, n_estimators=100, random_state=42):
+    X = features[FEATURES]
+    y = features[TARGET]
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=random_state)
+
+    model = RandomForestRegressor(n_estimators=n_estimators, n_jobs=n_jobs, random_state=random_state)
+    model.fit(X_train, y_train)
+    return model, model.score(X_test, y_test)
+
+
+def save_artifact(model, metadata, model_dir=MODEL_DIR):
+    os.makedirs(model_dir, exist_ok=True)
+    version = metadata['version']
+    joblib.dump(model, os.path.join(model_dir, f'model-{version}.pkl'))
+    with open(os.path.join(model_dir, f'model-{version}.json'), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2)
+    # Se publica la versión al final, cuando el artefacto ya está completo
+    write_latest(version, model_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clean-dir', default=CLEAN_DIR, help='Directorio con los *_clean.csv')
+    parser.add_argument('--model-dir', default=MODEL_DIR, help='Directorio de los modelos versionados')
+    parser.add_argument('--n-jobs', type=int, default=-1, help='Núcleos para el entrenamiento (-1 = todos)')
+    parser.add_argument('--n-estimators', type=int, default=100)
+    parser.add_argument('--export-merged', default=None,
+                        help='Guardar también las filas de entrenamiento (p. ej. merged_data.csv para app_resp.py)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    features, dropped_rows = build_features(args.clean_dir)
+    features_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model, test_r2 = train(features, n_jobs=args.n_jobs, n_estimators=args.n_estimators)
+    train_seconds = time.perf_counter() - start
+
+    version = time.strftime('%Y%m%d%H%M%S')
+    metadata = {
+        'version': version,
+        'model': type(model).__name__,
+        'params': {'n_estimators': args.n_estimators, 'n_jobs': args.n_jobs},
+        'features': [{'name': name, 'dtype': str(features[name].dtype)} for name in FEATURES],
+        'target': TARGET,
+        'rows': len(features),
+        'dropped_rows': dropped_rows,
+        'test_r2': round(test_r2, 4),
+        'features_seconds': round(features_seconds, 2),
+        'train_seconds': round(train_seconds, 2),
+        'peak_memory_mb': peak_rss_mb(),
+    }
+    save_artifact(model, metadata, args.model_dir)
+
+    if args.export_merged:
+        features.to_csv(args.export_merged, index=False)
+
+    print(json.dumps(metadata, indent=2))
+
+
+if __name__ == '__main__':
+    main()